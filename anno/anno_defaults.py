@@ -8,9 +8,21 @@ CATCH_CURRENT_SCHEMA_VERSION = getattr(settings, 'CATCH_SCHEMA_VERSION', 'catch_
 CATCH_JSONLD_CONTEXT_IRI = getattr(
     settings, 'CATCH_CONTEXT_IRI',
     'http://catch-dev.harvardx.harvard.edu/catch-context.jsonld')
+# cache for jsonld documents (contexts) fetched from the network;
+# contexts in CATCH_JSONLD_PRELOADED_CONTEXTS are read from local files,
+# as {'<context iri>': '<path to json file>'}, and never fetched.
+CATCH_JSONLD_CACHE_SIZE = getattr(settings, 'CATCH_JSONLD_CACHE_SIZE', 64)
+CATCH_JSONLD_CACHE_TTL = getattr(settings, 'CATCH_JSONLD_CACHE_TTL', 3600)
+CATCH_JSONLD_PRELOADED_CONTEXTS = getattr(
+    settings, 'CATCH_JSONLD_PRELOADED_CONTEXTS', {})
 #ANNOTATORJS_CONTEXT_IRI = getattr(
 #    settings, 'ANNOTATOR_CONTEXT_IRI', 'http://annotatorjs.org')
 
+# validate catcha with code generated from the json schema; invalid catcha
+# are validated again with jsonschema, for the error message
+CATCH_FAST_SCHEMA_VALIDATION = getattr(
+    settings, 'CATCH_FAST_SCHEMA_VALIDATION', False)
+
 # json response formats
 CATCH_ANNO_FORMAT = 'CATCH_ANNO_FORMAT'
 ANNOTATORJS_FORMAT = 'ANNOTATORJS_FORMAT'
@@ -26,6 +38,29 @@ CATCH_RESPONSE_FORMAT_HTTPHEADER = getattr(
 CATCH_MAX_RESPONSE_LIMIT = getattr(
     settings, 'CATCH_RESPONSE_LIMIT', 200)
 
+# number of annotations inserted per transaction in import and copy
+CATCH_IMPORT_CHUNK_SIZE = getattr(settings, 'CATCH_IMPORT_CHUNK_SIZE', 500)
+
+# how to count total rows in search
+CATCH_COUNT_EXACT = 'exact'        # count with window function, along rows
+CATCH_COUNT_ESTIMATE = 'estimate'  # query planner row estimate
+CATCH_COUNT_NONE = 'none'          # skip counting, total is null
+CATCH_COUNT_MODES = [CATCH_COUNT_EXACT, CATCH_COUNT_ESTIMATE, CATCH_COUNT_NONE]
+
+# postgres text search config (language) for body text search
+# if changed, recompute stored search vectors with
+# `manage.py backfill_search_vector --all`
+CATCH_TEXT_SEARCH_CONFIG = getattr(
+    settings, 'CATCH_TEXT_SEARCH_CONFIG', 'english')
+
+# rows read from db at a time when streaming search responses
+CATCH_STREAM_CHUNK_SIZE = getattr(
+    settings, 'CATCH_STREAM_CHUNK_SIZE', 100)
+
+# `since` searches leave out annos modified in the last seconds: a write that
+# commits late might have an older `modified` than rows already synced
+CATCH_SYNC_LAG_SECONDS = getattr(settings, 'CATCH_SYNC_LAG_SECONDS', 5)
+
 # default platform for annotatorjs annotations
 CATCH_DEFAULT_PLATFORM_NAME = getattr(
     settings, 'CATCH_DEFAULT_PLATFORM_NAME', 'hxat-edx_v1.0')
@@ -34,6 +69,10 @@ CATCH_DEFAULT_PLATFORM_NAME = getattr(
 CATCH_ADMIN_GROUP_ID = getattr(
     settings, 'CATCH_ADMIN_GROUP_ID', '__admin__')
 
+# catcha properties a json merge patch can change; others are kept by catchpy
+CATCH_PATCH_PROPERTIES = [
+    'schema_version', 'creator', 'permissions', 'platform', 'body', 'target']
+
 # purpose for annotation
 PURPOSE_COMMENTING = 'commenting'
 PURPOSE_REPLYING = 'replying'
@@ -1,6 +1,14 @@
 import json
+import jsonschema
+import logging
 import os
 
+from .json_schema_compiler import compile_schema
+from .json_schema_compiler import UnsupportedSchemaError
+
+
+logger = logging.getLogger(__name__)
+
 
 # read api spec from file
 here = os.path.abspath(os.path.dirname(__file__))
@@ -19,3 +27,13 @@ del(definitions['Annotation'])
 jschema['definitions'] = definitions
 
 CATCH_JSON_SCHEMA = jschema
+
+# validators are reusable: check and resolve refs once per process
+CATCH_JSON_VALIDATOR = jsonschema.Draft4Validator(CATCH_JSON_SCHEMA)
+
+# generated python code for the catcha schema, only says valid or not
+try:
+    CATCH_JSON_FAST_CHECK = compile_schema(CATCH_JSON_SCHEMA)
+except UnsupportedSchemaError as e:
+    logger.warning('catcha json schema not compiled: {}'.format(e))
+    CATCH_JSON_FAST_CHECK = None
@@ -1,12 +1,23 @@
+from collections import Counter
+from collections import OrderedDict
 from datetime import datetime
 import dateutil
 import dateutil.parser
 import logging
 
+from django.db import connection
 from django.db import DatabaseError
 from django.db import DataError
 from django.db import IntegrityError
 from django.db import transaction
+from django.db.models import Case
+from django.db.models import DateTimeField
+from django.db.models import F
+from django.db.models import IntegerField
+from django.db.models import Value
+from django.db.models import When
+from django.db.models import prefetch_related_objects
+from django.utils import timezone
 
 from .errors import AnnoError
 from .errors import DuplicateAnnotationIdError
@@ -18,11 +29,15 @@ from .errors import MissingAnnotationError
 from .errors import NoPermissionForOperationError
 from .errors import TargetAnnotationForReplyMissingError
 
+from .anno_defaults import CATCH_IMPORT_CHUNK_SIZE
 from .anno_defaults import MEDIA_TYPES, ANNO
 from .anno_defaults import PURPOSES
 from .anno_defaults import PURPOSE_COMMENTING, PURPOSE_REPLYING, PURPOSE_TAGGING
 from .anno_defaults import RESOURCE_TYPES
-from .models import Anno, Tag, Target
+from .models import Anno, CollectionWatermark, Tag, Target
+from .models import TAG_NAME_MAX_LENGTH
+from .search import search_vector_for_text
+from .tag_cache import tag_cache
 from .utils import generate_uid
 
 
@@ -41,12 +56,44 @@ class CRUD(object):
     def get_anno(cls, anno_id):
         '''filters out the soft deleted instances.'''
         try:
-            anno = Anno.objects.get(pk=anno_id)
+            return Anno.live.get(pk=anno_id)
         except Anno.DoesNotExist as e:
             return None
-        if anno.anno_deleted:
-            return None
-        return anno
+
+
+    @classmethod
+    def preload_related(cls, anno_list):
+        '''bulk fetch what's needed to serialize a list of annos.
+
+        tags, targets and parents (and parents targets) are prefetched; this
+        keeps the number of queries fixed regardless of len(anno_list).
+        '''
+        if not anno_list:
+            return anno_list
+
+        prefetch_related_objects(
+            anno_list, 'anno_tags', 'target_set',
+            'anno_reply_to', 'anno_reply_to__target_set')
+        return anno_list
+
+
+    @classmethod
+    def _add_reply_counts(cls, deltas):
+        '''adds to parents reply_count; deltas is dict parent_id -> delta.
+
+        also sets parents modified date: totalReplies is part of the parent,
+        and Last-Modified of a single anno is its modified date.
+        '''
+        deltas = dict((parent_id, delta) for (parent_id, delta) in
+                      deltas.items() if parent_id is not None and delta)
+        if not deltas:
+            return
+        Anno._default_manager.filter(anno_id__in=list(deltas)).update(
+            modified=timezone.now(),
+            reply_count=F('reply_count') + Case(
+                *[When(anno_id=parent_id, then=Value(delta))
+                  for (parent_id, delta) in deltas.items()],
+                output_field=IntegerField()))
 
 
     @classmethod
@@ -55,6 +102,20 @@ class CRUD(object):
 
         reply_to is the actual Anno model
         '''
+        body = cls._parse_body_items(catcha)
+        if body['reply_to'] is not None:
+            reply_to = body['reply_to']
+            body['reply_to'] = cls.get_anno(reply_to)
+            if body['reply_to'] is None:
+                raise TargetAnnotationForReplyMissingError(
+                    'missing parent({}) for reply anno({})'.format(
+                        reply_to, catcha['id']))
+        return body
+
+
+    @classmethod
+    def _parse_body_items(cls, catcha):
+        '''same as _group_body_items, but reply_to is the parent anno_id.'''
         body = catcha['body']
         reply = False
         body_text = ''
@@ -76,7 +137,6 @@ class CRUD(object):
                      'in anno({})').format(
                            ','.join(PURPOSES), b['purpose'], catcha['id']))
         reply_to = None
-        reply_to_anno = None
         if reply:
             reply_to = cls.find_targets_of_mediatype(catcha, ANNO)
             if not reply_to:
@@ -85,29 +145,110 @@ class CRUD(object):
                         catcha['id']))
             # BEWARE: not checking, grabbing the first target
             reply_to = reply_to[0]['source']
-            reply_to_anno = cls.get_anno(reply_to)
-            if reply_to_anno is None:
-                raise TargetAnnotationForReplyMissingError(
-                    'missing parent({}) for reply anno({})'.format(
-                        reply_to, catcha['id']))
 
         return {'text': body_text,
                 'format': body_format,
-                'reply_to': reply_to_anno,
+                'reply_to': reply_to,
                 'tags': tags}
 
+    @classmethod
+    def _platform_columns(cls, catcha):
+        '''values for Anno columns that copy catcha['platform'].'''
+        platform = catcha.get('platform', {})
+        return {
+            'context_id': platform.get('context_id', None),
+            'collection_id': platform.get('collection_id', None),
+            'target_source_id': platform.get('target_source_id', None),
+        }
+
+
+    @classmethod
+    def _collection(cls, anno):
+        '''(context_id, collection_id) of anno, as in CollectionWatermark.'''
+        return (anno.context_id, anno.collection_id)
+
+
+    @classmethod
+    def touch_collections(cls, collections):
+        '''marks collections as written: moves their watermark forward.
+
+        call it last in the transaction of the write: it locks the
+        watermark rows until commit, so concurrent writes to the same
+        collection wait there, and their watermark is set after this
+        one commits. the watermark always changes, even within the same
+        microsecond, as search_cache keys responses on it.
+        '''
+        collections = sorted(set(
+            c for c in collections if c[0] is not None and c[1] is not None))
+        if not collections:
+            return
+
+        # clock_timestamp() is evaluated after the row lock is acquired
+        sql = (
+            'INSERT INTO {table} AS w ({context_id}, {collection_id}, '
+            '{modified}) VALUES {values} '
+            'ON CONFLICT ({context_id}, {collection_id}) DO UPDATE '
+            'SET {modified} = GREATEST('
+            "w.{modified} + interval '1 microsecond', clock_timestamp())"
+        ).format(
+            table=connection.ops.quote_name(
+                CollectionWatermark._meta.db_table),
+            context_id=connection.ops.quote_name('context_id'),
+            collection_id=connection.ops.quote_name('collection_id'),
+            modified=connection.ops.quote_name('modified'),
+            values=', '.join(
+                ['(%s, %s, clock_timestamp())'] * len(collections)))
+        params = [value for c in collections for value in c]
+        with connection.cursor() as cursor:
+            cursor.execute(sql, params)
+
+
     @classmethod
     def _create_taglist(cls, taglist):
-        '''creates tags if do not exist already.'''
-        tags = []  # list of Tag instances
-        for t in taglist:
-            try:
-                tag = Tag.objects.get(tag_name=t)
-            except Tag.DoesNotExist:
-                tag = Tag(tag_name=t)
-                tag.save()
-            tags.append(tag)
-        return tags
+        '''ids of tags in taglist, creates tags if do not exist already.
+
+        runs at most three queries, whatever the number of tags: one select
+        for tags not in tag_cache, one insert for tags not found, and one
+        select for tags inserted meanwhile by a concurrent request.
+        '''
+        names = list(OrderedDict.fromkeys(taglist))  # dedup, keep order
+        tag_ids = tag_cache.get_many(names)
+        missing = [n for n in names if n not in tag_ids]
+        if missing:
+            found = dict(Tag._default_manager.filter(
+                tag_name__in=missing).values_list('tag_name', 'id'))
+            new_names = [n for n in missing if n not in found]
+            if new_names:
+                found.update(cls._insert_tags(new_names))
+                conflicted = [n for n in new_names if n not in found]
+                if conflicted:
+                    found.update(Tag._default_manager.filter(
+                        tag_name__in=conflicted).values_list('tag_name', 'id'))
+            tag_ids.update(found)
+            # ids of tags created in a rolled back transaction are not valid
+            transaction.on_commit(lambda: tag_cache.set_many(found))
+        return [tag_ids[n] for n in names]
+
+
+    @classmethod
+    def _insert_tags(cls, names):
+        '''inserts tags, skips the ones that exist; returns name -> id.'''
+        sql = (
+            'INSERT INTO {table} ({tag_name}, {created}) VALUES {values} '
+            'ON CONFLICT ({tag_name}) DO NOTHING '
+            'RETURNING {tag_name}, {id}').format(
+                table=connection.ops.quote_name(Tag._meta.db_table),
+                tag_name=connection.ops.quote_name('tag_name'),
+                created=connection.ops.quote_name('created'),
+                id=connection.ops.quote_name('id'),
+                values=', '.join(['(%s, %s)'] * len(names)))
+        now = timezone.now()
+        params = []
+        for name in names:
+            params.extend([name, now])
+        with connection.cursor() as cursor:
+            cursor.execute(sql, params)
+            return dict(cursor.fetchall())
 
 
     @classmethod
@@ -142,23 +283,7 @@ class CRUD(object):
         # fetch reply-to if it's a reply
         body = cls._group_body_items(catcha)
 
-        # fill up derived properties in catcha
-        catcha['totalReplies'] = 0
-
-        a = Anno(
-            anno_id=catcha['id'],
-            schema_version=catcha['schema_version'],
-            creator_id=catcha['creator']['id'],
-            creator_name=catcha['creator']['name'],
-            anno_reply_to=body['reply_to'],
-            can_read=catcha['permissions']['can_read'],
-            can_update=catcha['permissions']['can_update'],
-            can_delete=catcha['permissions']['can_delete'],
-            can_admin=catcha['permissions']['can_admin'],
-            body_text=body['text'],
-            body_format=body['format'],
-            raw=catcha,
-        )
+        a = cls._new_anno(catcha, body)
 
         # validate  target objects
         target_list = cls._create_targets_for_annotation(a, catcha)
@@ -170,8 +295,7 @@ class CRUD(object):
                 a.save()  # need to save before setting relationships
                 for t in target_list:
                     t.save()
-                tags = cls._create_taglist(body['tags'])
-                a.anno_tags = tags
+                a.anno_tags = cls._create_taglist(body['tags'])
 
                 if is_copy:  # keep original date if it's a copy
                     a.created = cls._get_original_created(catcha)
@@ -180,6 +304,10 @@ class CRUD(object):
 
                 a.raw['created'] = a.created.replace(microsecond=0).isoformat()
                 a.save()
+
+                if not a.anno_deleted:
+                    cls._add_reply_counts({a.anno_reply_to_id: 1})
+                cls.touch_collections([cls._collection(a)])
         except IntegrityError as e:
             msg = 'integrity error creating anno({}): {}'.format(
                 catcha['id'], e)
@@ -193,6 +321,30 @@ class CRUD(object):
             return a
 
 
+    @classmethod
+    def _new_anno(cls, catcha, body):
+        '''Anno instance for catcha, not saved.'''
+        # fill up derived properties in catcha
+        catcha['totalReplies'] = 0
+
+        return Anno(
+            anno_id=catcha['id'],
+            schema_version=catcha['schema_version'],
+            creator_id=catcha['creator']['id'],
+            creator_name=catcha['creator']['name'],
+            anno_reply_to=body['reply_to'],
+            can_read=catcha['permissions']['can_read'],
+            can_update=catcha['permissions']['can_update'],
+            can_delete=catcha['permissions']['can_delete'],
+            can_admin=catcha['permissions']['can_admin'],
+            body_text=body['text'],
+            body_format=body['format'],
+            body_search=search_vector_for_text(body['text']),
+            raw=catcha,
+            **cls._platform_columns(catcha)
+        )
+
+
     @classmethod
     def _get_original_created(cls, catcha):
         '''convert `created` from catcha or return current date.'''
@@ -213,7 +365,7 @@ class CRUD(object):
     def _update_from_webannotation(cls, anno, catcha):
         '''updates anno according to catcha input.
 
-        recreates list of tags and targets every time
+        only targets and tags that changed are written.
         '''
         # fetch reply-to if it's a reply
         body = cls._group_body_items(catcha)
@@ -223,6 +375,8 @@ class CRUD(object):
         catcha['id'] = anno.anno_id
 
         # update the annotation object
+        moved = cls._moved_reply(anno, body['reply_to'])
+        collections = [cls._collection(anno)]
         anno.schema_version = catcha['schema_version']
         anno.creator_id = catcha['creator']['id']
         anno.creator_name = catcha['creator']['name']
@@ -233,25 +387,22 @@ class CRUD(object):
         anno.can_admin = catcha['permissions']['can_admin']
         anno.body_text = body['text']
         anno.body_format = body['format']
+        anno.body_search = search_vector_for_text(body['text'])
         anno.raw = catcha
+        for (column, value) in cls._platform_columns(catcha).items():
+            setattr(anno, column, value)
 
         # validate  target objects
         target_list = cls._create_targets_for_annotation(anno, catcha)
 
         try:
             with transaction.atomic():
-                # remove all targets
-                cls._delete_targets(anno)
-                # persist target objects
-                for t in target_list:
-                    t.save()
-                # dissociate tags from annotation
-                anno.anno_tags.clear()
-                # create tags
-                if body['tags']:
-                    tags = cls._create_taglist(body['tags'])
-                    anno.anno_tags = tags
+                cls._update_targets(anno, target_list)
+                cls._update_tags(anno, body['tags'])
                 anno.save()
+                cls._add_reply_counts(moved)
+                collections.append(cls._collection(anno))
+                cls.touch_collections(collections)
         except (IntegrityError, DataError, DatabaseError) as e:
             msg = '-failed to create anno({}): {}'.format(anno.anno_id, str(e))
             logger.error(msg, exc_info=True)
@@ -261,11 +412,46 @@ class CRUD(object):
 
 
     @classmethod
-    def _delete_targets(cls, anno):
-        targets = anno.target_set.all()
-        for t in targets:
-            t.delete()
-        return targets
+    def _moved_reply(cls, anno, reply_to):
+        '''reply_count deltas for anno now being a reply to `reply_to`.'''
+        old_parent_id = anno.anno_reply_to_id
+        new_parent_id = reply_to.anno_id if reply_to is not None else None
+        if old_parent_id == new_parent_id:
+            return {}
+        return {old_parent_id: -1, new_parent_id: 1}
+
+
+    @classmethod
+    def _update_targets(cls, anno, target_list):
+        '''deletes stale targets and creates new ones, keeps the same ones.'''
+        new_targets = list(target_list)
+        stale = []
+        for t in anno.target_set.all():
+            match = next((n for n in new_targets if (
+                n.target_source, n.target_media) == (
+                    t.target_source, t.target_media)), None)
+            if match is None:
+                stale.append(t.pk)
+            else:
+                new_targets.remove(match)
+        if stale:
+            Target._default_manager.filter(pk__in=stale).delete()
+        if new_targets:
+            Target._default_manager.bulk_create(new_targets)
+
+
+    @classmethod
+    def _update_tags(cls, anno, taglist):
+        '''links tags in taglist to anno, unlinks the ones not in it.'''
+        current = dict(anno.anno_tags.values_list('tag_name', 'id'))
+        names = set(taglist)
+        stale = [tag_id for (name, tag_id) in current.items()
+                 if name not in names]
+        if stale:
+            anno.anno_tags.remove(*stale)
+        new_names = [name for name in taglist if name not in current]
+        if new_names:
+            anno.anno_tags.add(*cls._create_taglist(new_names))
 
 
     @classmethod
@@ -278,6 +464,8 @@ class CRUD(object):
         with transaction.atomic():
             anno.delete()
             anno.save()
+            cls._add_reply_counts({anno.anno_reply_to_id: -1})
+            cls.touch_collections([cls._collection(anno)])
         return anno
 
 
@@ -313,7 +501,7 @@ class CRUD(object):
     def update_anno(cls, anno, catcha):
         '''updates anno according to catcha input.
 
-        recreates list of tags and targets every time
+        only targets and tags that changed are written.
         '''
         if anno.anno_deleted:
             logger.error('try to update deleted anno({})'.format(anno.anno_id))
@@ -329,6 +517,79 @@ class CRUD(object):
         return anno
 
 
+    @classmethod
+    def patch_anno(cls, anno, catcha, changed):
+        '''updates anno columns derived from `changed` catcha properties.
+
+        expects catcha to be anno.raw with a merge patch applied, and the
+        `changed` properties validated already.
+        '''
+        if anno.anno_deleted:
+            logger.error('try to patch deleted anno({})'.format(anno.anno_id))
+            raise MissingAnnotationError(
+                'anno({}) not found'.format(anno.anno_id))
+
+        catcha['totalReplies'] = anno.total_replies
+        catcha['id'] = anno.anno_id
+        fields = ['raw', 'modified']
+        body = None
+        target_list = None
+        moved = {}
+        try:
+            if 'body' in changed or 'target' in changed:
+                # reply_to depends on both body and target
+                body = cls._group_body_items(catcha)
+                moved = cls._moved_reply(anno, body['reply_to'])
+                anno.anno_reply_to = body['reply_to']
+                fields.append('anno_reply_to')
+            if 'body' in changed:
+                anno.body_text = body['text']
+                anno.body_format = body['format']
+                anno.body_search = search_vector_for_text(body['text'])
+                fields.extend(['body_text', 'body_format', 'body_search'])
+            if 'target' in changed:
+                target_list = cls._create_targets_for_annotation(anno, catcha)
+                fields.append('target_type')
+        except AnnoError as e:
+            logger.error('failed to patch anno({}): {}'.format(
+                anno.anno_id, e), exc_info=True)
+            raise e
+
+        if 'schema_version' in changed:
+            anno.schema_version = catcha['schema_version']
+            fields.append('schema_version')
+        if 'creator' in changed:
+            anno.creator_id = catcha['creator']['id']
+            anno.creator_name = catcha['creator']['name']
+            fields.extend(['creator_id', 'creator_name'])
+        if 'permissions' in changed:
+            for p in ['can_read', 'can_update', 'can_delete', 'can_admin']:
+                setattr(anno, p, catcha['permissions'][p])
+                fields.append(p)
+        collections = [cls._collection(anno)]
+        if 'platform' in changed:
+            for (column, value) in cls._platform_columns(catcha).items():
+                setattr(anno, column, value)
+                fields.append(column)
+        anno.raw = catcha
+
+        try:
+            with transaction.atomic():
+                if target_list is not None:
+                    cls._update_targets(anno, target_list)
+                if 'body' in changed:
+                    cls._update_tags(anno, body['tags'])
+                anno.save(update_fields=fields)
+                cls._add_reply_counts(moved)
+                collections.append(cls._collection(anno))
+                cls.touch_collections(collections)
+        except (IntegrityError, DataError, DatabaseError) as e:
+            msg = '-failed to patch anno({}): {}'.format(anno.anno_id, str(e))
+            logger.error(msg, exc_info=True)
+            raise InvalidInputWebAnnotationError(msg)
+        return anno
+
+
     @classmethod
     def create_anno(cls, catcha, is_copy=False):
         '''creates new instance of Anno model.
@@ -373,14 +634,13 @@ class CRUD(object):
 
         discarded = []
         imported = []
-        for c in catcha_list:
-            # import does not change the id
-            try:
-                anno = CRUD.create_anno(c, is_copy=True)
-            except AnnoError as e:
+        # import does not change the id
+        errors = cls.create_annos_in_bulk(catcha_list)
+        for (c, e) in zip(catcha_list, errors):
+            if e is not None:
                 msg = 'error during import of anno({}): {}'.format(
                     c['id'], str(e))
-                logger.error(msg, exc_info=True)
+                logger.error(msg)
                 c['error'] = msg
                 discarded.append(c)
             else:
@@ -408,16 +668,19 @@ class CRUD(object):
 
         discarded = []
         copied = []
+        catcha_list = []
         for a in anno_list:
             catcha = a.serialized
             # TODO: pay attention when in compat-mode: anno_id must-be-integer
             catcha['id'] = generate_uid()  # create new id
-            try:
-                anno = CRUD.create_anno(catcha, is_copy=True)
-            except AnnoError as e:
+            catcha_list.append(catcha)
+
+        errors = cls.create_annos_in_bulk(catcha_list)
+        for (a, catcha, e) in zip(anno_list, catcha_list, errors):
+            if e is not None:
                 msg = 'error during copy of anno({}): {}'.format(
                     a.anno_id, str(e))
-                logger.error(msg, exc_info=True)
+                logger.error(msg)
                 catcha['error'] = msg
                 discarded.append(catcha)
             else:
@@ -431,3 +694,139 @@ class CRUD(object):
             'failure': discarded,
         }
         return resp
+
+
+    @classmethod
+    def create_annos_in_bulk(cls, catcha_list):
+        '''same as create_anno(is_copy=True) for each catcha, in chunks.
+
+        returns list of AnnoError, or None if created, in catcha_list order.
+        each chunk is inserted with bulk_create in one transaction; rows
+        that would fail there go through create_anno one by one.
+        '''
+        errors = []
+        for i in range(0, len(catcha_list), CATCH_IMPORT_CHUNK_SIZE):
+            chunk = catcha_list[i:i + CATCH_IMPORT_CHUNK_SIZE]
+            errors.extend(cls._create_chunk(chunk))
+        return errors
+
+
+    @classmethod
+    def _create_chunk(cls, chunk):
+        errors = [None] * len(chunk)
+        one_by_one = []  # indexes of rows to create with create_anno
+        prepared = []    # (index, anno, created, targets, tags)
+
+        bodies = {}
+        for (index, catcha) in enumerate(chunk):
+            try:
+                bodies[index] = cls._parse_body_items(catcha)
+            except AnnoError as e:
+                errors[index] = e
+            except Exception:
+                one_by_one.append(index)  # let create_anno deal with it
+
+        ids = [c['id'] for c in chunk if 'id' in c]
+        existing_ids = set(Anno._default_manager.filter(
+            anno_id__in=ids).values_list('anno_id', flat=True))
+        parent_ids = [b['reply_to'] for b in bodies.values() if b['reply_to']]
+        parents = set(Anno.live.filter(
+            anno_id__in=parent_ids).values_list('anno_id', flat=True))
+
+        # same checks as in create_anno, in catcha_list order, so rows
+        # that depend on rows created before get the same result
+        seen_ids = set()
+        one_by_one_ids = set()
+        for (index, catcha) in enumerate(chunk):
+            if index not in bodies:
+                continue
+            body = bodies[index]
+            anno_id = catcha.get('id', None)
+
+            is_duplicate = anno_id is None or (
+                anno_id in existing_ids or anno_id in seen_ids)
+            seen_ids.add(anno_id)
+            is_long_tag = any(len(t) > TAG_NAME_MAX_LENGTH for t in body['tags'])
+            if is_duplicate or is_long_tag or body['reply_to'] in one_by_one_ids:
+                one_by_one.append(index)
+                one_by_one_ids.add(anno_id)
+                continue
+
+            if body['reply_to'] is not None and body['reply_to'] not in parents:
+                errors[index] = TargetAnnotationForReplyMissingError(
+                    'missing parent({}) for reply anno({})'.format(
+                        body['reply_to'], catcha['id']))
+                continue
+
+            try:
+                reply_to = body['reply_to']
+                body['reply_to'] = None
+                a = cls._new_anno(catcha, body)
+                a.anno_reply_to_id = reply_to
+                targets = cls._create_targets_for_annotation(a, catcha)
+                created = cls._get_original_created(catcha)
+                a.anno_deleted = catcha.get('deleted', False)
+                a.raw['created'] = created.replace(microsecond=0).isoformat()
+            except AnnoError as e:
+                errors[index] = e
+                continue
+            except Exception:
+                one_by_one.append(index)
+                one_by_one_ids.add(anno_id)
+                continue
+
+            a.sync_is_public()
+            prepared.append((index, a, created, targets, body['tags']))
+            if not a.anno_deleted:
+                parents.add(anno_id)
+
+        try:
+            cls._bulk_insert(prepared)
+        except (IntegrityError, DataError, DatabaseError) as e:
+            logger.error(
+                'bulk create of {} annos failed, creating one by one: '
+                '{}'.format(len(prepared), e), exc_info=True)
+            one_by_one.extend([p[0] for p in prepared])
+
+        for index in sorted(one_by_one):
+            try:
+                cls.create_anno(chunk[index], is_copy=True)
+            except AnnoError as e:
+                errors[index] = e
+        return errors
+
+
+    @classmethod
+    def _bulk_insert(cls, prepared):
+        '''inserts annos, targets, tags and tag links in one transaction.'''
+        if not prepared:
+            return
+
+        annos = [p[1] for p in prepared]
+        tag_names = sorted(set(name for p in prepared for name in p[4]))
+        with transaction.atomic():
+            Anno._default_manager.bulk_create(annos)
+            # bulk_create fills `created` as auto_now_add; restore originals
+            Anno._default_manager.filter(
+                anno_id__in=[a.anno_id for a in annos]).update(
+                    created=Case(
+                        *[When(anno_id=p[1].anno_id, then=Value(p[2]))
+                          for p in prepared],
+                        output_field=DateTimeField()))
+            for (index, a, created, targets, names) in prepared:
+                a.created = created
+
+            Target._default_manager.bulk_create(
+                [t for p in prepared for t in p[3]])
+            cls._add_reply_counts(Counter(
+                p[1].anno_reply_to_id for p in prepared
+                if not p[1].anno_deleted))
+
+            tag_ids = dict(zip(tag_names, cls._create_taglist(tag_names)))
+
+            AnnoTag = Anno.anno_tags.through
+            AnnoTag._default_manager.bulk_create([
+                AnnoTag(anno_id=a.anno_id, tag_id=tag_ids[name])
+                for (index, a, created, targets, names) in prepared
+                for name in set(names)])
+            cls.touch_collections(cls._collection(a) for a in annos)
@@ -0,0 +1,153 @@
+from functools import wraps
+import random
+import threading
+import time
+
+from django.conf import settings
+from django.core.cache import caches
+
+
+# aliases in settings.DATABASES that are read replicas of 'default'
+CATCH_DB_REPLICAS = getattr(settings, 'CATCH_DB_REPLICAS', [])
+
+# seconds after a write that reads by the same user go to 'default', so
+# users see their own changes even if replicas lag behind; 0 disables
+CATCH_DB_REPLICA_STICKY_SECONDS = getattr(
+    settings, 'CATCH_DB_REPLICA_STICKY_SECONDS', 5)
+
+# django cache to keep users that recently wrote, shared by processes; if
+# not set, each process keeps its own, and a user is only sticky to
+# 'default' in the process that handled the write.
+CATCH_DB_REPLICA_STICKY_CACHE_ALIAS = getattr(
+    settings, 'CATCH_DB_REPLICA_STICKY_CACHE_ALIAS', None)
+
+
+_state = threading.local()
+
+
+class StickyUsers(object):
+    '''users that wrote in the last `ttl` seconds.'''
+
+    def __init__(self, ttl=CATCH_DB_REPLICA_STICKY_SECONDS,
+                 cache_alias=CATCH_DB_REPLICA_STICKY_CACHE_ALIAS):
+        self.ttl = ttl
+        self.cache_alias = cache_alias
+        self.local = {}  # user_id -> expire_at
+        self.lock = threading.Lock()
+
+    @property
+    def backend(self):
+        if self.cache_alias is None:
+            return None
+        return caches[self.cache_alias]
+
+    def cache_key(self, user_id):
+        return 'catchpy:sticky:{}'.format(user_id)
+
+    def mark(self, user_id):
+        if self.ttl <= 0:
+            return
+        if self.backend is not None:
+            self.backend.set(self.cache_key(user_id), True, self.ttl)
+            return
+
+        now = time.time()
+        with self.lock:
+            self.local[user_id] = now + self.ttl
+            if len(self.local) > 1000:
+                # drop expired users, so it doesn't grow forever
+                self.local = {
+                    u: t for (u, t) in self.local.items() if t > now}
+
+    def is_sticky(self, user_id):
+        if self.ttl <= 0:
+            return False
+        if self.backend is not None:
+            return self.backend.get(self.cache_key(user_id), False)
+        return self.local.get(user_id, 0) > time.time()
+
+    def clear(self):
+        '''forgets this process' users; shared cache is not cleared.'''
+        with self.lock:
+            self.local.clear()
+
+
+sticky_users = StickyUsers()
+
+
+class ReplicaRouter(object):
+    '''sends reads to a replica, when the current request allows it.
+
+    requests opt in via the `route_reads` view decorator; everything
+    else, including all writes, uses 'default'.
+    '''
+
+    def db_for_read(self, model, **hints):
+        return getattr(_state, 'replica', None)
+
+    def db_for_write(self, model, **hints):
+        return None
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # replicas have the same data as 'default'
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        if db in CATCH_DB_REPLICAS:
+            return False
+        return None
+
+
+def route_reads(read_methods=None):
+    '''view decorator: reads go to a replica for requests in read_methods.
+
+    read_methods=None means all methods, for views that never write. for
+    other methods, a successful response marks the user as sticky: their
+    reads go to 'default' for CATCH_DB_REPLICA_STICKY_SECONDS.
+    '''
+    def _decorator(view_func):
+        def _wrapped(request, *args, **kwargs):
+            user_id = request.catchjwt['userId']
+            is_read = read_methods is None or request.method in read_methods
+
+            previous = getattr(_state, 'replica', None)
+            if is_read and CATCH_DB_REPLICAS and (
+                    not sticky_users.is_sticky(user_id)):
+                # same replica for the whole request, so counts and rows
+                # come from the same snapshot of replication
+                _state.replica = previous or random.choice(CATCH_DB_REPLICAS)
+            else:
+                _state.replica = None
+            try:
+                response = view_func(request, *args, **kwargs)
+            finally:
+                _state.replica = previous
+
+            if not is_read and response.status_code < 400:
+                sticky_users.mark(user_id)
+            return response
+        return wraps(view_func)(_wrapped)
+    return _decorator
+
+
+def stream_routed(iterable):
+    '''iterates with the reads routing of the request that created it.
+
+    for streaming responses, that keep reading from db after the view
+    returned.
+    '''
+    replica = getattr(_state, 'replica', None)  # now, not on first next()
+    return _routed(replica, iter(iterable))
+
+
+def _routed(replica, iterator):
+    while True:
+        previous = getattr(_state, 'replica', None)
+        _state.replica = replica
+        try:
+            item = next(iterator)
+        except StopIteration:
+            return
+        finally:
+            _state.replica = previous
+        yield item
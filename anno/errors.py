@@ -76,3 +76,7 @@ class RawModelOutOfSynchError(AnnoError):
 class UnknownResponseFormatError(AnnoError):
     '''output error not catch-webannotation nor annotatorjs.'''
     status = HTTPStatus.BAD_REQUEST  # 400
+
+class InvalidSearchParameterError(AnnoError):
+    '''search querystring param is malformed.'''
+    status = HTTPStatus.BAD_REQUEST  # 400
@@ -0,0 +1,40 @@
+from django.contrib.postgres.indexes import GinIndex
+from django.db.models import Index
+
+
+class PartialIndex(Index):
+    '''index over the rows that match `where`, an sql condition.
+
+    planner only picks it for queries whose WHERE implies `where`, e.g.
+    `anno_deleted = false` for queries on Anno.live.
+    '''
+
+    def __init__(self, fields=[], name=None, where=None):
+        if not where:
+            raise ValueError('PartialIndex.where is required.')
+        self.where = where
+        super(PartialIndex, self).__init__(fields, name)
+
+    def deconstruct(self):
+        (path, args, kwargs) = super(PartialIndex, self).deconstruct()
+        kwargs['where'] = self.where
+        return (path, args, kwargs)
+
+    def get_sql_create_template_values(self, model, schema_editor, using):
+        parameters = super(PartialIndex, self).get_sql_create_template_values(
+            model, schema_editor, using)
+        parameters['extra'] = '{} WHERE {}'.format(
+            parameters['extra'], self.where)
+        return parameters
+
+    def __repr__(self):
+        return "<{}: fields='{}', where='{}'>".format(
+            self.__class__.__name__, ', '.join(self.fields), self.where)
+
+
+class PartialGinIndex(PartialIndex):
+    suffix = GinIndex.suffix
+
+    def create_sql(self, model, schema_editor):
+        return super(PartialGinIndex, self).create_sql(
+            model, schema_editor, using=' USING gin')
@@ -1,7 +1,6 @@
 from datetime import datetime
 from dateutil import tz
 import json
-import jsonschema
 import logging
 from pyld import jsonld
 
@@ -13,16 +12,24 @@ from .anno_defaults import CATCH_JSONLD_CONTEXT_IRI
 from .anno_defaults import RESOURCE_TYPE_LIST, RESOURCE_TYPE_CHOICE
 from .anno_defaults import CATCH_DEFAULT_PLATFORM_NAME
 from .anno_defaults import PURPOSE_TAGGING
+from .anno_defaults import CATCH_FAST_SCHEMA_VALIDATION
+from .catch_json_schema import CATCH_JSON_FAST_CHECK
 from .catch_json_schema import CATCH_JSON_SCHEMA
+from .catch_json_schema import CATCH_JSON_VALIDATOR
 from .errors import RawModelOutOfSynchError
 from .errors import InconsistentAnnotationError
 from .errors import InvalidAnnotationCreatorError
 from .errors import InvalidInputWebAnnotationError
+from .jsonld_cache import document_loader
+from .jsonld_translator import translate_for_context
 
 from .utils import string_to_number
 
 logger = logging.getLogger(__name__)
 
+# resolve contexts via local cache, not the network, for every request
+JSONLD_OPTIONS = {'documentLoader': document_loader}
+
 
 class AnnoJS(object):
     '''class methods to handle annotatorjs json.
@@ -651,8 +658,13 @@ class Catcha(object):
     @classmethod
     def check_json_schema(cls, catcha):
         '''validate input catcha against catcha json schema.'''
+        if CATCH_FAST_SCHEMA_VALIDATION and CATCH_JSON_FAST_CHECK is not None:
+            if CATCH_JSON_FAST_CHECK(catcha):
+                return catcha
+            # invalid; let jsonschema say why
+
         try:
-            jsonschema.Draft4Validator(CATCH_JSON_SCHEMA).validate(catcha)
+            CATCH_JSON_VALIDATOR.validate(catcha)
             return catcha
         except Exception as e:
             msg = ('failed to validate input catcha({}) against catch json '
@@ -661,6 +673,28 @@ class Catcha(object):
             raise InvalidInputWebAnnotationError(msg)
 
 
+    @classmethod
+    def check_json_schema_properties(cls, catcha, properties):
+        '''validate only `properties` of catcha, and that required ones exist.
+
+        for patched catchas: the other properties were validated when stored.
+        '''
+        errors = ['required property({}) missing'.format(p)
+                  for p in CATCH_JSON_SCHEMA['required'] if p not in catcha]
+        for p in properties:
+            schema = CATCH_JSON_SCHEMA['properties'].get(p, None)
+            if schema is not None and p in catcha:
+                errors.extend(
+                    '{}: {}'.format(p, e.message) for e in
+                    CATCH_JSON_VALIDATOR.iter_errors(catcha[p], schema))
+        if errors:
+            msg = ('failed to validate input catcha({}) against catch json '
+                   'schema: {}').format(catcha.get('id', 'NA'), errors[0])
+            logger.error(msg)
+            raise InvalidInputWebAnnotationError(msg)
+        return catcha
+
+
     @classmethod
     def check_for_create_conflicts(cls, catcha, requesting_user):
         '''check for conflicts in semantics.
@@ -710,7 +744,8 @@ class Catcha(object):
     def expand_compact_for_context(cls, annotation, context):
         '''translate property names to given context vocabs
 
-        expands using its @context and compacts using given context
+        expands using its @context and compacts using given context; skips
+        jsonld processing when a compiled translator can rename properties.
         '''
         try:
             local_context = annotation['@context']
@@ -720,8 +755,19 @@ class Catcha(object):
             logger.error(msg, exc_info=True)
             raise InvalidInputWebAnnotationError(msg)
 
+        translated = translate_for_context(annotation, context)
+        if translated is not None:
+            return translated
+
+        return cls.jsonld_expand_compact(annotation, local_context, context)
+
+
+    @classmethod
+    def jsonld_expand_compact(cls, annotation, local_context, context):
+        '''full jsonld processing, for contexts not handled by translator.'''
         try:
-            compacted = jsonld.compact(annotation, local_context)
+            compacted = jsonld.compact(
+                annotation, local_context, options=JSONLD_OPTIONS)
         except Exception as e:
             msg = 'compaction for context({}) of anno({}) failed: {}'.format(
                 local_context, annotation['id'], str(e))
@@ -729,7 +775,7 @@ class Catcha(object):
             raise e
 
         try:
-            expanded = jsonld.expand(compacted)
+            expanded = jsonld.expand(compacted, options=JSONLD_OPTIONS)
         except Exception as e:
             msg = 'expansion for context({}) of anno({}) failed: {}'.format(
                 local_context, annotation['id'], str(e))
@@ -737,7 +783,8 @@ class Catcha(object):
             raise e
 
         try:
-            translated = jsonld.compact(expanded, context)
+            translated = jsonld.compact(
+                expanded, context, options=JSONLD_OPTIONS)
         except Exception as e:
             msg = 'translation for context({}) of anno({}) failed: {}'.format(
                 context, annotation['id'], str(e))
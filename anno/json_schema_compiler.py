@@ -0,0 +1,173 @@
+import logging
+import numbers
+
+from jsonschema import Draft4Validator
+from jsonschema._utils import uniq  # same uniqueItems semantics as jsonschema
+
+
+logger = logging.getLogger(__name__)
+
+
+class UnsupportedSchemaError(Exception):
+    '''schema uses features the compiler does not generate code for.'''
+    pass
+
+
+# draft4 types as checked by jsonschema: bools are not numbers
+TYPE_CHECKS = {
+    'array': 'isinstance({x}, list)',
+    'boolean': 'isinstance({x}, bool)',
+    'integer': '(isinstance({x}, int) and not isinstance({x}, bool))',
+    'null': '{x} is None',
+    'number': '(isinstance({x}, Number) and not isinstance({x}, bool))',
+    'object': 'isinstance({x}, dict)',
+    'string': 'isinstance({x}, str)',
+}
+
+SUPPORTED_KEYWORDS = set([
+    '$ref', 'type', 'enum', 'required', 'properties', 'items',
+    'minItems', 'uniqueItems',
+    'format',  # no-op: validator has no format_checker
+])
+
+# keywords that don't validate anything, or only matter at the root
+IGNORED_KEYWORDS = set(['definitions', 'description', 'title', 'default'])
+
+
+class SchemaCompiler(object):
+    '''generates python source for a draft4 json schema.
+
+    the generated function returns True if instance is valid, False
+    otherwise; it says nothing about why -- for error messages, validate
+    with jsonschema. only the keywords in SUPPORTED_KEYWORDS are handled,
+    other validation keywords raise UnsupportedSchemaError.
+    '''
+
+    def __init__(self, schema):
+        self.schema = schema
+        self.lines = []
+        self.constants = []
+        self.functions = {}  # id(subschema) -> function name
+        self.pending = []
+
+    def compile(self):
+        '''returns (check function, generated source).'''
+        root = self.function_for(self.schema, root=True)
+        while self.pending:
+            self.emit_function(*self.pending.pop())
+
+        source = '\n'.join(self.lines)
+        namespace = {
+            'Number': numbers.Number,
+            'uniq': uniq,
+            '_constants': self.constants,
+        }
+        exec(compile(source, '<compiled json schema>', 'exec'), namespace)
+        return (namespace[root], source)
+
+    def function_for(self, schema, root=False):
+        if '$ref' in schema:
+            # draft4: siblings of $ref are ignored
+            schema = self.resolve(schema['$ref'])
+        key = id(schema)
+        if key not in self.functions:
+            for keyword in schema:
+                if keyword == 'id' and not root:
+                    raise UnsupportedSchemaError('resolution scope change')
+                if keyword in Draft4Validator.VALIDATORS and (
+                        keyword not in SUPPORTED_KEYWORDS):
+                    raise UnsupportedSchemaError(
+                        'keyword({})'.format(keyword))
+            name = '_check_{}'.format(len(self.functions))
+            self.functions[key] = name
+            self.pending.append((name, schema))
+        return self.functions[key]
+
+    def resolve(self, ref):
+        if not ref.startswith('#'):
+            raise UnsupportedSchemaError('remote $ref({})'.format(ref))
+        resolved = self.schema
+        for part in ref[1:].split('/')[1:]:
+            part = part.replace('~1', '/').replace('~0', '~')
+            try:
+                resolved = resolved[part]
+            except (KeyError, TypeError):
+                raise UnsupportedSchemaError('unresolvable $ref({})'.format(ref))
+        return resolved
+
+    def constant(self, value):
+        self.constants.append(value)
+        return '_constants[{}]'.format(len(self.constants) - 1)
+
+    def emit(self, indent, line):
+        self.lines.append('    ' * indent + line)
+
+    def emit_check(self, indent, schema, x):
+        '''emit `return False` if x not valid; inline or call a function.'''
+        if '$ref' not in schema and set(schema).issubset(
+                set(['type', 'enum', 'format']) | IGNORED_KEYWORDS):
+            for condition in self.conditions(schema, x):
+                self.emit(indent, 'if not {}:'.format(condition))
+                self.emit(indent + 1, 'return False')
+        else:
+            self.emit(indent, 'if not {}({}):'.format(
+                self.function_for(schema), x))
+            self.emit(indent + 1, 'return False')
+
+    def conditions(self, schema, x):
+        '''expressions for the keywords that don't descend into x.'''
+        if 'type' in schema:
+            types = schema['type']
+            if not isinstance(types, list):
+                types = [types]
+            try:
+                checks = [TYPE_CHECKS[t].format(x=x) for t in types]
+            except KeyError as e:
+                raise UnsupportedSchemaError('type({})'.format(e))
+            yield '({})'.format(' or '.join(checks))
+        if 'enum' in schema:
+            yield '({} in {})'.format(x, self.constant(schema['enum']))
+
+    def emit_function(self, name, schema):
+        self.emit(0, 'def {}(x):'.format(name))
+        for condition in self.conditions(schema, 'x'):
+            self.emit(1, 'if not {}:'.format(condition))
+            self.emit(2, 'return False')
+
+        if 'required' in schema or 'properties' in schema:
+            self.emit(1, 'if isinstance(x, dict):')
+            for prop in schema.get('required', []):
+                self.emit(2, 'if {!r} not in x:'.format(prop))
+                self.emit(3, 'return False')
+            for (prop, subschema) in schema.get('properties', {}).items():
+                self.emit(2, 'if {!r} in x:'.format(prop))
+                self.emit_check(3, subschema, 'x[{!r}]'.format(prop))
+
+        if 'minItems' in schema or 'items' in schema or (
+                schema.get('uniqueItems', False)):
+            self.emit(1, 'if isinstance(x, list):')
+            if 'minItems' in schema:
+                self.emit(2, 'if len(x) < {!r}:'.format(schema['minItems']))
+                self.emit(3, 'return False')
+            if schema.get('uniqueItems', False):
+                self.emit(2, 'if not uniq(x):')
+                self.emit(3, 'return False')
+            items = schema.get('items', None)
+            if isinstance(items, dict):
+                self.emit(2, 'for item in x:')
+                self.emit_check(3, items, 'item')
+            elif isinstance(items, list):
+                for (index, subschema) in enumerate(items):
+                    self.emit(2, 'if len(x) > {}:'.format(index))
+                    self.emit_check(3, subschema, 'x[{}]'.format(index))
+
+        self.emit(1, 'return True')
+        self.emit(0, '')
+
+
+def compile_schema(schema):
+    '''function that returns True if instance is valid against schema.'''
+    (check, source) = SchemaCompiler(schema).compile()
+    logger.debug('compiled json schema({}) into {} functions'.format(
+        schema.get('id', 'None'), source.count('def ')))
+    return check
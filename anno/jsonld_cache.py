@@ -0,0 +1,107 @@
+from collections import OrderedDict
+import copy
+import json
+import logging
+import os
+from threading import Lock
+import time
+
+from pyld import jsonld
+
+from .anno_defaults import CATCH_JSONLD_CACHE_SIZE
+from .anno_defaults import CATCH_JSONLD_CACHE_TTL
+from .anno_defaults import CATCH_JSONLD_CONTEXT_IRI
+from .anno_defaults import CATCH_JSONLD_PRELOADED_CONTEXTS
+
+
+logger = logging.getLogger(__name__)
+
+
+# bundled copy of the catch context
+here = os.path.abspath(os.path.dirname(__file__))
+CATCH_CONTEXT_FILEPATH = os.path.join(
+    here, 'static/anno/catch_context_jsonld.json')
+
+
+class DocumentCache(object):
+    '''pyld document loader that avoids fetching remote contexts.
+
+    preloaded documents never expire; documents fetched with `loader` are
+    kept in a LRU of `size` entries, for `ttl` seconds each.
+    '''
+
+    def __init__(self, size=CATCH_JSONLD_CACHE_SIZE,
+                 ttl=CATCH_JSONLD_CACHE_TTL, loader=jsonld.load_document):
+        self.size = size
+        self.ttl = ttl
+        self.loader = loader
+        self.preloaded = {}
+        self.cache = OrderedDict()  # url -> (expire_at, remote_doc)
+        self.lock = Lock()
+
+    def preload(self, url, document):
+        '''document is a json string or already parsed json.'''
+        if not isinstance(document, dict):
+            document = json.loads(document)
+        self.preloaded[url] = {
+            'contextUrl': None,
+            'documentUrl': url,
+            'document': document,
+        }
+
+    def preload_file(self, url, filepath):
+        with open(filepath, 'r') as fh:
+            self.preload(url, fh.read())
+
+    def clear(self):
+        '''drops fetched documents; preloaded are kept.'''
+        with self.lock:
+            self.cache.clear()
+
+    def load_document(self, url):
+        '''the `documentLoader` for pyld.'''
+        remote_doc = self.preloaded.get(url, None)
+        if remote_doc is None:
+            remote_doc = self._fetch(url)
+        # pyld might change the document; keep cached copy pristine
+        return copy.deepcopy(remote_doc)
+
+    def _fetch(self, url):
+        now = time.time()
+        with self.lock:
+            cached = self.cache.get(url, None)
+            if cached is not None:
+                (expire_at, remote_doc) = cached
+                if expire_at > now:
+                    self.cache.move_to_end(url)
+                    return remote_doc
+                del self.cache[url]
+
+        # not holding the lock while waiting on network
+        logger.info('fetching jsonld document({})'.format(url))
+        remote_doc = self.loader(url)
+        if isinstance(remote_doc['document'], str):
+            remote_doc['document'] = json.loads(remote_doc['document'])
+
+        with self.lock:
+            self.cache[url] = (now + self.ttl, remote_doc)
+            self.cache.move_to_end(url)
+            while len(self.cache) > self.size:
+                self.cache.popitem(last=False)
+        return remote_doc
+
+
+def _make_document_cache():
+    cache = DocumentCache()
+    cache.preload_file(CATCH_JSONLD_CONTEXT_IRI, CATCH_CONTEXT_FILEPATH)
+    for (url, filepath) in CATCH_JSONLD_PRELOADED_CONTEXTS.items():
+        cache.preload_file(url, filepath)
+    return cache
+
+
+# per-process cache, used for all jsonld processing in catcha
+document_cache = _make_document_cache()
+
+
+def document_loader(url):
+    return document_cache.load_document(url)
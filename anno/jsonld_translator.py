@@ -0,0 +1,242 @@
+from collections import OrderedDict
+import logging
+import re
+from threading import Lock
+
+from pyld import jsonld
+
+from .anno_defaults import CATCH_JSONLD_CACHE_SIZE
+from .jsonld_cache import document_loader
+
+
+logger = logging.getLogger(__name__)
+
+
+# kinds of property value, as far as translation is concerned
+ID = 'id'            # alias of @id keyword
+IRI = 'iri'          # @type @id: iri or nested object
+VOCAB = 'vocab'      # @type keyword or @type @vocab: term
+LITERAL = 'literal'  # typed literal, scalar only
+ANY = 'any'          # untyped: scalar or nested object
+
+ABSOLUTE_IRI = re.compile(r'^[a-zA-Z][a-zA-Z0-9+.-]*:')
+RELATIVE_IRI = re.compile(r'^[\w-]+$')
+
+
+class NotTranslatableError(Exception):
+    '''input needs full jsonld expand/compact processing.'''
+    pass
+
+
+def process_context(context):
+    '''active context, i.e. term definitions, for given jsonld context.'''
+    options = {'base': '', 'documentLoader': document_loader}
+    initial = {'@base': '', 'mappings': {}, 'inverse': None}
+    return jsonld.JsonLdProcessor().process_context(
+        initial, context, options)
+
+
+def _property_kind(definition):
+    iri = definition['@id']
+    value_type = definition.get('@type', None)
+    if iri == '@type' or value_type == '@vocab':
+        return VOCAB
+    if iri == '@id':
+        return ID
+    if iri.startswith('@'):
+        return None  # other keywords, e.g. @value, @graph
+    if value_type == '@id':
+        return IRI
+    if value_type is not None:
+        return LITERAL
+    return ANY
+
+
+def _signature(definition):
+    return tuple(definition.get(key, None) for key in [
+        '@id', '@type', '@container', '@language', 'reverse'])
+
+
+class ContextTranslator(object):
+    '''renames properties of a jsonld doc from one context to another.
+
+    compiled from the term definitions of both contexts, it handles docs
+    where translating is just a rename -- same iri, type and container -- and
+    gives the same result as compact/expand/compact. for anything else,
+    raises NotTranslatableError.
+    '''
+
+    def __init__(self, source_context, target_context):
+        source = process_context(source_context)
+        target = process_context(target_context)
+        for ctx in [source, target]:
+            if '@vocab' in ctx or '@language' in ctx:
+                raise NotTranslatableError(
+                    'context with default @vocab or @language')
+
+        self.target_context = target_context
+
+        target_terms = {}  # iri -> [term]
+        for (term, definition) in target['mappings'].items():
+            if definition is None or definition['reverse']:
+                continue
+            target_terms.setdefault(definition['@id'], []).append(term)
+
+        self.properties = {}  # source term -> (target term, kind, container)
+        self.vocab = {}  # source term -> target term, for vocab values
+        for (term, definition) in source['mappings'].items():
+            if definition is None or definition['reverse']:
+                continue
+            candidates = target_terms.get(definition['@id'], [])
+            if len(candidates) != 1:
+                continue  # ambiguous, pyld picks depending on value
+            target_term = candidates[0]
+            target_definition = target['mappings'][target_term]
+
+            kind = _property_kind(definition)
+            if kind and _signature(definition) == _signature(target_definition):
+                self.properties[term] = (
+                    target_term, kind, '@container' in definition)
+            if not any(key in target_definition for key in [
+                    '@type', '@container', '@language']):
+                self.vocab[term] = target_term
+
+        # compaction turns iris starting with these into compact iris
+        self.target_prefixes = tuple(
+            d['@id'] for d in target['mappings'].values()
+            if d is not None and ABSOLUTE_IRI.match(d['@id']))
+        # expansion turns `<source term>:suffix` into an absolute iri
+        self.source_terms = frozenset(source['mappings'].keys())
+
+
+    def translate(self, annotation):
+        node = dict(annotation)
+        del node['@context']
+        result = self._node(node)
+        result['@context'] = self.target_context
+        return result
+
+
+    def _node(self, node):
+        if not node:
+            raise NotTranslatableError('empty object')
+
+        result = {}
+        for (key, value) in node.items():
+            try:
+                (term, kind, container) = self.properties[key]
+            except KeyError:
+                raise NotTranslatableError('property({})'.format(key))
+            if term in result:
+                raise NotTranslatableError('duplicate term({})'.format(term))
+
+            if isinstance(value, list):
+                if kind == ID or not (value or container):
+                    raise NotTranslatableError('list in property({})'.format(key))
+                translated = [self._value(kind, v) for v in value]
+                if len(translated) == 1 and not container:
+                    translated = translated[0]  # compaction unwraps arrays
+            else:
+                translated = self._value(kind, value)
+                if container:
+                    translated = [translated]
+            result[term] = translated
+        return result
+
+
+    def _value(self, kind, value):
+        if value is None or isinstance(value, list):
+            raise NotTranslatableError('null or nested list value')
+
+        if isinstance(value, dict):
+            if kind not in [IRI, ANY]:
+                raise NotTranslatableError('object value for {}'.format(kind))
+            node = self._node(value)
+            if kind == IRI and len(node) == 1 and (
+                    self.properties.get(list(value)[0], (None, None))[1] == ID):
+                # compaction turns node references into iri strings
+                raise NotTranslatableError('node reference')
+            return node
+
+        if kind == VOCAB:
+            try:
+                return self.vocab[value]
+            except (KeyError, TypeError):
+                raise NotTranslatableError('vocab value({})'.format(value))
+
+        if kind in [ID, IRI]:
+            if not isinstance(value, str):
+                raise NotTranslatableError('iri value({})'.format(value))
+            if ABSOLUTE_IRI.match(value):
+                prefix = value.split(':', 1)[0]
+                if prefix == '_' or prefix in self.source_terms or (
+                        value.startswith(self.target_prefixes)):
+                    raise NotTranslatableError('iri value({})'.format(value))
+            elif not RELATIVE_IRI.match(value):
+                raise NotTranslatableError('iri value({})'.format(value))
+
+        return value
+
+
+class TranslatorCache(object):
+    '''LRU of compiled translators, by (source context, target context).
+
+    contexts that can't be compiled are cached as None, so they go straight
+    to full jsonld processing. other errors, like failing to fetch a remote
+    context, are not cached: the next call tries again.
+    '''
+
+    def __init__(self, size=CATCH_JSONLD_CACHE_SIZE):
+        self.size = size
+        self.cache = OrderedDict()
+        self.lock = Lock()
+
+    def get_translator(self, source_context, target_context):
+        key = (source_context, target_context)
+        with self.lock:
+            if key in self.cache:
+                self.cache.move_to_end(key)
+                return self.cache[key]
+
+        try:
+            translator = ContextTranslator(source_context, target_context)
+        except NotTranslatableError as e:
+            logger.info(
+                'no translator for context({}) into({}): {}'.format(
+                    source_context, target_context, e))
+            translator = None
+        except Exception as e:
+            logger.warning(
+                'failed to compile translator for context({}) into({}): '
+                '{}'.format(source_context, target_context, e))
+            return None
+
+        with self.lock:
+            self.cache[key] = translator
+            while len(self.cache) > self.size:
+                self.cache.popitem(last=False)
+        return translator
+
+
+translator_cache = TranslatorCache()
+
+
+def translate_for_context(annotation, context):
+    '''annotation translated into context, or None if not translatable.
+
+    only handles contexts given as iri; falls back (returns None) for
+    anything the compiled translator can't prove equivalent.
+    '''
+    source_context = annotation.get('@context', None)
+    if not isinstance(source_context, str) or not isinstance(context, str):
+        return None
+
+    translator = translator_cache.get_translator(source_context, context)
+    if translator is None:
+        return None
+    try:
+        return translator.translate(annotation)
+    except NotTranslatableError as e:
+        logger.debug('annotation({}) not translatable: {}'.format(
+            annotation.get('id', 'None'), e))
+        return None
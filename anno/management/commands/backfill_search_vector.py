@@ -0,0 +1,52 @@
+from django.core.management import BaseCommand
+
+from anno.anno_defaults import CATCH_TEXT_SEARCH_CONFIG
+from anno.models import Anno
+from anno.search import search_vector_for_column
+
+
+class Command(BaseCommand):
+    help = ('fills Anno.body_search, the stored body text search vector, '
+            'in batches; by default only rows missing it.')
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size', dest='batch_size', type=int, default=1000,
+            help='number of annotations updated per statement',
+        )
+        parser.add_argument(
+            '--all', dest='all', action='store_true', default=False,
+            help=('recompute for all annotations; use when '
+                  'CATCH_TEXT_SEARCH_CONFIG changes'),
+        )
+
+    def handle(self, *args, **kwargs):
+        batch_size = kwargs['batch_size']
+
+        query = Anno._default_manager.all()
+        if not kwargs['all']:
+            query = query.filter(body_search__isnull=True)
+        query = query.order_by('anno_id').values_list('anno_id', flat=True)
+
+        total = 0
+        last_id = None
+        while True:
+            # page by anno_id; updated rows drop out of `isnull` filter
+            # anyway, but --all needs to move forward
+            batch = query
+            if last_id is not None:
+                batch = batch.filter(anno_id__gt=last_id)
+            anno_ids = list(batch[:batch_size])
+            if not anno_ids:
+                break
+
+            updated = Anno._default_manager.filter(
+                anno_id__in=anno_ids).update(
+                    body_search=search_vector_for_column('body_text'))
+            total += updated
+            last_id = anno_ids[-1]
+            self.stdout.write('updated {} annos, up to anno({})'.format(
+                total, last_id))
+
+        self.stdout.write('done: {} annos with search vector config({})'.format(
+            total, CATCH_TEXT_SEARCH_CONFIG))
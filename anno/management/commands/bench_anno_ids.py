@@ -0,0 +1,81 @@
+import time
+
+from django.core.management import BaseCommand
+from django.db import connection
+
+from anno.utils import generate_random_uid
+from anno.utils import generate_uid
+
+
+# same primary key as anno_anno; body only to give rows some width
+CREATE_TABLE_SQL = (
+    'CREATE TEMPORARY TABLE bench_anno_ids ('
+    'anno_id varchar(128) PRIMARY KEY, '
+    'created timestamp with time zone NOT NULL DEFAULT now(), '
+    'body_text text)')
+CREATE_LIKE_INDEX_SQL = (
+    'CREATE INDEX bench_anno_ids_like ON bench_anno_ids '
+    '(anno_id varchar_pattern_ops)')
+DROP_TABLE_SQL = 'DROP TABLE IF EXISTS bench_anno_ids'
+INDEX_SIZE_SQL = (
+    "SELECT pg_relation_size('bench_anno_ids_pkey') + "
+    "pg_relation_size('bench_anno_ids_like')")
+
+
+class Command(BaseCommand):
+    help = ('times inserts with random ids and with time ordered ids, into '
+            'a temporary table keyed like anno_anno; reports the size of '
+            'the id indexes after the inserts.')
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--rows', dest='rows', type=int, default=200000,
+            help='number of rows inserted per run',
+        )
+        parser.add_argument(
+            '--batch-size', dest='batch_size', type=int, default=100,
+            help='number of rows per insert statement',
+        )
+
+    def handle(self, *args, **kwargs):
+        rows = kwargs['rows']
+        batch_size = kwargs['batch_size']
+
+        runs = [
+            ('uuid4', lambda: generate_random_uid()),
+            ('uuid7', lambda: generate_uid()),
+            ('random int', lambda: generate_random_uid(must_be_int=True)),
+            ('ordered int', lambda: generate_uid(must_be_int=True)),
+        ]
+        for (name, generate) in runs:
+            (elapsed, index_size) = self.insert(generate, rows, batch_size)
+            self.stdout.write(
+                '{:>12}: {:.3f}s total, {:.0f} rows/s, '
+                'id indexes {:.1f}MB'.format(
+                    name, elapsed, rows / elapsed,
+                    index_size / (1024 * 1024)))
+
+    def insert(self, generate, rows, batch_size):
+        '''(seconds, size of id indexes in bytes) to insert rows.'''
+        body_text = 'x' * 200
+        with connection.cursor() as cursor:
+            cursor.execute(DROP_TABLE_SQL)
+            cursor.execute(CREATE_TABLE_SQL)
+            cursor.execute(CREATE_LIKE_INDEX_SQL)
+
+            start = time.perf_counter()
+            for offset in range(0, rows, batch_size):
+                size = min(batch_size, rows - offset)
+                params = []
+                for i in range(size):
+                    params.extend([generate(), body_text])
+                cursor.execute(
+                    'INSERT INTO bench_anno_ids (anno_id, body_text) '
+                    'VALUES {}'.format(', '.join(['(%s, %s)'] * size)),
+                    params)
+            elapsed = time.perf_counter() - start
+
+            cursor.execute(INDEX_SIZE_SQL)
+            index_size = cursor.fetchone()[0]
+            cursor.execute(DROP_TABLE_SQL)
+        return (elapsed, index_size)
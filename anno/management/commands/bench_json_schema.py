@@ -0,0 +1,89 @@
+import time
+
+import jsonschema
+from django.core.management import BaseCommand
+
+from anno.anno_defaults import CATCH_JSONLD_CONTEXT_IRI
+from anno.catch_json_schema import CATCH_JSON_FAST_CHECK
+from anno.catch_json_schema import CATCH_JSON_SCHEMA
+from anno.catch_json_schema import CATCH_JSON_VALIDATOR
+
+
+SAMPLE_CATCHA = {
+    '@context': CATCH_JSONLD_CONTEXT_IRI,
+    'id': 'bench_json_schema',
+    'type': 'Annotation',
+    'schema_version': 'catch_v1.0',
+    'creator': {'id': 'bench_user', 'name': 'bench user'},
+    'permissions': {
+        'can_read': [], 'can_update': ['bench_user'],
+        'can_delete': ['bench_user'], 'can_admin': ['bench_user'],
+    },
+    'platform': {
+        'platform_name': 'bench', 'context_id': 'bench_context',
+        'collection_id': 'bench_collection', 'target_source_id': '1',
+    },
+    'body': {
+        'type': 'List',
+        'items': [{
+            'type': 'TextualBody', 'purpose': 'commenting',
+            'format': 'text/html', 'value': 'benchmarking json schema',
+        }] + [{
+            'type': 'TextualBody', 'purpose': 'tagging',
+            'format': 'text/html', 'value': 'tag{}'.format(i),
+        } for i in range(5)],
+    },
+    'target': {
+        'type': 'List',
+        'items': [{
+            'type': 'Text', 'format': 'text/html',
+            'source': 'http://bench.example.com',
+            'selector': {
+                'type': 'Choice',
+                'items': [{
+                    'type': 'TextQuoteSelector', 'exact': 'benchmark',
+                }, {
+                    'type': 'TextPositionSelector', 'start': 0, 'end': 9,
+                }],
+            },
+        }],
+    },
+}
+
+
+class Command(BaseCommand):
+    help = ('times catcha json schema validation: validator built per call, '
+            'validator built once, and generated check code.')
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--iterations', dest='iterations', type=int, default=1000,
+            help='number of validations per run',
+        )
+
+    def handle(self, *args, **kwargs):
+        iterations = kwargs['iterations']
+
+        if not CATCH_JSON_VALIDATOR.is_valid(SAMPLE_CATCHA):
+            self.stderr.write('sample catcha is not valid')
+            return
+
+        runs = [
+            ('per call', lambda x: jsonschema.Draft4Validator(
+                CATCH_JSON_SCHEMA).validate(x)),
+            ('compiled', CATCH_JSON_VALIDATOR.validate),
+        ]
+        if CATCH_JSON_FAST_CHECK is not None:
+            runs.append(('generated', CATCH_JSON_FAST_CHECK))
+
+        baseline = None
+        for (name, validate) in runs:
+            start = time.perf_counter()
+            for i in range(iterations):
+                validate(SAMPLE_CATCHA)
+            elapsed = time.perf_counter() - start
+            baseline = baseline or elapsed
+            self.stdout.write(
+                '{:>10}: {:.3f}s total, {:.1f}us per catcha, {:.1f}x'.format(
+                    name, elapsed, 1000000 * elapsed / iterations,
+                    baseline / elapsed))
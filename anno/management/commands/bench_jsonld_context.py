@@ -0,0 +1,85 @@
+import time
+
+from django.core.management import BaseCommand
+
+from anno import json_models
+from anno.anno_defaults import CATCH_JSONLD_CONTEXT_IRI
+from anno.json_models import Catcha
+from anno.jsonld_cache import document_cache
+
+
+SAMPLE_ANNO = {
+    '@context': CATCH_JSONLD_CONTEXT_IRI,
+    'id': 'bench_jsonld_context',
+    'type': 'Annotation',
+    'schema_version': 'catch_v1.0',
+    'creator': {'id': 'bench_user', 'name': 'bench user'},
+    'body': {
+        'type': 'List',
+        'items': [{
+            'type': 'TextualBody', 'purpose': 'commenting',
+            'format': 'text/html', 'value': 'benchmarking jsonld contexts',
+        }],
+    },
+    'target': {
+        'type': 'List',
+        'items': [{
+            'type': 'Text', 'format': 'text/html',
+            'source': 'http://bench.example.com',
+        }],
+    },
+}
+
+
+class Command(BaseCommand):
+    help = ('times jsonld translation of an annotation: full jsonld '
+            'processing paying a (simulated) network fetch for each context, '
+            'with the cached context loader, and with the compiled '
+            'translator.')
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--iterations', dest='iterations', type=int, default=100,
+            help='number of translations per run',
+        )
+        parser.add_argument(
+            '--latency-ms', dest='latency_ms', type=float, default=50,
+            help='simulated network latency per context fetch, in millisecs',
+        )
+
+    def handle(self, *args, **kwargs):
+        iterations = kwargs['iterations']
+        latency = kwargs['latency_ms'] / 1000.0
+
+        def remote_loader(url):
+            time.sleep(latency)
+            return document_cache.load_document(url)
+
+        runs = [
+            ('uncached', remote_loader, Catcha.jsonld_expand_compact),
+            ('cached', document_cache.load_document,
+             Catcha.jsonld_expand_compact),
+            ('translated', document_cache.load_document,
+             lambda anno, local_ctx, ctx: Catcha.expand_compact_for_context(
+                 anno, ctx)),
+        ]
+        baseline = None
+        for (name, loader, translate) in runs:
+            elapsed = self.run(loader, translate, iterations)
+            baseline = baseline or elapsed
+            self.stdout.write(
+                '{:>10}: {:.3f}s total, {:.2f}ms per anno, {:.1f}x'.format(
+                    name, elapsed, 1000 * elapsed / iterations,
+                    baseline / elapsed))
+
+    def run(self, loader, translate, iterations):
+        options = json_models.JSONLD_OPTIONS
+        json_models.JSONLD_OPTIONS = {'documentLoader': loader}
+        try:
+            start = time.perf_counter()
+            for i in range(iterations):
+                translate(SAMPLE_ANNO, CATCH_JSONLD_CONTEXT_IRI,
+                          CATCH_JSONLD_CONTEXT_IRI)
+            return time.perf_counter() - start
+        finally:
+            json_models.JSONLD_OPTIONS = options
@@ -0,0 +1,53 @@
+from django.core.management import BaseCommand
+from django.db.models import Count
+from django.db.models import F
+from django.db.models import IntegerField
+from django.db.models import OuterRef
+from django.db.models import Subquery
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+
+from anno.crud import CRUD
+from anno.models import Anno
+
+
+def live_reply_count():
+    '''number of replies not soft deleted, for the outer query anno.'''
+    replies = Anno.live.filter(
+        anno_reply_to=OuterRef('pk')).order_by().values(
+            'anno_reply_to').annotate(total=Count('anno_id')).values('total')
+    return Coalesce(Subquery(replies, output_field=IntegerField()), 0)
+
+
+class Command(BaseCommand):
+    help = ('recomputes Anno.reply_count, the number of replies not soft '
+            'deleted, and reports annotations where it had drifted.')
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--dry-run', dest='dry_run', action='store_true', default=False,
+            help='only report drift, do not fix it',
+        )
+
+    def handle(self, *args, **kwargs):
+        drifted = Anno._default_manager.annotate(
+            actual=live_reply_count()).exclude(
+                reply_count=F('actual')).order_by('anno_id').values_list(
+                    'anno_id', 'reply_count', 'actual')
+
+        anno_ids = []
+        for (anno_id, reply_count, actual) in drifted:
+            self.stdout.write('anno({}): reply_count({}), actual({})'.format(
+                anno_id, reply_count, actual))
+            anno_ids.append(anno_id)
+
+        if anno_ids and not kwargs['dry_run']:
+            # recount in the update: replies might have changed meanwhile
+            fixed = Anno._default_manager.filter(anno_id__in=anno_ids)
+            fixed.update(
+                reply_count=live_reply_count(), modified=timezone.now())
+            CRUD.touch_collections(
+                fixed.values_list('context_id', 'collection_id'))
+
+        self.stdout.write('done: {} annos with drifted reply_count{}'.format(
+            len(anno_ids), ', not fixed' if kwargs['dry_run'] else ''))
@@ -2,6 +2,18 @@ from django.db.models import Manager
 from django.db.models import Q
 
 
+class LiveManager(Manager):
+    '''annos not soft deleted.
+
+    filters `anno_deleted=False`, the condition of the partial indexes in
+    Anno.Meta, so postgres can use them.
+    '''
+
+    def get_queryset(self):
+        return super(LiveManager, self).get_queryset().filter(
+            anno_deleted=False)
+
+
 class SearchManager(Manager):
     '''builds Q expression for `platform` annotation property.
 
@@ -18,20 +30,17 @@ class SearchManager(Manager):
             kwargs = {'raw__platform__platform_name': str(platform_name)}
             q = q & Q(**kwargs)
 
+        # context, collection, and source are indexed columns in Anno
         context_id = params.get('context_id', None)
         if context_id:
-            kwargs = {'raw__platform__context_id': str(context_id)}
-            q = q & Q(**kwargs)
+            q = q & Q(context_id=str(context_id))
 
             collection_id = params.get('collection_id', None)
             if collection_id:
-                kwargs = {'raw__platform__collection_id': str(collection_id)}
-                q = q & Q(**kwargs)
+                q = q & Q(collection_id=str(collection_id))
 
         target_source_id = params.get('source_id', None)
         if target_source_id:
-            kwargs = {
-                'raw__platform__target_source_id': str(target_source_id)}
-            q = q & Q(**kwargs)
+            q = q & Q(target_source_id=str(target_source_id))
 
         return q
@@ -0,0 +1,26 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+import django.contrib.postgres.indexes
+import django.contrib.postgres.search
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('anno', '0002_anno_created_id_idx'),
+    ]
+
+    # existing rows are filled with `manage.py backfill_search_vector`
+    operations = [
+        migrations.AddField(
+            model_name='anno',
+            name='body_search',
+            field=django.contrib.postgres.search.SearchVectorField(null=True),
+        ),
+        migrations.AddIndex(
+            model_name='anno',
+            index=django.contrib.postgres.indexes.GinIndex(fields=['body_search'], name='anno_body_search_gin'),
+        ),
+    ]
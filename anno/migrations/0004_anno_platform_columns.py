@@ -0,0 +1,47 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('anno', '0003_anno_body_search'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='anno',
+            name='collection_id',
+            field=models.TextField(null=True),
+        ),
+        migrations.AddField(
+            model_name='anno',
+            name='context_id',
+            field=models.TextField(null=True),
+        ),
+        migrations.AddField(
+            model_name='anno',
+            name='target_source_id',
+            field=models.TextField(null=True),
+        ),
+        # copy platform properties from raw json
+        migrations.RunSQL(
+            sql=(
+                "UPDATE anno_anno SET "
+                "context_id = raw->'platform'->>'context_id', "
+                "collection_id = raw->'platform'->>'collection_id', "
+                "target_source_id = raw->'platform'->>'target_source_id';"
+            ),
+            reverse_sql=migrations.RunSQL.noop,
+        ),
+        migrations.AddIndex(
+            model_name='anno',
+            index=models.Index(fields=['context_id', 'collection_id', 'created', 'anno_id'], name='anno_context_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='anno',
+            index=models.Index(fields=['target_source_id', 'created', 'anno_id'], name='anno_source_created_idx'),
+        ),
+    ]
@@ -0,0 +1,36 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+import django.contrib.postgres.indexes
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('anno', '0004_anno_platform_columns'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='anno',
+            name='is_public',
+            field=models.BooleanField(default=True),
+        ),
+        # same as `can_read__len=0`: empty, but not null
+        migrations.RunSQL(
+            sql=(
+                "UPDATE anno_anno SET is_public = "
+                "(can_read IS NOT NULL AND array_length(can_read, 1) IS NULL);"
+            ),
+            reverse_sql=migrations.RunSQL.noop,
+        ),
+        migrations.AddIndex(
+            model_name='anno',
+            index=django.contrib.postgres.indexes.GinIndex(fields=['can_read'], name='anno_can_read_gin'),
+        ),
+        migrations.AddIndex(
+            model_name='anno',
+            index=models.Index(fields=['is_public'], name='anno_is_public_idx'),
+        ),
+    ]
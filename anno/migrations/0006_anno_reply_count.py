@@ -0,0 +1,30 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('anno', '0005_anno_is_public'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='anno',
+            name='reply_count',
+            field=models.IntegerField(default=0),
+        ),
+        # replies not soft deleted; see `recount_replies` command
+        migrations.RunSQL(
+            sql=(
+                "UPDATE anno_anno AS p SET reply_count = r.total "
+                "FROM (SELECT anno_reply_to_id, count(*) AS total "
+                "FROM anno_anno WHERE anno_reply_to_id IS NOT NULL "
+                "AND NOT anno_deleted GROUP BY anno_reply_to_id) AS r "
+                "WHERE p.anno_id = r.anno_reply_to_id;"
+            ),
+            reverse_sql=migrations.RunSQL.noop,
+        ),
+    ]
@@ -0,0 +1,72 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+import anno.indexes
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('anno', '0006_anno_reply_count'),
+    ]
+
+    operations = [
+        # same indexes, over annos not soft deleted only
+        migrations.AddIndex(
+            model_name='anno',
+            index=anno.indexes.PartialGinIndex(fields=['raw'], name='anno_live_raw_gin', where='anno_deleted = false'),
+        ),
+        migrations.AddIndex(
+            model_name='anno',
+            index=anno.indexes.PartialGinIndex(fields=['body_search'], name='anno_live_body_search_gin', where='anno_deleted = false'),
+        ),
+        migrations.AddIndex(
+            model_name='anno',
+            index=anno.indexes.PartialGinIndex(fields=['can_read'], name='anno_live_can_read_gin', where='anno_deleted = false'),
+        ),
+        migrations.AddIndex(
+            model_name='anno',
+            index=anno.indexes.PartialIndex(fields=['is_public'], name='anno_live_is_public_idx', where='anno_deleted = false'),
+        ),
+        migrations.AddIndex(
+            model_name='anno',
+            index=anno.indexes.PartialIndex(fields=['created', 'anno_id'], name='anno_live_created_idx', where='anno_deleted = false'),
+        ),
+        migrations.AddIndex(
+            model_name='anno',
+            index=anno.indexes.PartialIndex(fields=['context_id', 'collection_id', 'created', 'anno_id'], name='anno_live_context_idx', where='anno_deleted = false'),
+        ),
+        migrations.AddIndex(
+            model_name='anno',
+            index=anno.indexes.PartialIndex(fields=['target_source_id', 'created', 'anno_id'], name='anno_live_source_idx', where='anno_deleted = false'),
+        ),
+        migrations.RemoveIndex(
+            model_name='anno',
+            name='anno_raw_gin',
+        ),
+        migrations.RemoveIndex(
+            model_name='anno',
+            name='anno_body_search_gin',
+        ),
+        migrations.RemoveIndex(
+            model_name='anno',
+            name='anno_can_read_gin',
+        ),
+        migrations.RemoveIndex(
+            model_name='anno',
+            name='anno_is_public_idx',
+        ),
+        migrations.RemoveIndex(
+            model_name='anno',
+            name='anno_created_id_idx',
+        ),
+        migrations.RemoveIndex(
+            model_name='anno',
+            name='anno_context_created_idx',
+        ),
+        migrations.RemoveIndex(
+            model_name='anno',
+            name='anno_source_created_idx',
+        ),
+    ]
@@ -0,0 +1,39 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('anno', '0007_anno_live_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CollectionWatermark',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('context_id', models.TextField()),
+                ('collection_id', models.TextField()),
+                ('modified', models.DateTimeField()),
+            ],
+        ),
+        migrations.AlterUniqueTogether(
+            name='collectionwatermark',
+            unique_together=set([('context_id', 'collection_id')]),
+        ),
+        # newest write in each collection, soft deletes included
+        migrations.RunSQL(
+            sql=(
+                "INSERT INTO anno_collectionwatermark "
+                "(context_id, collection_id, modified) "
+                "SELECT context_id, collection_id, max(modified) "
+                "FROM anno_anno WHERE context_id IS NOT NULL "
+                "AND collection_id IS NOT NULL "
+                "GROUP BY context_id, collection_id;"
+            ),
+            reverse_sql=migrations.RunSQL.noop,
+        ),
+    ]
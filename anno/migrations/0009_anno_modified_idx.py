@@ -0,0 +1,18 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('anno', '0008_collection_watermark'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='anno',
+            index=models.Index(fields=['modified', 'anno_id'], name='anno_modified_idx'),
+        ),
+    ]
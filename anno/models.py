@@ -29,6 +29,8 @@ from django.db.models import BooleanField
 from django.db.models import CharField
 from django.db.models import DateTimeField
 from django.db.models import ForeignKey
+from django.db.models import Index
+from django.db.models import IntegerField
 from django.db.models import Manager
 from django.db.models import ManyToManyField
 from django.db.models import Model
@@ -36,16 +38,26 @@ from django.db.models import TextField
 
 from django.contrib.postgres.fields import ArrayField
 from django.contrib.postgres.fields import JSONField
-from django.contrib.postgres.indexes import GinIndex
+from django.contrib.postgres.search import SearchVectorField
 
 from django.conf import settings
+from django.db.models.signals import post_delete
+from django.dispatch import receiver
 
+from .indexes import PartialGinIndex
+from .indexes import PartialIndex
+from .managers import LiveManager
 from .managers import SearchManager
+from .tag_cache import tag_cache
 
 
 logger = logging.getLogger(__name__)
 
 
+# condition for partial indexes over annos not soft deleted
+LIVE_ANNO = 'anno_deleted = false'
+
+
 class Anno(Model):
     created = DateTimeField(auto_now_add=True, null=False)
     modified = DateTimeField(auto_now=True, null=False)
@@ -60,12 +72,17 @@ class Anno(Model):
     anno_deleted = BooleanField(default=False)
     # comment to a parent annotation
     anno_reply_to = ForeignKey('Anno', null=True, blank=True, on_delete=CASCADE)
+    # number of replies not soft deleted; only changed by CRUD with F()
+    # updates, in the same transaction as the reply, see save()
+    reply_count = IntegerField(default=0)
     anno_tags = ManyToManyField('Tag', blank=True)
     # permissions are lists of user_ids, blank means public
     can_read = ArrayField(CharField(max_length=128), null=True, default=list)
     can_update = ArrayField(CharField(max_length=128), null=True, default=list)
     can_delete = ArrayField(CharField(max_length=128), null=True, default=list)
     can_admin = ArrayField(CharField(max_length=128), null=True, default=list)
+    # denormalized from can_read in save(), for search permission filter
+    is_public = BooleanField(default=True)
 
     # support for only one _text_ body
     # max length for body_text is restricted in django request
@@ -75,6 +92,9 @@ class Anno(Model):
     # 'application/rtf', 'application/x-rtf', etc
     # note that rich text can have binaries embedded (like images)
     body_format = CharField(max_length=128, null=False, default='text/html')
+    # body_text tsvector, filled by CRUD on create/update
+    # see CATCH_TEXT_SEARCH_CONFIG for language
+    body_search = SearchVectorField(null=True)
 
     target_type = CharField(
             max_length=16,
@@ -83,8 +103,16 @@ class Anno(Model):
 
     raw = JSONField()
 
+    # copies of raw['platform'] properties, filled by CRUD on create/update
+    # real columns can be indexed along with the default search order
+    context_id = TextField(null=True)
+    collection_id = TextField(null=True)
+    target_source_id = TextField(null=True)
+
     # default model manager
     objects = Manager()
+    # annos not soft deleted
+    live = LiveManager()
 
     # TODO: manager for custom searches
     # http://stackoverflow.com/a/30941292
@@ -98,10 +126,53 @@ class Anno(Model):
     custom_manager = SearchManager()
 
     class Meta:
+        # deleted annos are only searched by `since` sync: index live annos
+        # only, so index size and scans grow with live annos. queries must
+        # filter `anno_deleted=False`, as Anno.live does, for postgres to
+        # use them.
         indexes = [
-            GinIndex(
+            PartialGinIndex(
                 fields=['raw'],
-                name='anno_raw_gin',
+                name='anno_live_raw_gin',
+                where=LIVE_ANNO,
+            ),
+            PartialGinIndex(
+                fields=['body_search'],
+                name='anno_live_body_search_gin',
+                where=LIVE_ANNO,
+            ),
+            # read permission filter, see search.query_can_read
+            PartialGinIndex(
+                fields=['can_read'],
+                name='anno_live_can_read_gin',
+                where=LIVE_ANNO,
+            ),
+            PartialIndex(
+                fields=['is_public'],
+                name='anno_live_is_public_idx',
+                where=LIVE_ANNO,
+            ),
+            # keyset pagination for search, see views._do_search_api
+            PartialIndex(
+                fields=['created', 'anno_id'],
+                name='anno_live_created_idx',
+                where=LIVE_ANNO,
+            ),
+            # most common platform searches, in default search order
+            PartialIndex(
+                fields=['context_id', 'collection_id', 'created', 'anno_id'],
+                name='anno_live_context_idx',
+                where=LIVE_ANNO,
+            ),
+            PartialIndex(
+                fields=['target_source_id', 'created', 'anno_id'],
+                name='anno_live_source_idx',
+                where=LIVE_ANNO,
+            ),
+            # `since` sync, deleted annos included; see views._do_search_since
+            Index(
+                fields=['modified', 'anno_id'],
+                name='anno_modified_idx',
             ),
         ]
 
@@ -113,7 +184,7 @@ class Anno(Model):
 
     @property
     def total_replies(self):
-        return self.anno_set.count()
+        return self.reply_count
 
     @property
     def replies(self):
@@ -153,6 +224,27 @@ class Anno(Model):
             permissions.append('can_admin')
         return permissions
 
+    def sync_is_public(self):
+        '''set `is_public` from `can_read`; bulk_create must call it.'''
+        # null can_read is _not_ public, as in `can_read__len=0`
+        self.is_public = self.can_read is not None and len(self.can_read) == 0
+
+    def save(self, *args, **kwargs):
+        '''overwrite save to keep `is_public` in synch with `can_read`.
+
+        updates leave `reply_count` out, unless in `update_fields`.
+        '''
+        self.sync_is_public()
+        update_fields = kwargs.get('update_fields', None)
+        if update_fields is None and not self._state.adding:
+            # don't overwrite reply_count with a stale value
+            kwargs['update_fields'] = [
+                f.name for f in self._meta.concrete_fields
+                if not f.primary_key and f.name != 'reply_count']
+        elif update_fields is not None and 'can_read' in update_fields:
+            kwargs['update_fields'] = list(update_fields) + ['is_public']
+        super(Anno, self).save(*args, **kwargs)
+
     def delete(self, *args, **kwargs):
         '''
         overwrite delete to perform a soft delete.
@@ -172,8 +264,12 @@ class Anno(Model):
             return False
 
 
+TAG_NAME_MAX_LENGTH = 256
+
+
 class Tag(Model):
-    tag_name = CharField(max_length=256, unique=True, null=False)
+    tag_name = CharField(
+        max_length=TAG_NAME_MAX_LENGTH, unique=True, null=False)
     created = DateTimeField(auto_now_add=True, null=False)
 
     def __repr__(self):
@@ -183,6 +279,11 @@ class Tag(Model):
         return self.__repr__()
 
 
+@receiver(post_delete, sender=Tag)
+def invalidate_cached_tag(sender, instance, **kwargs):
+    tag_cache.invalidate(instance.tag_name)
+
+
 class Target(Model):
     created = DateTimeField(auto_now_add=True, null=False)
     modified = DateTimeField(auto_now=True, null=False)
@@ -208,6 +309,27 @@ class Target(Model):
         return self.__repr__()
 
 
+class CollectionWatermark(Model):
+    '''last time an anno in a collection was written.
+
+    kept by CRUD in the same transaction as the write; soft deletes and
+    changes to reply counts count as writes.
+    '''
+    context_id = TextField()
+    collection_id = TextField()
+    modified = DateTimeField(null=False)
+
+    class Meta:
+        unique_together = ('context_id', 'collection_id')
+
+    def __repr__(self):
+        return '({}/{}: {})'.format(
+            self.context_id, self.collection_id, self.modified)
+
+    def __str__(self):
+        return self.__repr__()
+
+
 """
 # this is the expected json object when frontend is a HxAT instance
 
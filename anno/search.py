@@ -1,6 +1,18 @@
+import json
 import logging
 
+from django.contrib.postgres.search import SearchQuery
+from django.contrib.postgres.search import SearchRank
+from django.contrib.postgres.search import SearchVector
+from django.db import connections
+from django.db.models import F
 from django.db.models import Q
+from django.db.models import TextField
+from django.db.models import Value
+from django.db.models.expressions import RawSQL
+
+from .anno_defaults import CATCH_TEXT_SEARCH_CONFIG
+from .models import Anno
 
 
 # from https://djangosnippets.org/snippets/1700/
@@ -49,3 +61,110 @@ def query_target_medias(media_params):
     return dynamic_lookup_valuelist('target__target_media', media_params)
 
 
+
+
+def search_vector_for_text(text):
+    '''expression to be saved in Anno.body_search for given body text.'''
+    return SearchVector(
+        Value(text, output_field=TextField()), config=CATCH_TEXT_SEARCH_CONFIG)
+
+
+def search_vector_for_column(column='body_text'):
+    '''same as search_vector_for_text, for updates in bulk.'''
+    return SearchVector(column, config=CATCH_TEXT_SEARCH_CONFIG)
+
+
+def search_query_for_text(text):
+    return SearchQuery(text, config=CATCH_TEXT_SEARCH_CONFIG)
+
+
+def query_body_text(text):
+    '''match against stored Anno.body_search; uses the gin index.'''
+    return Q(body_search=search_query_for_text(text))
+
+
+def annotate_text_rank(query, text):
+    '''adds `search_rank` to each row: how well body matches text.'''
+    return query.annotate(search_rank=SearchRank(
+        F('body_search'), search_query_for_text(text)))
+
+
+def query_can_read(user_id):
+    '''annos user can read: public or user in `can_read`.
+
+    each side of the OR has an index (is_public, can_read gin), so
+    postgres can combine them in a bitmap or.
+    '''
+    return Q(is_public=True) | Q(can_read__contains=[user_id])
+
+
+def query_before_keyset(created, anno_id):
+    '''rows after (created, anno_id) in `-created, -anno_id` order.'''
+    return Q(created__lt=created) | Q(created=created, anno_id__lt=anno_id)
+
+
+def query_after_modified_keyset(modified, anno_id):
+    '''rows after (modified, anno_id) in `modified, anno_id` order.'''
+    return Q(modified__gt=modified) | Q(
+        modified=modified, anno_id__gt=anno_id)
+
+
+def annotate_total_count(query):
+    '''adds `search_total` to each row: count of rows before slicing.
+
+    window functions are computed before LIMIT/OFFSET, so the total comes
+    with the page and there's no need for a separate count query.
+    '''
+    return query.annotate(search_total=RawSQL('COUNT(*) OVER ()', []))
+
+
+def estimate_total_count(query):
+    '''number of rows in query, as estimated by the postgres planner.'''
+    (sql, params) = query.query.sql_with_params()
+    with connections[query.db].cursor() as cursor:
+        cursor.execute('EXPLAIN (FORMAT JSON) {}'.format(sql), params)
+        plan = cursor.fetchone()[0]
+    if isinstance(plan, str):
+        plan = json.loads(plan)
+    return int(plan[0]['Plan']['Plan Rows'])
+
+
+THREAD_SQL = '''
+WITH RECURSIVE thread(anno_id, depth, path) AS (
+    SELECT anno_id, 0, ARRAY[anno_id]::varchar[]
+    FROM {table} WHERE anno_id = %s
+  UNION ALL
+    SELECT r.anno_id, t.depth + 1, t.path || r.anno_id::varchar
+    FROM {table} r JOIN thread t ON r.anno_reply_to_id = t.anno_id
+    WHERE NOT r.anno_deleted AND r.anno_id <> ALL(t.path) {can_read}
+)
+SELECT {columns}, t.depth AS thread_depth
+FROM {table} a JOIN thread t ON a.anno_id = t.anno_id
+ORDER BY t.depth, a.created, a.anno_id
+LIMIT %s
+'''
+
+# same as query_can_read, for the replies in THREAD_SQL
+THREAD_CAN_READ_SQL = 'AND (r.is_public OR r.can_read @> %s::varchar(128)[])'
+
+
+def query_thread(anno_id, user_id=None, limit=None):
+    '''anno and all replies under it, with one recursive query.
+
+    rows are ordered by depth, then created; each has `thread_depth`, 0
+    for the anno itself. soft deleted replies, and replies `user_id` cannot
+    read, are left out along with their own replies; user_id None skips
+    the read check. `path` stops cycles of replies moved under a reply.
+    '''
+    columns = ', '.join(
+        'a.{}'.format(f.column) for f in Anno._meta.concrete_fields
+        if f.name != 'body_search')  # stored search vector not returned
+    params = [anno_id]
+    can_read = ''
+    if user_id is not None:
+        can_read = THREAD_CAN_READ_SQL
+        params.append([user_id])
+    params.append(limit)
+    sql = THREAD_SQL.format(
+        table=Anno._meta.db_table, columns=columns, can_read=can_read)
+    return Anno._default_manager.raw(sql, params)
@@ -0,0 +1,66 @@
+from hashlib import sha1
+import json
+
+from django.conf import settings
+from django.core.cache import caches
+from django.core.serializers.json import DjangoJSONEncoder
+
+
+# django cache to keep search responses in; better shared by all processes
+# (memcached, redis, db). None disables.
+CATCH_SEARCH_CACHE_ALIAS = getattr(settings, 'CATCH_SEARCH_CACHE_ALIAS', None)
+
+# seconds a search response is kept, whatever its collection watermark
+CATCH_SEARCH_CACHE_TTL = getattr(settings, 'CATCH_SEARCH_CACHE_TTL', 60)
+
+
+class SearchCache(object):
+    '''search responses for searches within a collection.
+
+    a collection is a (context_id, collection_id) pair. responses are keyed
+    by the collection watermark, that CRUD moves forward when an anno in
+    the collection is created, updated or deleted; responses for older
+    watermarks are never read again, and expire after `ttl` seconds.
+
+    the watermark must be read through the same db connection as the
+    search rows, and before them: a replica that lags behind 'default'
+    then keys its rows with its own, older watermark, and a response is
+    never cached under a watermark newer than its rows.
+
+    replies are expected to be in the same collection as the anno they
+    reply to: a new reply changes its parent's totalReplies, and only the
+    reply's collection watermark moves.
+    '''
+
+    def __init__(self, ttl=CATCH_SEARCH_CACHE_TTL,
+                 cache_alias=CATCH_SEARCH_CACHE_ALIAS):
+        self.ttl = ttl
+        self.cache_alias = cache_alias
+
+    @property
+    def backend(self):
+        if self.cache_alias is None:
+            return None
+        return caches[self.cache_alias]
+
+    @property
+    def enabled(self):
+        return self.ttl > 0 and self.backend is not None
+
+    def digest(self, value):
+        return sha1(json.dumps(
+            value, cls=DjangoJSONEncoder).encode('utf-8')).hexdigest()
+
+    def key(self, collection, watermark, params):
+        '''cache key for search `params` at collection `watermark`.'''
+        return 'catchpy:search:{}'.format(self.digest(
+            [collection, watermark, params]))
+
+    def get(self, key):
+        return self.backend.get(key)
+
+    def set(self, key, response):
+        self.backend.set(key, response, self.ttl)
+
+
+search_cache = SearchCache()
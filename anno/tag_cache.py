@@ -0,0 +1,56 @@
+from collections import OrderedDict
+from threading import Lock
+
+from django.conf import settings
+
+
+# max number of tag name -> id entries kept per process; 0 disables
+CATCH_TAG_CACHE_SIZE = getattr(settings, 'CATCH_TAG_CACHE_SIZE', 10000)
+
+
+class TagCache(object):
+    '''LRU of tag ids, by tag name.
+
+    tags are never renamed, so an entry is good for as long as the tag
+    exists; only ids of committed tags should be set here.
+    '''
+
+    def __init__(self, size=CATCH_TAG_CACHE_SIZE):
+        self.size = size
+        self.cache = OrderedDict()  # tag_name -> tag id
+        self.lock = Lock()
+
+    def get_many(self, names):
+        '''returns dict name -> id for the names in cache.'''
+        found = {}
+        if self.size <= 0:
+            return found
+        with self.lock:
+            for name in names:
+                tag_id = self.cache.get(name, None)
+                if tag_id is not None:
+                    self.cache.move_to_end(name)
+                    found[name] = tag_id
+        return found
+
+    def set_many(self, tag_ids):
+        '''tag_ids is a dict name -> id.'''
+        if self.size <= 0:
+            return
+        with self.lock:
+            for (name, tag_id) in tag_ids.items():
+                self.cache[name] = tag_id
+                self.cache.move_to_end(name)
+            while len(self.cache) > self.size:
+                self.cache.popitem(last=False)
+
+    def invalidate(self, name):
+        with self.lock:
+            self.cache.pop(name, None)
+
+    def clear(self):
+        with self.lock:
+            self.cache.clear()
+
+
+tag_cache = TagCache()
@@ -15,6 +15,7 @@ from anno.anno_defaults import PURPOSE_TAGGING
 from anno.anno_defaults import RESOURCE_TYPE_LIST
 from anno.anno_defaults import RESOURCE_TYPE_CHOICE
 from anno.anno_defaults import CATCH_JSONLD_CONTEXT_IRI
+from anno.tag_cache import tag_cache
 from anno.utils import generate_uid
 
 from consumer.catchjwt import encode_token
@@ -22,6 +23,12 @@ from consumer.catchjwt import encode_token
 
 MEDIAS = [ANNO, AUDIO, TEXT, VIDEO, IMAGE]
 
+@pytest.fixture(autouse=True)
+def clear_tag_cache():
+    # tables are flushed between tests without sending delete signals
+    tag_cache.clear()
+
+
 @pytest.fixture(scope='function')
 def wa_list():
     was = [make_wa_object(age_in_hours=500)]
@@ -1,12 +1,25 @@
+import copy
+from io import StringIO
 import pytest
 
+from django.core.management import call_command
+from django.db import connection
+from django.db import transaction
+from django.test.utils import CaptureQueriesContext
+
+from anno import crud
+from anno.anno_defaults import ANNO
 from anno.crud import CRUD
 from anno.errors import AnnoError
 from anno.errors import InvalidAnnotationTargetTypeError
 from anno.errors import InvalidInputWebAnnotationError
 from anno.errors import MissingAnnotationError
-from anno.models import Anno, Target
+from anno.models import Anno, Tag, Target
 from anno.models import PURPOSE_TAGGING
+from anno.tag_cache import tag_cache
+
+from .conftest import make_wa_object
+from .conftest import make_wa_tag
 
 
 @pytest.mark.usefixtures('wa_text')
@@ -195,3 +208,281 @@ def test_delete_anno_ok(wa_list):
     deleted = Anno.objects.get(pk=x.anno_id)
     assert deleted is not None
     assert deleted.anno_deleted is True
+
+
+@pytest.mark.usefixtures('wa_text')
+@pytest.mark.django_db
+def test_platform_columns_ok(wa_text):
+    catcha = wa_text
+    x = CRUD.create_anno(catcha)
+    assert x.context_id == catcha['platform']['context_id']
+    assert x.collection_id == catcha['platform']['collection_id']
+    assert x.target_source_id == catcha['platform']['target_source_id']
+
+    catcha['platform']['collection_id'] = 'another_collection'
+    del catcha['platform']['target_source_id']
+    CRUD.update_anno(x, catcha)
+
+    y = Anno._default_manager.get(pk=x.anno_id)
+    assert y.context_id == catcha['platform']['context_id']
+    assert y.collection_id == 'another_collection'
+    assert y.target_source_id is None
+    assert Anno._default_manager.filter(
+        collection_id='another_collection').count() == 1
+
+
+def tag_names(catcha):
+    return set(b['value'] for b in catcha['body']['items']
+               if b['purpose'] == PURPOSE_TAGGING)
+
+
+@pytest.mark.django_db
+def test_import_annos_in_bulk(monkeypatch):
+    monkeypatch.setattr(crud, 'CATCH_IMPORT_CHUNK_SIZE', 4)
+
+    parent = make_wa_object(age_in_hours=30)
+    reply = make_wa_object(age_in_hours=20, media=ANNO, reply_to=parent['id'])
+    orphan = make_wa_object(age_in_hours=20, media=ANNO, reply_to='not_there')
+    duplicate = copy.deepcopy(parent)
+    long_tag = make_wa_object(age_in_hours=10)
+    long_tag['body']['items'].append(make_wa_tag('x' * 300))
+    bad_target = make_wa_object(age_in_hours=10)
+    bad_target['target']['type'] = 'FLUFFY'
+    private = make_wa_object(age_in_hours=5)
+    private['permissions']['can_read'] = [private['creator']['id']]
+    others = [make_wa_object(age_in_hours=i) for i in range(1, 6)]
+    catcha_list = [parent, reply, orphan, duplicate, long_tag, bad_target,
+                   private] + others
+
+    resp = CRUD.import_annos(
+        catcha_list, {'override': ['CAN_IMPORT'], 'userId': 'importer'})
+
+    assert resp['original_total'] == len(catcha_list)
+    assert resp['total_success'] == len(catcha_list) - 4
+    assert resp['total_failed'] == 4
+    assert [c['id'] for c in resp['failed']] == [
+        orphan['id'], duplicate['id'], long_tag['id'], bad_target['id']]
+    assert 'missing parent(not_there)' in orphan['error']
+    assert 'integrity error' in duplicate['error']
+    assert 'tag too long' in long_tag['error']
+    assert 'target type should be in' in bad_target['error']
+
+    assert Anno._default_manager.count() == resp['total_success']
+    for c in resp['imported']:
+        a = Anno._default_manager.get(pk=c['id'])
+        assert a.created.isoformat() == c['created']
+        assert a.raw['created'] == c['created']
+        assert a.raw['totalReplies'] == 0
+        assert a.is_public == (c['permissions']['can_read'] == [])
+        assert a.body_search is not None
+        assert a.target_set.count() == len(c['target']['items'])
+        assert set(a.anno_tags.values_list(
+            'tag_name', flat=True)) == tag_names(c)
+    assert Anno._default_manager.get(
+        pk=reply['id']).anno_reply_to_id == parent['id']
+
+
+@pytest.mark.django_db
+def test_import_annos_fixed_queries():
+    catcha_list = [make_wa_object(age_in_hours=i) for i in range(1, 21)]
+    with CaptureQueriesContext(connection) as ctx:
+        resp = CRUD.import_annos(
+            catcha_list, {'override': ['CAN_IMPORT'], 'userId': 'importer'})
+    assert resp['total_success'] == len(catcha_list)
+    assert len(ctx.captured_queries) < 20
+
+
+@pytest.mark.django_db
+def test_copy_annos_in_bulk():
+    annos = [CRUD.create_anno(make_wa_object(age_in_hours=i), is_copy=True)
+             for i in range(1, 4)]
+
+    resp = CRUD.copy_annos(annos, {'override': ['CAN_COPY'], 'name': 'x'})
+    assert resp['total_success'] == len(annos)
+    assert resp['total_failed'] == 0
+
+    for (original, c) in zip(annos, resp['success']):
+        assert c['id'] != original.anno_id
+        a = Anno._default_manager.get(pk=c['id'])
+        assert a.created == original.created
+        assert set(a.anno_tags.all()) == set(original.anno_tags.all())
+        assert a.target_set.count() == original.target_set.count()
+
+
+def with_tags(catcha, names):
+    catcha['body']['items'] = [
+        b for b in catcha['body']['items'] if b['purpose'] != PURPOSE_TAGGING
+    ] + [make_wa_tag(name) for name in names]
+    return catcha
+
+
+def create_anno_queries(catcha):
+    with CaptureQueriesContext(connection) as ctx:
+        CRUD.create_anno(catcha)
+    return len(ctx.captured_queries)
+
+
+@pytest.mark.django_db
+def test_create_taglist_fixed_queries():
+    Tag.objects.create(tag_name='existing')
+
+    few = create_anno_queries(with_tags(
+        make_wa_object(age_in_hours=1), ['existing', 'a']))
+    many = create_anno_queries(with_tags(
+        make_wa_object(age_in_hours=1),
+        ['existing'] + ['tag{}'.format(i) for i in range(30)]))
+    assert many == few
+    assert Tag.objects.count() == 32
+
+
+@pytest.mark.django_db
+def test_create_taglist_concurrent_insert(monkeypatch):
+    insert_tags = CRUD._insert_tags
+
+    def racing_insert(names):
+        # another request creates the tag between select and insert
+        Tag.objects.create(tag_name=names[0])
+        return insert_tags(names)
+    monkeypatch.setattr(CRUD, '_insert_tags', racing_insert)
+
+    tag_ids = CRUD._create_taglist(['race', 'other', 'race'])
+    assert tag_ids == [Tag.objects.get(tag_name='race').pk,
+                       Tag.objects.get(tag_name='other').pk]
+
+
+@pytest.mark.django_db(transaction=True)
+def test_create_taglist_cache():
+    try:
+        with transaction.atomic():
+            CRUD._create_taglist(['rolled_back'])
+            raise ValueError('rollback')
+    except ValueError:
+        pass
+    assert tag_cache.get_many(['rolled_back']) == {}
+
+    tag_ids = CRUD._create_taglist(['committed'])
+    assert tag_cache.get_many(['committed']) == {'committed': tag_ids[0]}
+    with CaptureQueriesContext(connection) as ctx:
+        assert CRUD._create_taglist(['committed']) == tag_ids
+    assert len(ctx.captured_queries) == 0
+
+    Tag.objects.get(tag_name='committed').delete()
+    assert tag_cache.get_many(['committed']) == {}
+
+
+def write_queries(ctx):
+    return [q['sql'] for q in ctx.captured_queries
+            if not q['sql'].startswith(('SELECT', 'SAVEPOINT', 'RELEASE'))]
+
+
+@pytest.mark.django_db
+def test_update_anno_text_only():
+    x = CRUD.create_anno(make_wa_object(age_in_hours=1))
+    catcha = copy.deepcopy(x.raw)
+    for b in catcha['body']['items']:
+        if b['purpose'] != PURPOSE_TAGGING:
+            b['value'] = 'new comment text'
+    target_ids = set(x.target_set.values_list('id', flat=True))
+    tag_ids = set(x.anno_tags.values_list('id', flat=True))
+
+    with CaptureQueriesContext(connection) as ctx:
+        CRUD.update_anno(x, catcha)
+    # anno row, and collection watermark
+    writes = write_queries(ctx)
+    assert len(writes) == 2
+    assert 'anno_collectionwatermark' in writes[1]
+
+    x = Anno._default_manager.get(pk=x.anno_id)
+    assert x.body_text == 'new comment text'
+    assert set(x.target_set.values_list('id', flat=True)) == target_ids
+    assert set(x.anno_tags.values_list('id', flat=True)) == tag_ids
+
+
+@pytest.mark.django_db
+def test_update_anno_changed_targets_and_tags():
+    x = CRUD.create_anno(with_tags(make_wa_object(age_in_hours=1), ['a', 'b']))
+    kept = x.target_set.get()
+    catcha = with_tags(copy.deepcopy(x.raw), ['b', 'c'])
+    catcha['target']['items'].append({
+        'type': 'Video',
+        'format': 'video/youtube',
+        'source': 'https://youtu.be/92vuuZt7wak',
+    })
+    CRUD.update_anno(x, catcha)
+
+    x = Anno._default_manager.get(pk=x.anno_id)
+    assert set(x.anno_tags.values_list('tag_name', flat=True)) == set(['b', 'c'])
+    assert x.target_set.count() == 2
+    assert x.target_set.filter(pk=kept.pk).exists()
+
+    catcha['target']['items'] = catcha['target']['items'][1:]
+    CRUD.update_anno(x, with_tags(catcha, []))
+    assert x.anno_tags.count() == 0
+    assert list(x.target_set.values_list('target_media', flat=True)) == [
+        'Video']
+
+
+def reply_count(anno_id):
+    return Anno._default_manager.get(pk=anno_id).reply_count
+
+
+@pytest.mark.django_db
+def test_reply_count():
+    parent = CRUD.create_anno(make_wa_object(age_in_hours=10))
+    other = CRUD.create_anno(make_wa_object(age_in_hours=10))
+    replies = [CRUD.create_anno(make_wa_object(
+        age_in_hours=5, media=ANNO, reply_to=parent.anno_id))
+        for i in range(3)]
+    assert reply_count(parent.anno_id) == 3
+
+    # stale parent instance doesn't overwrite the count
+    CRUD.update_anno(parent, copy.deepcopy(parent.raw))
+    assert reply_count(parent.anno_id) == 3
+
+    CRUD.delete_anno(replies[0])
+    assert reply_count(parent.anno_id) == 2
+
+    # move reply to other parent
+    catcha = copy.deepcopy(replies[1].raw)
+    for t in catcha['target']['items']:
+        t['source'] = other.anno_id
+    catcha['platform']['target_source_id'] = other.anno_id
+    CRUD.update_anno(replies[1], catcha)
+    assert reply_count(parent.anno_id) == 1
+    assert reply_count(other.anno_id) == 1
+
+    # bulk import, one reply already deleted
+    imported = [make_wa_object(
+        age_in_hours=1, media=ANNO, reply_to=parent.anno_id)
+        for i in range(3)]
+    imported[0]['deleted'] = True
+    resp = CRUD.import_annos(
+        imported, {'override': ['CAN_IMPORT'], 'userId': 'importer'})
+    assert resp['total_success'] == 3
+    assert reply_count(parent.anno_id) == 3
+
+    parent = Anno._default_manager.get(pk=parent.anno_id)
+    with CaptureQueriesContext(connection) as ctx:
+        assert parent.serialized['totalReplies'] == 3
+    assert len(ctx.captured_queries) == 0
+
+
+@pytest.mark.django_db
+def test_recount_replies_command():
+    parent = CRUD.create_anno(make_wa_object(age_in_hours=10))
+    CRUD.create_anno(make_wa_object(
+        age_in_hours=5, media=ANNO, reply_to=parent.anno_id))
+    Anno._default_manager.filter(pk=parent.anno_id).update(reply_count=7)
+
+    out = StringIO()
+    call_command('recount_replies', '--dry-run', stdout=out)
+    assert 'anno({}): reply_count(7), actual(1)'.format(
+        parent.anno_id) in out.getvalue()
+    assert reply_count(parent.anno_id) == 7
+
+    call_command('recount_replies', stdout=StringIO())
+    assert reply_count(parent.anno_id) == 1
+
+    out = StringIO()
+    call_command('recount_replies', stdout=out)
+    assert 'done: 0 annos' in out.getvalue()
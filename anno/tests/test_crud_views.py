@@ -1,8 +1,11 @@
+from datetime import timedelta
 import json
 import pytest
 
+from django.db import connection
 from django.urls import reverse
 from django.test import Client
+from django.test.utils import CaptureQueriesContext
 
 from anno.anno_defaults import ANNO, TEXT
 from anno.anno_defaults import ANNOTATORJS_FORMAT
@@ -13,6 +16,8 @@ from anno.errors import AnnotatorJSError
 from anno.json_models import AnnoJS
 from anno.json_models import Catcha
 from anno.models import Anno
+from anno.models import PURPOSE_TAGGING
+from anno import views
 from anno.views import crud_api
 from anno.views import _format_response
 
@@ -39,7 +44,7 @@ def test_index():
 
 @pytest.mark.django_db
 def test_method_not_allowed(wa_audio):
-    request = make_request(method='patch')
+    request = make_request(method='options')
     response = crud_api(request, '1234')
     assert response.status_code == 405
 
@@ -532,6 +537,9 @@ def test_read_203(wa_image):
             HTTP_X_CATCH_RESPONSE_FORMAT=ANNOTATORJS_FORMAT)
 
     assert response.status_code == 203
+    # validators are for an annotatorjs representation that wasn't served
+    assert not response.has_header('ETag')
+    assert not response.has_header('Last-Modified')
     resp = json.loads(response.content)
     assert 'id' in resp
     assert resp['id'] == created_id
@@ -539,3 +547,232 @@ def test_read_203(wa_image):
     assert 'id is not a number' in resp['msg']
 
 
+
+
+def make_patch_request(anno_id, patch, jwt_payload):
+    return make_json_request(
+        method='patch', anno_id=anno_id, data=json.dumps(patch),
+        jwt_payload=jwt_payload)
+
+
+@pytest.mark.django_db
+def test_patch_text_ok():
+    payload = make_jwt_payload()
+    catch = make_wa_object(age_in_hours=1, user=payload['userId'])
+    x = CRUD.create_anno(catch)
+    tags = set(x.anno_tags.values_list('tag_name', flat=True))
+
+    body = x.raw['body']
+    for b in body['items']:
+        if b['purpose'] != PURPOSE_TAGGING:
+            b['value'] = 'patched comment'
+    request = make_patch_request(x.anno_id, {'body': body}, payload)
+
+    with CaptureQueriesContext(connection) as ctx:
+        response = crud_api(request, x.anno_id)
+    assert response.status_code == 200
+    writes = [q['sql'] for q in ctx.captured_queries
+              if q['sql'].startswith(('UPDATE', 'INSERT', 'DELETE'))
+              and 'anno_collectionwatermark' not in q['sql']]
+    assert len(writes) == 1
+    assert '"body_text" =' in writes[0]
+    assert '"can_read" =' not in writes[0]
+
+    resp = json.loads(response.content.decode('utf-8'))
+    assert resp['target'] == catch['target']
+    x = Anno._default_manager.get(pk=x.anno_id)
+    assert x.body_text == 'patched comment'
+    assert x.raw['body'] == body
+    assert set(x.anno_tags.values_list('tag_name', flat=True)) == tags
+
+
+@pytest.mark.django_db
+def test_patch_platform_ok():
+    payload = make_jwt_payload()
+    x = CRUD.create_anno(make_wa_object(age_in_hours=1, user=payload['userId']))
+    request = make_patch_request(
+        x.anno_id, {'platform': {'collection_id': 'patched'}}, payload)
+    response = crud_api(request, x.anno_id)
+    assert response.status_code == 200
+
+    x = Anno._default_manager.get(pk=x.anno_id)
+    assert x.collection_id == 'patched'
+    assert x.raw['platform']['collection_id'] == 'patched'
+    assert x.raw['platform']['context_id'] == x.context_id
+
+
+@pytest.mark.django_db
+def test_patch_denied():
+    payload = make_jwt_payload()
+    catch = make_wa_object(age_in_hours=1)
+    catch['permissions']['can_update'].append(payload['userId'])
+    x = CRUD.create_anno(catch)
+
+    # can update, but not admin
+    permissions = dict(catch['permissions'])
+    permissions['can_delete'] = [payload['userId']]
+    request = make_patch_request(
+        x.anno_id, {'permissions': permissions}, payload)
+    response = crud_api(request, x.anno_id)
+    assert response.status_code == 403
+
+    # cannot update
+    request = make_patch_request(
+        x.anno_id, {'body': catch['body']}, make_jwt_payload())
+    response = crud_api(request, x.anno_id)
+    assert response.status_code == 403
+
+
+@pytest.mark.django_db
+def test_patch_invalid():
+    payload = make_jwt_payload()
+    x = CRUD.create_anno(make_wa_object(age_in_hours=1, user=payload['userId']))
+    raw = x.raw
+
+    for patch in [
+            ['not', 'an', 'object'],
+            {'id': 'other_id'},
+            {'created': '2001-01-01T00:00:00+00:00'},
+            {'target': None},
+            {'body': {'type': 'List', 'items': 'not a list'}}]:
+        request = make_patch_request(x.anno_id, patch, payload)
+        response = crud_api(request, x.anno_id)
+        assert response.status_code == 400
+
+    assert Anno._default_manager.get(pk=x.anno_id).raw == raw
+
+
+@pytest.mark.django_db
+def test_compat_anno_id_not_taken(monkeypatch):
+    taken = CRUD.create_anno(make_wa_object(age_in_hours=1))
+    CRUD.delete_anno(taken)
+    # more collisions than a few retries would cover
+    ids = [taken.anno_id] * 5 + ['1234567890123456']
+    monkeypatch.setattr(
+        views, 'generate_uid', lambda must_be_int=False: ids.pop(0))
+    assert views.generate_compat_anno_id() == '1234567890123456'
+
+
+def conditional_get(anno_id, payload, method='get', **headers):
+    request = make_request(method=method, anno_id=anno_id, jwt_payload=payload)
+    request.META.update(headers)
+    with CaptureQueriesContext(connection) as ctx:
+        response = crud_api(request, anno_id)
+    return (response, len(ctx.captured_queries))
+
+
+@pytest.mark.django_db
+def test_read_conditional():
+    payload = make_jwt_payload()
+    x = CRUD.create_anno(make_wa_object(age_in_hours=1))
+
+    # no last modified while a write in the same second could go unseen
+    (response, queries) = conditional_get(x.anno_id, payload)
+    assert response.status_code == 200
+    assert not response.has_header('Last-Modified')
+
+    Anno._default_manager.filter(pk=x.anno_id).update(
+        modified=x.modified - timedelta(seconds=5))
+    (response, queries) = conditional_get(x.anno_id, payload)
+    assert response.status_code == 200
+    etag = response['ETag']
+    last_modified = response['Last-Modified']
+
+    # current copy: checked with one query, not read nor serialized
+    (response, queries) = conditional_get(
+        x.anno_id, payload, HTTP_IF_NONE_MATCH=etag)
+    assert response.status_code == 304
+    assert queries == 1
+    (response, queries) = conditional_get(
+        x.anno_id, payload, HTTP_IF_MODIFIED_SINCE=last_modified)
+    assert response.status_code == 304
+
+    # etag is per response format
+    (response, queries) = conditional_get(
+        x.anno_id, payload, HTTP_IF_NONE_MATCH=etag,
+        **{CATCH_RESPONSE_FORMAT_HTTPHEADER: ANNOTATORJS_FORMAT})
+    assert response.status_code != 304
+    request = make_request(
+        method='get', anno_id=x.anno_id, jwt_payload=payload)
+    request.META[CATCH_RESPONSE_FORMAT_HTTPHEADER] = ANNOTATORJS_FORMAT
+    assert views.anno_etag(request, x.anno_id) not in [None, etag]
+
+    # replies change totalReplies, so the etag and last modified
+    reply = make_wa_object(age_in_hours=1, media=ANNO, reply_to=x.anno_id)
+    CRUD.create_anno(reply)
+    (response, queries) = conditional_get(
+        x.anno_id, payload, HTTP_IF_NONE_MATCH=etag)
+    assert response.status_code == 200
+    assert json.loads(response.content.decode('utf-8'))['totalReplies'] == 1
+    (response, queries) = conditional_get(
+        x.anno_id, payload, HTTP_IF_MODIFIED_SINCE=last_modified)
+    assert response.status_code == 200
+
+    # head: no serialization, same headers as get
+    (response, queries) = conditional_get(x.anno_id, payload, method='head')
+    assert response.status_code == 200
+    assert queries == 1
+    assert response.content == b''
+    assert response['ETag'] != etag
+
+    # no validators when anno can't be read
+    x.can_read = ['someone_else']
+    x.save()
+    (response, queries) = conditional_get(
+        x.anno_id, payload, HTTP_IF_NONE_MATCH=etag)
+    assert response.status_code == 403
+    assert not response.has_header('ETag')
+
+
+def conditional_write(anno_id, payload, method, data, **headers):
+    request = make_json_request(
+        method=method, anno_id=anno_id, data=json.dumps(data),
+        jwt_payload=payload)
+    request.META.update(headers)
+    return crud_api(request, anno_id)
+
+
+@pytest.mark.django_db
+def test_write_conditional():
+    payload = make_jwt_payload()
+    catcha = make_wa_object(age_in_hours=1, user=payload['userId'])
+    x = CRUD.create_anno(catcha)
+    (response, queries) = conditional_get(x.anno_id, payload)
+    etag = response['ETag']
+    patch = {'platform': {'collection_id': 'patched'}}
+
+    # stale etag: nothing written, current validators sent back
+    for (method, data) in [('put', catcha), ('patch', patch)]:
+        response = conditional_write(
+            x.anno_id, payload, method, data, HTTP_IF_MATCH='"stale"')
+        assert response.status_code == 412
+        assert response['ETag'] == etag
+    assert Anno._default_manager.get(pk=x.anno_id).modified == x.modified
+
+    # matching etag: written, and old validators not in response
+    response = conditional_write(
+        x.anno_id, payload, 'put', catcha, HTTP_IF_MATCH=etag)
+    assert response.status_code == 200
+    assert not response.has_header('ETag')
+    assert not response.has_header('Last-Modified')
+
+    # the put changed the anno, so the etag is stale now
+    response = conditional_write(
+        x.anno_id, payload, 'patch', patch, HTTP_IF_MATCH=etag)
+    assert response.status_code == 412
+    (response, queries) = conditional_get(x.anno_id, payload)
+    response = conditional_write(
+        x.anno_id, payload, 'patch', patch, HTTP_IF_MATCH=response['ETag'])
+    assert response.status_code == 200
+    response = conditional_write(
+        x.anno_id, payload, 'patch', patch, HTTP_IF_MATCH='*')
+    assert response.status_code == 200
+
+    # no validators: the view says why
+    response = conditional_write(
+        'missing', payload, 'patch', patch, HTTP_IF_MATCH='*')
+    assert response.status_code == 404
+    response = conditional_write(
+        x.anno_id, make_jwt_payload(user='someone_else'), 'patch', patch,
+        HTTP_IF_MATCH='*')
+    assert response.status_code == 403
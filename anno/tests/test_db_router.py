@@ -0,0 +1,94 @@
+from django.db import router
+from django.http import HttpResponse
+import pytest
+
+from anno import db_router
+from anno.db_router import route_reads
+from anno.db_router import sticky_users
+from anno.db_router import stream_routed
+from anno.models import Anno
+
+from .conftest import make_jwt_payload
+from .conftest import make_request
+
+
+@pytest.fixture
+def replicas(monkeypatch):
+    monkeypatch.setattr(db_router, 'CATCH_DB_REPLICAS', ['replica0'])
+    sticky_users.clear()
+    yield
+    sticky_users.clear()
+
+
+def make_view(status=200, read_methods=['GET', 'HEAD']):
+    '''view that says which db reads would go to.'''
+    @route_reads(read_methods=read_methods)
+    def view(request):
+        response = HttpResponse(status=status)
+        response.db = router.db_for_read(Anno)
+        return response
+    return view
+
+
+def make_user_request(method, user='bilbo'):
+    return make_request(method=method, jwt_payload=make_jwt_payload(user=user))
+
+
+def test_no_replicas():
+    view = make_view()
+    assert view(make_user_request('get')).db == 'default'
+
+
+@pytest.mark.usefixtures('replicas')
+def test_read_your_writes():
+    view = make_view()
+    assert view(make_user_request('get')).db == 'replica0'
+    assert router.db_for_read(Anno) == 'default'
+    assert router.db_for_write(Anno) == 'default'
+
+    # a write goes to default, and so do the user's reads for a while
+    assert view(make_user_request('post')).db == 'default'
+    assert view(make_user_request('get')).db == 'default'
+    assert view(make_user_request('get', user='frodo')).db == 'replica0'
+
+    sticky_users.clear()
+    assert view(make_user_request('get')).db == 'replica0'
+
+    # failed writes don't make users sticky
+    make_view(status=400)(make_user_request('put'))
+    assert view(make_user_request('get')).db == 'replica0'
+
+
+@pytest.mark.usefixtures('replicas')
+def test_read_only_view_and_nested_views():
+    write_view = make_view(read_methods=[])
+    read_only_view = make_view(read_methods=None)
+
+    @route_reads()
+    def outer_view(request):
+        inner = write_view(request)
+        response = HttpResponse()
+        response.db = router.db_for_read(Anno)
+        response.inner_db = inner.db
+        return response
+
+    assert read_only_view(make_user_request('post')).db == 'replica0'
+    response = outer_view(make_user_request('get'))
+    assert response.inner_db == 'default'
+    assert response.db == 'replica0'
+
+
+@pytest.mark.usefixtures('replicas')
+def test_stream_routed():
+    def rows():
+        for i in range(2):
+            yield router.db_for_read(Anno)
+
+    @route_reads()
+    def view(request):
+        return stream_routed(rows())
+
+    # reads happen after the view returns, as in a streaming response
+    stream = view(make_user_request('get'))
+    assert list(stream) == ['replica0', 'replica0']
+    assert router.db_for_read(Anno) == 'default'
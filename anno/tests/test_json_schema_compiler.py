@@ -0,0 +1,90 @@
+import copy
+import pytest
+
+from anno import json_models
+from anno.catch_json_schema import CATCH_JSON_FAST_CHECK
+from anno.catch_json_schema import CATCH_JSON_VALIDATOR
+from anno.errors import InvalidInputWebAnnotationError
+from anno.json_models import Catcha
+from anno.json_schema_compiler import compile_schema
+from anno.json_schema_compiler import UnsupportedSchemaError
+
+
+REPLACEMENTS = [None, True, 0, 1.5, 'x', 'List', [], {}, ['x'], [{}]]
+
+
+def paths(obj, prefix=()):
+    '''all paths to values in a json object.'''
+    if isinstance(obj, dict):
+        items = obj.items()
+    elif isinstance(obj, list):
+        items = enumerate(obj)
+    else:
+        return
+    for (key, value) in items:
+        yield prefix + (key,)
+        for path in paths(value, prefix + (key,)):
+            yield path
+
+
+def mutations(obj):
+    '''copies of obj with one value replaced or deleted.'''
+    for path in paths(obj):
+        for replacement in REPLACEMENTS + ['__delete__']:
+            mutated = copy.deepcopy(obj)
+            parent = mutated
+            for key in path[:-1]:
+                parent = parent[key]
+            if replacement == '__delete__':
+                del parent[path[-1]]
+            else:
+                parent[path[-1]] = replacement
+            yield mutated
+
+
+@pytest.mark.usefixtures('wa_list')
+def test_fast_check_same_as_jsonschema(wa_list):
+    assert CATCH_JSON_FAST_CHECK is not None
+
+    invalid = 0
+    for wa in wa_list:
+        assert CATCH_JSON_FAST_CHECK(wa)
+        for mutated in mutations(wa):
+            is_valid = CATCH_JSON_VALIDATOR.is_valid(mutated)
+            assert CATCH_JSON_FAST_CHECK(mutated) == is_valid
+            invalid += 0 if is_valid else 1
+    assert invalid > 0
+
+
+def test_compile_schema_keywords():
+    check = compile_schema({
+        'definitions': {'tag': {'type': 'string', 'enum': ['a', 'b']}},
+        'type': 'array',
+        'uniqueItems': True,
+        'items': [{'type': ['integer', 'null']}, {'$ref': '#/definitions/tag'}],
+    })
+    assert check([1, 'a'])
+    assert check([None])
+    assert not check([True, 'a'])
+    assert not check([1, 'c'])
+    assert not check([1, 1])
+    assert not check({})
+
+    with pytest.raises(UnsupportedSchemaError):
+        compile_schema({'type': 'string', 'pattern': '^x'})
+    with pytest.raises(UnsupportedSchemaError):
+        compile_schema({'$ref': 'http://example.com/schema.json'})
+
+
+@pytest.mark.usefixtures('wa_text')
+def test_fast_validation_same_error(wa_text, monkeypatch):
+    del wa_text['platform']
+
+    with pytest.raises(InvalidInputWebAnnotationError) as slow:
+        Catcha.check_json_schema(wa_text)
+
+    monkeypatch.setattr(json_models, 'CATCH_FAST_SCHEMA_VALIDATION', True)
+    with pytest.raises(InvalidInputWebAnnotationError) as fast:
+        Catcha.check_json_schema(wa_text)
+
+    assert str(fast.value) == str(slow.value)
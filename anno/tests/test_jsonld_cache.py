@@ -0,0 +1,74 @@
+import pytest
+
+from anno.anno_defaults import CATCH_JSONLD_CONTEXT_IRI
+from anno.json_models import Catcha
+from anno.jsonld_cache import DocumentCache
+from anno.jsonld_cache import document_cache
+
+
+class FakeRemote(object):
+    def __init__(self):
+        self.fetched = []
+
+    def __call__(self, url):
+        self.fetched.append(url)
+        return {
+            'contextUrl': None,
+            'documentUrl': url,
+            'document': '{"@context": {"name": "http://schema.org/name"}}',
+        }
+
+
+def test_catch_context_is_preloaded():
+    def no_network(url):
+        raise AssertionError('fetched context({})'.format(url))
+
+    cache = DocumentCache(loader=no_network)
+    cache.preloaded = document_cache.preloaded
+
+    doc = cache.load_document(CATCH_JSONLD_CONTEXT_IRI)
+    assert doc['documentUrl'] == CATCH_JSONLD_CONTEXT_IRI
+    assert 'catch' in doc['document']['@context']
+
+
+def test_fetch_once_and_copy():
+    remote = FakeRemote()
+    cache = DocumentCache(loader=remote)
+
+    doc1 = cache.load_document('http://example.com/ctx')
+    doc1['document']['@context']['name'] = 'changed by pyld'
+    doc2 = cache.load_document('http://example.com/ctx')
+
+    assert remote.fetched == ['http://example.com/ctx']
+    assert doc2['document']['@context']['name'] == 'http://schema.org/name'
+
+
+def test_fetch_again_when_expired():
+    remote = FakeRemote()
+    cache = DocumentCache(ttl=-1, loader=remote)
+
+    cache.load_document('http://example.com/ctx')
+    cache.load_document('http://example.com/ctx')
+    assert len(remote.fetched) == 2
+
+
+def test_evict_least_recently_used():
+    remote = FakeRemote()
+    cache = DocumentCache(size=2, loader=remote)
+
+    for url in ['http://a.com', 'http://b.com', 'http://a.com',
+                'http://c.com', 'http://a.com', 'http://b.com']:
+        cache.load_document(url)
+
+    assert remote.fetched == [
+        'http://a.com', 'http://b.com', 'http://c.com', 'http://b.com']
+    assert list(cache.cache.keys()) == ['http://a.com', 'http://b.com']
+
+
+@pytest.mark.usefixtures('wa_text')
+def test_translate_without_network(wa_text):
+    catcha = wa_text
+    translated = Catcha.expand_compact_for_context(
+        catcha, CATCH_JSONLD_CONTEXT_IRI)
+    assert translated['id'] == catcha['id']
+    assert translated['body'] == catcha['body']
@@ -0,0 +1,152 @@
+import copy
+import pytest
+
+from pyld import jsonld
+
+from anno.anno_defaults import CATCH_JSONLD_CONTEXT_IRI
+from anno.json_models import JSONLD_OPTIONS
+from anno.jsonld_cache import document_cache
+from anno import jsonld_translator
+from anno.jsonld_translator import TranslatorCache
+from anno.jsonld_translator import translate_for_context
+
+
+OTHER_CONTEXT_IRI = 'http://example.com/other-context.jsonld'
+OTHER_CONTEXT = {
+    '@context': {
+        'oa': 'http://www.w3.org/ns/oa#',
+        'as': 'http://www.w3.org/ns/activitystreams#',
+        'catch': CATCH_JSONLD_CONTEXT_IRI,
+        'dc': 'http://purl.org/dc/elements/1.1/',
+        'dcterms': 'http://purl.org/dc/terms/',
+        'foaf': 'http://xmlns.com/foaf/0.1/',
+        'rdf': 'http://www.w3.org/1999/02/22-rdf-syntax-ns#',
+        'ident': {'@type': '@id', '@id': '@id'},
+        'kind': {'@type': '@id', '@id': '@type'},
+        'Note': 'oa:Annotation',
+        'Comment': 'oa:TextualBody',
+        'Collection': 'catch:List',
+        'comment': 'oa:commenting',
+        'hasBody': {'@type': '@id', '@id': 'oa:hasBody'},
+        'hasPurpose': {'@type': '@vocab', '@id': 'oa:hasPurpose'},
+        'members': {'@type': '@id', '@id': 'as:items', '@container': '@set'},
+        'author': {'@type': '@id', '@id': 'dcterms:creator'},
+        'nick': 'foaf:name',
+        'text': 'rdf:value',
+        'mediaType': 'dc:format',
+    },
+}
+
+
+def translate_with_jsonld(annotation, context):
+    compacted = jsonld.compact(
+        annotation, annotation['@context'], options=JSONLD_OPTIONS)
+    expanded = jsonld.expand(compacted, options=JSONLD_OPTIONS)
+    return jsonld.compact(expanded, context, options=JSONLD_OPTIONS)
+
+
+@pytest.fixture
+def other_context():
+    document_cache.preload(OTHER_CONTEXT_IRI, OTHER_CONTEXT)
+    yield OTHER_CONTEXT_IRI
+    del document_cache.preloaded[OTHER_CONTEXT_IRI]
+
+
+@pytest.mark.usefixtures('wa_list')
+def test_catch_context_same_as_jsonld(wa_list):
+    for wa in wa_list:
+        translated = translate_for_context(wa, CATCH_JSONLD_CONTEXT_IRI)
+        assert translated is not None
+        assert translated == translate_with_jsonld(
+            wa, CATCH_JSONLD_CONTEXT_IRI)
+
+
+@pytest.mark.usefixtures('wa_text')
+def test_catch_context_variants(wa_text):
+    def change(key, value, path=()):
+        wa = copy.deepcopy(wa_text)
+        node = wa
+        for p in path:
+            node = node[p]
+        node[key] = value
+        return wa
+
+    translatable = [
+        change('type', ['Annotation']),
+        change('type', ['Annotation', 'Dataset']),
+        change('can_read', 'someone', ('permissions',)),
+        change('name', ['someone'], ('creator',)),
+        change('target_source_id', 7, ('platform',)),
+        change('id', 'urn:catch:123'),
+    ]
+    for wa in translatable:
+        translated = translate_for_context(wa, CATCH_JSONLD_CONTEXT_IRI)
+        assert translated is not None
+        assert translated == translate_with_jsonld(
+            wa, CATCH_JSONLD_CONTEXT_IRI)
+
+    not_translatable = [
+        change('not_in_context', 'dropped by jsonld'),
+        change('id', 'not an iri'),
+        change('id', 'oa:compact_iri'),
+        change('source', 'http://schema.org/becomes_compact_iri',
+               ('target', 'items', 0)),
+        change('purpose', 'not_a_term', ('body', 'items', 0)),
+        change('body', {'id': 'node_reference'}),
+        change('name', None, ('creator',)),
+    ]
+    for wa in not_translatable:
+        assert translate_for_context(wa, CATCH_JSONLD_CONTEXT_IRI) is None
+
+
+@pytest.mark.usefixtures('other_context')
+def test_other_context_same_as_jsonld(other_context):
+    annotation = {
+        '@context': other_context,
+        'ident': 'some-anno-id',
+        'kind': 'Note',
+        'author': {'ident': 'some-user-id', 'nick': 'some user'},
+        'hasBody': {
+            'kind': 'Collection',
+            'members': [{
+                'kind': 'Comment', 'hasPurpose': 'comment',
+                'mediaType': 'text/html', 'text': 'some comment',
+            }],
+        },
+    }
+    translated = translate_for_context(annotation, CATCH_JSONLD_CONTEXT_IRI)
+    assert translated is not None
+    assert translated == translate_with_jsonld(
+        annotation, CATCH_JSONLD_CONTEXT_IRI)
+    assert translated['body']['items'][0]['purpose'] == 'commenting'
+
+
+def test_inline_context_not_translated():
+    annotation = {
+        '@context': {'name': 'http://xmlns.com/foaf/0.1/name'},
+        'name': 'inline context',
+    }
+    assert translate_for_context(annotation, CATCH_JSONLD_CONTEXT_IRI) is None
+
+
+@pytest.mark.usefixtures('other_context')
+def test_translator_cache_errors(other_context, monkeypatch):
+    cache = TranslatorCache()
+
+    # a failed fetch is not cached: the next call compiles the translator
+    def fail_fetch(source_context, target_context):
+        raise IOError('failed to fetch context')
+    monkeypatch.setattr(jsonld_translator, 'ContextTranslator', fail_fetch)
+    assert cache.get_translator(
+        other_context, CATCH_JSONLD_CONTEXT_IRI) is None
+    monkeypatch.undo()
+    assert cache.get_translator(
+        other_context, CATCH_JSONLD_CONTEXT_IRI) is not None
+
+    # a context that can't be translated is cached as None
+    def not_translatable(source_context, target_context):
+        raise jsonld_translator.NotTranslatableError('@vocab')
+    monkeypatch.setattr(
+        jsonld_translator, 'ContextTranslator', not_translatable)
+    assert cache.get_translator(other_context, other_context) is None
+    assert (other_context, other_context) in cache.cache
@@ -1,9 +1,11 @@
 import pytest
 
+from django.db import connection
 from model_mommy import mommy
 
 from anno.anno_defaults import CATCH_CURRENT_SCHEMA_VERSION
 from anno.anno_defaults import MEDIA_TYPES
+from anno.indexes import PartialIndex
 from anno.models import Anno, Tag, Target
 
 
@@ -47,3 +49,36 @@ def test_anno_object():
     assert(anno.anno_tags.count() == 1)
     assert(Tag.objects.count() == 1)
     assert(tag1.anno_set.all()[0].anno_id == anno.anno_id)
+
+
+@pytest.mark.django_db
+def test_live_manager():
+    live = mommy.make(Anno)
+    deleted = mommy.make(Anno, anno_deleted=True)
+    assert list(Anno.live.all()) == [live]
+    assert Anno.objects.count() == 2
+
+
+@pytest.mark.django_db
+def test_live_partial_indexes():
+    with connection.cursor() as cursor:
+        cursor.execute(
+            'SELECT indexname, indexdef FROM pg_indexes WHERE tablename = %s',
+            [Anno._meta.db_table])
+        indexes = dict(cursor.fetchall())
+    for index in Anno._meta.indexes:
+        if isinstance(index, PartialIndex):
+            assert indexes[index.name].endswith(
+                'WHERE (anno_deleted = false)')
+    # `since` sync reads deleted annos too
+    assert 'WHERE' not in indexes['anno_modified_idx']
+
+    query = Anno.live.filter(context_id='x', collection_id='y').order_by(
+        '-created', '-anno_id')[:10]
+    (sql, params) = query.query.sql_with_params()
+    with connection.cursor() as cursor:
+        # empty table: have the planner show it would use the index
+        cursor.execute('SET LOCAL enable_seqscan = off')
+        cursor.execute('EXPLAIN {}'.format(sql), params)
+        plan = '\n'.join(row[0] for row in cursor.fetchall())
+    assert 'anno_live_context_idx' in plan
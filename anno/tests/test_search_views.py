@@ -1,20 +1,36 @@
 from copy import deepcopy
+from datetime import datetime
+from datetime import timedelta
+from dateutil import tz
+from io import StringIO
+from urllib.parse import urlencode
 import json
 import pytest
 
 from django.conf import settings
+from django.core.cache import caches
+from django.core.management import call_command
+from django.db import connection
 from django.db import IntegrityError
+from django.db.models import Q
 from django.test import Client
+from django.test.utils import CaptureQueriesContext
 from django.urls import reverse
 
 from anno.anno_defaults import ANNOTATORJS_FORMAT, CATCH_ANNO_FORMAT
 from anno.anno_defaults import AUDIO, IMAGE, TEXT, VIDEO, THUMB, ANNO
+from anno import db_router
 from anno.crud import CRUD
+from anno.db_router import sticky_users
 from anno.json_models import Catcha
-from anno.models import Anno, Tag, Target
+from anno.models import Anno, CollectionWatermark, Tag, Target
 from anno.models import PURPOSE_TAGGING
+from anno.search import query_can_read
+from anno.search_cache import search_cache
 from anno.json_models import Catcha
 from anno.views import search_api
+from anno.views import search_back_compat_api
+from anno.views import thread_api
 from consumer.models import Consumer
 
 from .conftest import make_annotatorjs_object
@@ -613,3 +629,671 @@ def test_search_private_catcha_ok(wa_list):
     resp = response.json()
     assert resp['total'] == total_annotations
 
+
+
+@pytest.mark.usefixtures('wa_list')
+@pytest.mark.django_db
+def test_search_cursor_pagination_ok(wa_list):
+    for wa in wa_list:
+        x = CRUD.create_anno(wa)
+    total_annotations = len(wa_list)
+
+    c = Consumer._default_manager.create()
+    payload = make_jwt_payload(apikey=c.consumer)
+    token = make_encoded_token(c.secret_key, payload)
+
+    client = Client()
+
+    # complete result to compare against
+    search_url = '{}?limit=-1'.format(reverse('create_or_search'))
+    response = client.get(
+        search_url,
+        HTTP_AUTHORIZATION='token {}'.format(token),
+        HTTP_X_CATCH_RESPONSE_FORMAT=CATCH_ANNO_FORMAT)
+    assert response.status_code == 200
+    resp = response.json()
+    assert resp['total'] == total_annotations
+    assert resp['next'] is None
+    expected_ids = [x['id'] for x in resp['rows']]
+
+    # page through with cursor
+    paged_ids = []
+    search_url = '{}?limit=2'.format(reverse('create_or_search'))
+    url = search_url
+    while True:
+        response = client.get(
+            url,
+            HTTP_AUTHORIZATION='token {}'.format(token),
+            HTTP_X_CATCH_RESPONSE_FORMAT=CATCH_ANNO_FORMAT)
+        assert response.status_code == 200
+        resp = response.json()
+        assert resp['total'] == total_annotations
+        assert resp['size'] <= 2
+        paged_ids += [x['id'] for x in resp['rows']]
+        if resp['next'] is None:
+            break
+        url = '{}&cursor={}'.format(search_url, resp['next'])
+
+    assert paged_ids == expected_ids
+
+    # offset still works as fallback
+    search_url = '{}?limit=2&offset=2'.format(reverse('create_or_search'))
+    response = client.get(
+        search_url,
+        HTTP_AUTHORIZATION='token {}'.format(token),
+        HTTP_X_CATCH_RESPONSE_FORMAT=CATCH_ANNO_FORMAT)
+    assert response.status_code == 200
+    resp = response.json()
+    assert [x['id'] for x in resp['rows']] == expected_ids[2:4]
+
+    # garbage cursor
+    search_url = '{}?limit=2&cursor=not_a_cursor'.format(
+        reverse('create_or_search'))
+    response = client.get(
+        search_url,
+        HTTP_AUTHORIZATION='token {}'.format(token),
+        HTTP_X_CATCH_RESPONSE_FORMAT=CATCH_ANNO_FORMAT)
+    assert response.status_code == 400
+
+
+@pytest.mark.usefixtures('js_list')
+@pytest.mark.django_db
+def test_search_fixed_number_of_queries(js_list):
+    # page with total, tags, targets, parents, parent targets
+    expected_queries = 5
+
+    def search_queries(response_format):
+        request = make_json_request(method='get', query_string='limit=-1')
+        request.META['HTTP_X_CATCH_RESPONSE_FORMAT'] = response_format
+        with CaptureQueriesContext(connection) as ctx:
+            response = search_api(request)
+        assert response.status_code == 200
+        return (len(ctx.captured_queries), json.loads(response.content))
+
+    def create_with_replies(js_parents):
+        for js in js_parents:
+            parent = CRUD.create_anno(Catcha.normalize(js))
+            for i in range(0, 2):
+                js_reply = make_annotatorjs_object(
+                    age_in_hours=1, media=ANNO, reply_to=parent.anno_id)
+                CRUD.create_anno(Catcha.normalize(js_reply))
+
+    half = len(js_list) // 2
+    create_with_replies(js_list[:half])
+    for response_format in [CATCH_ANNO_FORMAT, ANNOTATORJS_FORMAT]:
+        (queries, resp) = search_queries(response_format)
+        assert resp['size'] == half * 3
+        assert queries == expected_queries
+
+    # twice as many rows, same number of queries
+    create_with_replies(js_list[half:])
+    for response_format in [CATCH_ANNO_FORMAT, ANNOTATORJS_FORMAT]:
+        (queries, resp) = search_queries(response_format)
+        assert resp['size'] == len(js_list) * 3
+        assert queries == expected_queries
+
+    # reply count still right
+    (queries, resp) = search_queries(ANNOTATORJS_FORMAT)
+    for annojs in resp['rows']:
+        if annojs['media'] == 'comment':
+            assert annojs['totalComments'] == 0
+        else:
+            assert annojs['totalComments'] == 2
+
+
+@pytest.mark.usefixtures('js_list')
+@pytest.mark.django_db
+def test_search_stream_ok(js_list, monkeypatch):
+    # small chunks and hard limit, to check streaming is not capped
+    monkeypatch.setattr('anno.views.CATCH_STREAM_CHUNK_SIZE', 2)
+    monkeypatch.setattr('anno.views.CATCH_MAX_RESPONSE_LIMIT', 3)
+
+    for js in js_list:
+        x = CRUD.create_anno(Catcha.normalize(js))
+    total_annotations = len(js_list)
+
+    c = Consumer._default_manager.create()
+    payload = make_jwt_payload(apikey=c.consumer)
+    token = make_encoded_token(c.secret_key, payload)
+
+    client = Client()
+    for response_format in [CATCH_ANNO_FORMAT, ANNOTATORJS_FORMAT]:
+        search_url = '{}?limit=-1&stream=true'.format(
+            reverse('create_or_search'))
+        response = client.get(
+            search_url,
+            HTTP_AUTHORIZATION='token {}'.format(token),
+            HTTP_X_CATCH_RESPONSE_FORMAT=response_format)
+        assert response.status_code == 200
+        assert response.streaming
+        resp = json.loads(
+            b''.join(response.streaming_content).decode('utf-8'))
+        assert resp['total'] == total_annotations
+        assert resp['size'] == total_annotations
+        assert len(resp['rows']) == total_annotations
+        assert resp['next'] is None
+        if response_format == ANNOTATORJS_FORMAT:
+            assert resp['size_failed'] == 0
+
+        # same rows as non-streamed search
+        search_url = '{}?limit=3'.format(reverse('create_or_search'))
+        response = client.get(
+            search_url,
+            HTTP_AUTHORIZATION='token {}'.format(token),
+            HTTP_X_CATCH_RESPONSE_FORMAT=response_format)
+        page = response.json()
+        assert page['rows'] == resp['rows'][:3]
+
+        # streamed page with limit points to the next page
+        response = client.get(
+            '{}&stream=true'.format(search_url),
+            HTTP_AUTHORIZATION='token {}'.format(token),
+            HTTP_X_CATCH_RESPONSE_FORMAT=response_format)
+        streamed_page = json.loads(
+            b''.join(response.streaming_content).decode('utf-8'))
+        assert streamed_page['rows'] == page['rows']
+        assert streamed_page['size'] == 3
+        assert streamed_page['next'] == page['next']
+
+
+@pytest.mark.django_db(transaction=True)
+def test_search_stream_cursor(monkeypatch):
+    CRUD.create_anno(make_wa_object(age_in_hours=1))
+
+    holdable = []
+    create_cursor = connection.create_cursor
+
+    def recording_create_cursor(name=None):
+        if name:
+            holdable.append(connection.autocommit)
+        return create_cursor(name)
+    monkeypatch.setattr(connection, 'create_cursor', recording_create_cursor)
+
+    request = make_json_request(method='get', query_string='stream=true')
+    request.catchjwt = make_jwt_payload()
+    with CaptureQueriesContext(connection) as ctx:
+        response = search_api(request)
+        resp = json.loads(
+            b''.join(response.streaming_content).decode('utf-8'))
+    assert resp['total'] == 1 and resp['size'] == 1
+
+    # rows come as read: no WITH HOLD cursor, nor a count over all rows
+    assert holdable == [False]
+    assert not any('OVER ()' in q['sql'] for q in ctx.captured_queries)
+    assert not connection.in_atomic_block
+
+
+@pytest.mark.usefixtures('wa_list')
+@pytest.mark.django_db
+def test_search_count_modes(wa_list):
+    for wa in wa_list:
+        x = CRUD.create_anno(wa)
+    total_annotations = len(wa_list)
+
+    def search(query_string):
+        request = make_json_request(method='get', query_string=query_string)
+        with CaptureQueriesContext(connection) as ctx:
+            response = search_api(request)
+        return (response.status_code, json.loads(response.content),
+                [q['sql'] for q in ctx.captured_queries])
+
+    # exact is default, counted along with the page
+    (status, resp, queries) = search('limit=2')
+    assert status == 200
+    assert resp['count'] == 'exact'
+    assert resp['total'] == total_annotations
+    assert resp['size'] == 2
+    assert len([q for q in queries if 'COUNT(*) OVER' in q]) == 1
+    assert len([q for q in queries if q.startswith('SELECT COUNT(*)')]) == 0
+
+    # with cursor, count is separate
+    (status, resp, queries) = search('limit=2&cursor={}'.format(resp['next']))
+    assert resp['total'] == total_annotations
+    assert len([q for q in queries if q.startswith('SELECT COUNT(*)')]) == 1
+
+    # offset past the end still counts
+    (status, resp, queries) = search(
+        'limit=2&offset={}'.format(total_annotations))
+    assert resp['total'] == total_annotations
+    assert resp['size'] == 0
+
+    (status, resp, queries) = search('limit=2&count=estimate')
+    assert status == 200
+    assert resp['count'] == 'estimate'
+    assert resp['total'] >= 0
+    assert len([q for q in queries if q.startswith('EXPLAIN')]) == 1
+
+    (status, resp, queries) = search('limit=2&count=none')
+    assert status == 200
+    assert resp['count'] == 'none'
+    assert resp['total'] is None
+    assert resp['size'] == 2
+    assert len([q for q in queries if 'COUNT(*)' in q]) == 0
+
+    (status, resp, queries) = search('limit=2&count=whatever')
+    assert status == 400
+
+
+@pytest.mark.usefixtures('wa_list')
+@pytest.mark.django_db
+def test_search_by_body_text_ranked_and_backfill(wa_list):
+    anno_list = []
+    for wa in wa_list[:3]:
+        wa['body']['items'][0]['value'] = 'nothing to see here'
+        anno_list.append(CRUD.create_anno(wa))
+
+    # best match is the oldest, should come first when ranked
+    catcha = deepcopy(anno_list[0].raw)
+    catcha['body']['items'][0]['value'] = 'dragons, dragons and more dragons'
+    CRUD.update_anno(anno_list[0], catcha)
+    catcha = deepcopy(anno_list[2].raw)
+    catcha['body']['items'][0]['value'] = 'here be dragons'
+    CRUD.update_anno(anno_list[2], catcha)
+
+    def search(query_string):
+        request = make_json_request(method='get', query_string=query_string)
+        response = search_api(request)
+        return (response.status_code, json.loads(response.content))
+
+    (status, resp) = search('text=dragon')
+    assert status == 200
+    assert resp['total'] == 2
+    assert [x['id'] for x in resp['rows']] == [
+        anno_list[2].anno_id, anno_list[0].anno_id]
+    assert resp['next'] is None
+
+    (status, resp) = search('text=dragon&sort=rank&limit=1')
+    assert status == 200
+    assert resp['total'] == 2
+    assert resp['rows'][0]['id'] == anno_list[0].anno_id
+    assert resp['next'] is None  # no cursor when ranked
+
+    (status, resp) = search('text=dragon&sort=rank&limit=1&offset=1')
+    assert resp['rows'][0]['id'] == anno_list[2].anno_id
+
+    # search vector missing, as in rows created before the column existed
+    Anno._default_manager.all().update(body_search=None)
+    (status, resp) = search('text=dragon')
+    assert resp['total'] == 0
+
+    call_command('backfill_search_vector', batch_size=2, stdout=StringIO())
+    (status, resp) = search('text=dragon')
+    assert resp['total'] == 2
+
+
+@pytest.mark.usefixtures('wa_list')
+@pytest.mark.django_db
+def test_search_can_read_same_as_before(wa_list):
+    readers = [[], ['bilbo'], ['frodo', 'sam'], ['bilbo', 'frodo']]
+    for i, wa in enumerate(wa_list):
+        wa['permissions']['can_read'] = readers[i % len(readers)]
+        x = CRUD.create_anno(wa)
+    # null can_read is not public for search
+    Anno._default_manager.create(
+        anno_id='null_can_read', raw={}, can_read=None)
+
+    # permission filter before is_public
+    for user in ['bilbo', 'frodo', 'sam', 'gollum']:
+        before = set(Anno._default_manager.filter(
+            Q(can_read__len=0) | Q(can_read__contains=[user])
+        ).values_list('anno_id', flat=True))
+        after = set(Anno._default_manager.filter(
+            query_can_read(user)).values_list('anno_id', flat=True))
+        assert before == after
+
+    # is_public follows updates
+    x = Anno._default_manager.filter(is_public=True)[0]
+    catcha = deepcopy(x.raw)
+    catcha['permissions']['can_read'] = [catcha['creator']['id']]
+    CRUD.update_anno(x, catcha)
+    assert Anno._default_manager.get(pk=x.anno_id).is_public is False
+
+
+def make_thread_request(anno_id, jwt_payload, response_format=CATCH_ANNO_FORMAT):
+    request = make_json_request(
+        method='get', anno_id='{}/thread'.format(anno_id),
+        jwt_payload=jwt_payload)
+    request.META['HTTP_X_CATCH_RESPONSE_FORMAT'] = response_format
+    return request
+
+
+def create_reply(parent, age_in_hours, can_read=None):
+    catcha = make_wa_object(
+        age_in_hours=age_in_hours, media=ANNO, reply_to=parent.anno_id)
+    if can_read is not None:
+        catcha['permissions']['can_read'] = can_read
+    return CRUD.create_anno(catcha)
+
+
+@pytest.mark.django_db
+def test_thread_ok():
+    payload = make_jwt_payload()
+    root = CRUD.create_anno(make_wa_object(age_in_hours=10))
+    r1 = create_reply(root, 9)
+    r2 = create_reply(root, 8)
+    r1_1 = create_reply(r1, 7)
+    r1_1_1 = create_reply(r1_1, 6)
+    deleted = create_reply(r2, 5)
+    create_reply(deleted, 4)  # under deleted reply, left out
+    CRUD.delete_anno(deleted)
+    private = create_reply(r2, 3, can_read=['someone_else'])
+    create_reply(private, 2)  # under unreadable reply, left out
+    CRUD.create_anno(make_wa_object(age_in_hours=1))  # not in thread
+
+    request = make_thread_request(root.anno_id, payload)
+    with CaptureQueriesContext(connection) as ctx:
+        response = thread_api(request, root.anno_id)
+    assert response.status_code == 200
+    # anno, thread, tags, targets, parents, parents targets
+    assert len(ctx.captured_queries) == 6
+
+    resp = json.loads(response.content.decode('utf-8'))
+    assert resp['size'] == 5
+    assert resp['truncated'] is False
+    assert [row['id'] for row in resp['rows']] == [
+        root.anno_id, r1.anno_id, r2.anno_id, r1_1.anno_id, r1_1_1.anno_id]
+    assert resp['rows'][0]['totalReplies'] == 2
+
+    # can read private replies with override
+    payload['override'] = ['CAN_READ']
+    response = thread_api(
+        make_thread_request(root.anno_id, payload, ANNOTATORJS_FORMAT),
+        root.anno_id)
+    resp = json.loads(response.content.decode('utf-8'))
+    assert resp['size'] == 7
+
+
+@pytest.mark.django_db
+def test_thread_not_found_or_denied():
+    payload = make_jwt_payload()
+    response = thread_api(make_thread_request('missing', payload), 'missing')
+    assert response.status_code == 404
+
+    catcha = make_wa_object(age_in_hours=1)
+    catcha['permissions']['can_read'] = [catcha['creator']['id']]
+    x = CRUD.create_anno(catcha)
+    response = thread_api(make_thread_request(x.anno_id, payload), x.anno_id)
+    assert response.status_code == 403
+
+
+@pytest.mark.django_db
+def test_thread_url():
+    x = CRUD.create_anno(make_wa_object(age_in_hours=1))
+    assert reverse('thread_api', kwargs={'anno_id': x.anno_id}) == (
+        '/annos/{}/thread'.format(x.anno_id))
+
+
+@pytest.fixture
+def with_search_cache(monkeypatch):
+    monkeypatch.setattr(search_cache, 'cache_alias', 'default')
+    caches['default'].clear()
+    yield
+    caches['default'].clear()
+
+
+def search_collection(payload, **params):
+    query_string = '&'.join(['context_id=fake_context',
+                             'collection_id=fake_collection'] + [
+        '{}={}'.format(k, v) for (k, v) in params.items()])
+    request = make_json_request(method='get', query_string=query_string)
+    request.catchjwt = payload
+    with CaptureQueriesContext(connection) as ctx:
+        response = search_api(request)
+    assert response.status_code == 200
+    resp = json.loads(response.content.decode('utf-8'))
+    return (resp, len(ctx.captured_queries))
+
+
+@pytest.mark.usefixtures('with_search_cache')
+@pytest.mark.django_db
+def test_search_cache():
+    payload = make_jwt_payload()
+    x = CRUD.create_anno(make_wa_object(age_in_hours=2))
+
+    (resp, queries) = search_collection(payload)
+    assert resp['total'] == 1 and queries > 1
+    (cached, queries) = search_collection(payload)
+    assert cached == resp and queries == 1  # collection watermark
+
+    # other params, other user, or no collection are not the same search
+    assert search_collection(payload, limit=5)[1] > 1
+    assert search_collection(make_jwt_payload())[1] > 1
+    request = make_json_request(
+        method='get', query_string='context_id=fake_context')
+    request.catchjwt = payload
+    with CaptureQueriesContext(connection) as ctx:
+        search_api(request)
+        search_api(request)
+    assert len(ctx.captured_queries) > 2
+
+    # writes to the collection move its watermark
+    y = CRUD.create_anno(make_wa_object(age_in_hours=1))
+    (resp, queries) = search_collection(payload)
+    assert resp['total'] == 2 and queries > 1
+
+    catcha = y.serialized
+    catcha['body']['items'][0]['value'] = 'updated'
+    CRUD.update_anno(y, catcha)
+    (resp, queries) = search_collection(payload)
+    assert resp['rows'][0]['body']['items'][0]['value'] == 'updated'
+
+    CRUD.delete_anno(x)
+    (resp, queries) = search_collection(payload)
+    assert resp['total'] == 1 and queries > 1
+    assert search_collection(payload)[1] == 1
+
+
+@pytest.mark.usefixtures('with_search_cache')
+@pytest.mark.django_db
+def test_search_cache_lagging_replica(monkeypatch):
+    # 'default' plays the replica; lag is faked by undoing a write
+    monkeypatch.setattr(db_router, 'CATCH_DB_REPLICAS', ['default'])
+    sticky_users.clear()
+    payload = make_jwt_payload()
+    CRUD.create_anno(make_wa_object(age_in_hours=2))
+    watermark = CollectionWatermark._default_manager.get(
+        context_id='fake_context', collection_id='fake_collection')
+    lagging = watermark.modified
+
+    y = CRUD.create_anno(make_wa_object(age_in_hours=1))
+    watermark.refresh_from_db()
+    current = watermark.modified
+    assert current > lagging
+
+    # replica has not seen y yet: rows cached under its own watermark
+    Anno._default_manager.filter(pk=y.anno_id).update(collection_id='lag')
+    CollectionWatermark._default_manager.filter(pk=watermark.pk).update(
+        modified=lagging)
+    (resp, queries) = search_collection(payload)
+    assert resp['total'] == 1
+
+    # replica caught up: the rows cached while it lagged are not served
+    Anno._default_manager.filter(pk=y.anno_id).update(
+        collection_id='fake_collection')
+    CollectionWatermark._default_manager.filter(pk=watermark.pk).update(
+        modified=current)
+    (resp, queries) = search_collection(payload)
+    assert resp['total'] == 2 and queries > 1
+
+
+def conditional_search(view, query_string, payload, **headers):
+    request = make_json_request(method='get', query_string=query_string)
+    request.catchjwt = payload
+    request.META.update(headers)
+    with CaptureQueriesContext(connection) as ctx:
+        response = view(request)
+    return (response, len(ctx.captured_queries))
+
+
+@pytest.mark.django_db
+def test_search_conditional():
+    payload = make_jwt_payload()
+    CRUD.create_anno(make_wa_object(age_in_hours=2))
+    query_string = 'context_id=fake_context&collection_id=fake_collection'
+
+    (response, queries) = conditional_search(
+        search_api, query_string, payload)
+    assert response.status_code == 200
+    etag = response['ETag']
+    # watermark too recent for a last modified date
+    assert not response.has_header('Last-Modified')
+
+    # nothing new: one query for the watermark, no search
+    (response, queries) = conditional_search(
+        search_api, query_string, payload, HTTP_IF_NONE_MATCH=etag)
+    assert response.status_code == 304
+    assert queries == 1
+
+    # other search, or other user
+    (response, queries) = conditional_search(
+        search_api, query_string + '&limit=1', payload,
+        HTTP_IF_NONE_MATCH=etag)
+    assert response.status_code == 200
+    (response, queries) = conditional_search(
+        search_api, query_string, make_jwt_payload(),
+        HTTP_IF_NONE_MATCH=etag)
+    assert response.status_code == 200
+
+    # write in collection moves the watermark
+    CRUD.create_anno(make_wa_object(age_in_hours=1))
+    (response, queries) = conditional_search(
+        search_api, query_string, payload, HTTP_IF_NONE_MATCH=etag)
+    assert response.status_code == 200
+    assert json.loads(response.content.decode('utf-8'))['total'] == 2
+
+    # older watermark has a last modified date
+    CollectionWatermark._default_manager.update(
+        modified=datetime.now(tz.tzutc()) - timedelta(hours=1))
+    (response, queries) = conditional_search(
+        search_api, query_string, payload)
+    last_modified = response['Last-Modified']
+    (response, queries) = conditional_search(
+        search_api, query_string, payload,
+        HTTP_IF_MODIFIED_SINCE=last_modified)
+    assert response.status_code == 304
+
+    # back-compat search
+    query_string = 'contextId=fake_context&collectionId=fake_collection'
+    (response, queries) = conditional_search(
+        search_back_compat_api, query_string, payload)
+    assert response.status_code == 200
+    (response, queries) = conditional_search(
+        search_back_compat_api, query_string, payload,
+        HTTP_IF_NONE_MATCH=response['ETag'])
+    assert response.status_code == 304
+
+    # failed searches don't get the collection validators
+    for (view, params) in [
+            (search_api, 'context_id=fake_context&'
+                         'collection_id=fake_collection&count=bogus'),
+            (search_api, 'context_id=fake_context&'
+                         'collection_id=fake_collection&cursor=bogus'),
+            (search_back_compat_api, query_string + '&count=bogus')]:
+        (response, queries) = conditional_search(view, params, payload)
+        assert response.status_code == 400
+        assert not response.has_header('ETag')
+        assert not response.has_header('Last-Modified')
+
+    # no collection, no watermark
+    (response, queries) = conditional_search(
+        search_api, 'context_id=fake_context', payload)
+    assert response.status_code == 200
+    assert not response.has_header('ETag')
+
+
+def search_since(payload, **params):
+    request = make_json_request(method='get', query_string=urlencode(params))
+    request.catchjwt = payload
+    response = search_api(request)
+    return (response.status_code, json.loads(response.content.decode('utf-8')))
+
+
+@pytest.mark.django_db
+def test_search_since():
+    payload = make_jwt_payload()
+    annos = [CRUD.create_anno(make_wa_object(age_in_hours=1))
+             for i in range(4)]
+    private = make_wa_object(age_in_hours=1)
+    private['permissions']['can_read'] = [private['creator']['id']]
+    annos.append(CRUD.create_anno(private))
+    CRUD.delete_anno(annos[1])
+
+    # modified in the past, in reverse order of creation
+    start = datetime.now(tz.tzutc()) - timedelta(hours=1)
+    for (i, anno) in enumerate(reversed(annos)):
+        Anno._default_manager.filter(pk=anno.anno_id).update(
+            modified=start + timedelta(minutes=i))
+    # too recent, still within the sync lag
+    recent = CRUD.create_anno(make_wa_object(age_in_hours=1))
+
+    (status, resp) = search_since(
+        payload, since=(start - timedelta(minutes=1)).isoformat(), limit=2,
+        context_id='fake_context', collection_id='fake_collection')
+    assert status == 200
+    # annos[4] is first, but private
+    assert [row['id'] for row in resp['rows']] == [
+        annos[3].anno_id, annos[2].anno_id]
+    assert resp['deleted'] == []
+    assert resp['size'] == 2
+    assert resp['next'] == resp['since']
+
+    (status, resp) = search_since(payload, since=resp['next'], limit=2)
+    assert [row['id'] for row in resp['rows']] == [annos[0].anno_id]
+    assert [d['id'] for d in resp['deleted']] == [annos[1].anno_id]
+    assert resp['next'] is None
+
+    # nothing changed: same `since` back
+    since = resp['since']
+    (status, resp) = search_since(payload, since=since)
+    assert resp['size'] == 0
+    assert resp['since'] == since
+
+    # an update is synced again, a delete comes as tombstone
+    Anno._default_manager.filter(pk=recent.anno_id).update(
+        modified=start + timedelta(minutes=10))
+    annos[0].delete()
+    annos[0].save()
+    Anno._default_manager.filter(pk=annos[0].anno_id).update(
+        modified=start + timedelta(minutes=11))
+    (status, resp) = search_since(payload, since=since)
+    assert [row['id'] for row in resp['rows']] == [recent.anno_id]
+    assert [d['id'] for d in resp['deleted']] == [annos[0].anno_id]
+
+
+@pytest.mark.django_db
+def test_search_since_moved():
+    payload = make_jwt_payload()
+    x = CRUD.create_anno(make_wa_object(age_in_hours=1))
+    start = datetime.now(tz.tzutc()) - timedelta(hours=1)
+    Anno._default_manager.filter(pk=x.anno_id).update(modified=start)
+
+    (status, resp) = search_since(
+        payload, since=(start - timedelta(minutes=1)).isoformat(),
+        context_id='fake_context', collection_id='fake_collection')
+    assert [row['id'] for row in resp['rows']] == [x.anno_id]
+    since = resp['since']
+
+    # moved to another collection: filters match current values, so the
+    # old collection doesn't see it go; the new one gets it as a row
+    Anno._default_manager.filter(pk=x.anno_id).update(
+        collection_id='other_collection',
+        modified=start + timedelta(minutes=1))
+    (status, resp) = search_since(
+        payload, since=since,
+        context_id='fake_context', collection_id='fake_collection')
+    assert resp['rows'] == [] and resp['deleted'] == []
+    (status, resp) = search_since(
+        payload, since=since,
+        context_id='fake_context', collection_id='other_collection')
+    assert [row['id'] for row in resp['rows']] == [x.anno_id]
+
+
+@pytest.mark.django_db
+def test_search_since_invalid():
+    payload = make_jwt_payload()
+    for params in [
+            {'since': 'not a date'},
+            {'since': '2020-01-01', 'cursor': 'x'},
+            {'since': '2020-01-01', 'stream': 'true'}]:
+        (status, resp) = search_since(payload, **params)
+        assert status == 400
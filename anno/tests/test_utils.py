@@ -0,0 +1,44 @@
+from uuid import RFC_4122
+from uuid import UUID
+
+from anno import utils
+from anno.utils import generate_time_ordered_int
+from anno.utils import generate_uid
+from anno.utils import generate_uuid7
+
+
+# javascript Number.MAX_SAFE_INTEGER
+MAX_SAFE_INTEGER = 2**53 - 1
+
+
+def test_uuid7():
+    ids = [generate_uuid7() for i in range(1000)]
+    assert len(set(ids)) == len(ids)
+    for x in ids:
+        assert x.version == 7
+        assert x.variant == RFC_4122
+
+    # same order as created, as uuid and as string
+    assert ids == sorted(ids)
+    assert [str(x) for x in ids] == sorted(str(x) for x in ids)
+    millis = [x.int >> 80 for x in ids]
+    assert millis == sorted(millis)
+
+
+def test_time_ordered_int(monkeypatch):
+    ids = [generate_time_ordered_int() for i in range(10000)]
+    assert ids == sorted(ids)
+    assert len(set(ids)) == len(ids)
+    assert max(ids) < 2**52 <= MAX_SAFE_INTEGER
+
+    # clock going back doesn't break the order in a process
+    now = utils.time.time()
+    monkeypatch.setattr(utils.time, 'time', lambda: now - 3600)
+    assert generate_time_ordered_int() > ids[-1]
+
+
+def test_generate_uid():
+    assert UUID(generate_uid()).version == 7
+    compat = generate_uid(must_be_int=True)
+    assert compat.isdigit()
+    assert int(compat) <= MAX_SAFE_INTEGER
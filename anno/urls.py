@@ -13,5 +13,7 @@ urlpatterns = [
 
     # these are for catchpy v2
     url(r'^(?P<anno_id>[0-9a-zA-z-]+)$', views.crud_api, name='crud_api'),
+    url(r'^(?P<anno_id>[0-9a-zA-z-]+)/thread$',
+        views.thread_api, name='thread_api'),
     url(r'^$', views.create_or_search, name='create_or_search'),
 ]
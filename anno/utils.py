@@ -1,3 +1,13 @@
+from base64 import urlsafe_b64decode
+from base64 import urlsafe_b64encode
+import binascii
+import copy
+import dateutil.parser
+import json
+from secrets import randbits
+from threading import Lock
+import time
+from uuid import UUID
 from uuid import uuid4
 
 def string_to_number(text):
@@ -15,9 +25,107 @@ def string_to_number(text):
 
 
 def generate_uid(must_be_int=False):
-    ''' for back-compat, generate id as integer.'''
+    '''time ordered id; for back-compat, as integer if must_be_int.
+
+    ids created close in time are close in the primary key index too, so
+    inserts touch the same few index pages instead of random ones.
+    '''
+    if must_be_int:
+        return str(generate_time_ordered_int())
+    return str(generate_uuid7())
+
+
+def generate_random_uid(must_be_int=False):
+    '''random id, as generated before time ordered ids.'''
     # originally shifted by 64 to keep number within max integer value
     # but javascript in the frontend support integers with 52bits.
     # https://stackoverflow.com/a/3530326
     # https://developer.mozilla.org/en-US/docs/Web/JavaScript/Reference/Global_Objects/Number/MAX_SAFE_INTEGER
     return str(uuid4().int>>76 - 1) if must_be_int else str(uuid4())
+
+
+_uuid7_lock = Lock()
+_uuid7_last = 0
+
+
+def generate_uuid7():
+    '''uuid version 7: 48 bits of unix time in ms, then 74 random bits.
+
+    like generate_time_ordered_int, ids from the same process always
+    increase, even within the same ms.
+    '''
+    global _uuid7_last
+    millis = int(time.time() * 1000) & ((1 << 48) - 1)
+    # 122 bits that are not version or variant
+    value = (millis << 74) | randbits(73)
+    with _uuid7_lock:
+        value = max(value, _uuid7_last + 1)
+        _uuid7_last = value
+    return UUID(int=(
+        ((value >> 74) << 80) | (0x7 << 76) |
+        (((value >> 62) & 0xfff) << 64) | (0b10 << 62) |
+        (value & ((1 << 62) - 1))))
+
+
+# 2020-01-01T00:00:00Z, start of time for generate_time_ordered_int
+TIME_ORDERED_INT_EPOCH = 1577836800
+TIME_ORDERED_INT_COUNTER_BITS = 20
+
+_time_ordered_int_lock = Lock()
+_time_ordered_int_last = 0
+
+
+def generate_time_ordered_int():
+    '''52-bit int, safe as a javascript number, ordered by creation time.
+
+    32 bits of seconds since TIME_ORDERED_INT_EPOCH (until 2156), then a
+    20-bit counter that starts at a random value in its lower half every
+    second. ids from the same process always increase; ids from different
+    processes, in the same second, might collide.
+    '''
+    global _time_ordered_int_last
+    seconds = int(time.time()) - TIME_ORDERED_INT_EPOCH
+    value = (seconds << TIME_ORDERED_INT_COUNTER_BITS) | randbits(
+        TIME_ORDERED_INT_COUNTER_BITS - 1)
+    with _time_ordered_int_lock:
+        # counter overflow carries into seconds, borrowing from next second
+        value = max(value, _time_ordered_int_last + 1)
+        _time_ordered_int_last = value
+    return value
+
+
+def encode_search_cursor(created, anno_id):
+    '''opaque token pointing at the (created, anno_id) of a search row.
+
+    clients just echo it back; keep full precision of `created`, otherwise
+    rows created in the same second are skipped or repeated.
+    '''
+    key = json.dumps([created.isoformat(), anno_id])
+    return urlsafe_b64encode(key.encode('utf-8')).decode('ascii')
+
+
+def decode_search_cursor(token):
+    '''reverse of encode_search_cursor; raises ValueError if malformed.'''
+    try:
+        key = urlsafe_b64decode(token.encode('ascii')).decode('utf-8')
+        (created, anno_id) = json.loads(key)
+        return (dateutil.parser.parse(created), str(anno_id))
+    except (binascii.Error, TypeError, OverflowError,
+            UnicodeError, ValueError) as e:
+        raise ValueError('invalid search cursor({}): {}'.format(token, e))
+
+
+def json_merge_patch(target, patch):
+    '''applies json merge patch (rfc 7396) to target; returns the result.
+
+    target is not changed; a null in patch removes the key from target.
+    '''
+    if not isinstance(patch, dict):
+        return copy.deepcopy(patch)
+    result = copy.deepcopy(target) if isinstance(target, dict) else {}
+    for (key, value) in patch.items():
+        if value is None:
+            result.pop(key, None)
+        else:
+            result[key] = json_merge_patch(result.get(key, None), value)
+    return result
@@ -1,47 +1,82 @@
 from datetime import datetime
+from datetime import timedelta
 import dateutil
+import dateutil.parser
+import dateutil.tz
+from functools import partial
 from functools import wraps
+from hashlib import sha1
 import json
 import logging
 
-from django.db.models import Q
 from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import transaction
+from django.db.models import Q
+from django.db.models.functions import Now
 from django.http import HttpResponse
 from django.http import JsonResponse
+from django.http import StreamingHttpResponse
 from django.views.decorators.csrf import csrf_exempt
+from django.views.decorators.http import condition
 from django.views.decorators.http import require_http_methods
 from django.urls import reverse
+from django.utils import timezone
 from http import HTTPStatus
 
 from .json_models import AnnoJS
 from .json_models import Catcha
 from .crud import CRUD
+from .db_router import route_reads
+from .db_router import stream_routed
 from .errors import AnnoError
 from .errors import AnnotatorJSError
 from .errors import InvalidAnnotationCreatorError
 from .errors import DuplicateAnnotationIdError
+from .errors import InvalidInputWebAnnotationError
+from .errors import InvalidSearchParameterError
 from .errors import MethodNotAllowedError
 from .errors import MissingAnnotationError
 from .errors import MissingAnnotationInputError
 from .errors import NoPermissionForOperationError
 from .errors import UnknownResponseFormatError
+from .search import annotate_total_count
+from .search import estimate_total_count
+from .search import annotate_text_rank
+from .search import query_after_modified_keyset
+from .search import query_before_keyset
+from .search import query_body_text
+from .search import query_can_read
 from .search import query_username
 from .search import query_userid
 from .search import query_tags
 from .search import query_target_medias
 from .search import query_target_sources
+from .search import query_thread
+from .search_cache import search_cache
 from .models import Anno
+from .models import CollectionWatermark
+from .utils import decode_search_cursor
+from .utils import encode_search_cursor
 from .utils import generate_uid
+from .utils import json_merge_patch
 
 from .anno_defaults import ANNOTATORJS_FORMAT
 from .anno_defaults import CATCH_ADMIN_GROUP_ID
 from .anno_defaults import CATCH_ANNO_FORMAT
+from .anno_defaults import CATCH_COUNT_EXACT
+from .anno_defaults import CATCH_COUNT_ESTIMATE
+from .anno_defaults import CATCH_COUNT_MODES
+from .anno_defaults import CATCH_COUNT_NONE
 from .anno_defaults import CATCH_CURRENT_SCHEMA_VERSION
 from .anno_defaults import CATCH_JSONLD_CONTEXT_IRI
 from .anno_defaults import CATCH_MAX_RESPONSE_LIMIT
+from .anno_defaults import CATCH_PATCH_PROPERTIES
 from .anno_defaults import CATCH_RESPONSE_FORMATS
 from .anno_defaults import CATCH_EXTRA_RESPONSE_FORMATS
 from .anno_defaults import CATCH_RESPONSE_FORMAT_HTTPHEADER
+from .anno_defaults import CATCH_STREAM_CHUNK_SIZE
+from .anno_defaults import CATCH_SYNC_LAG_SECONDS
 
 
 logger = logging.getLogger(__name__)
@@ -53,6 +88,7 @@ METHOD_PERMISSION_MAP = {
     'HEAD': 'read',
     'DELETE': 'delete',
     'PUT': 'update',
+    'PATCH': 'update',
 }
 
 
@@ -145,11 +181,95 @@ def process_update(request, anno):
     return anno
 
 
-@require_http_methods(['GET', 'HEAD', 'POST', 'PUT', 'DELETE'])
+def fetch_anno_validators(request, anno_id):
+    '''(etag, last modified) of anno as it is before the request.
+
+    reads only the columns needed, not the anno json; None if anno not
+    found, user has no permission for the request method, or it's a create,
+    so the view can say why.
+    last modified is left out while the anno is less than a second old:
+    http dates have whole seconds, and a second write within the same
+    second would not change it. the etag always changes.
+    '''
+    if not hasattr(request, 'anno_validators'):
+        request.anno_validators = None
+        op = METHOD_PERMISSION_MAP.get(request.method)
+        if op is not None:
+            anno = Anno.live.filter(pk=anno_id).only(
+                'anno_id', 'modified', 'reply_count', 'can_read',
+                'can_update', 'can_delete').first()
+            if anno is not None and has_permission_for_op(op, request, anno):
+                etag = sha1('{}|{}|{}|{}'.format(
+                    anno.anno_id, anno.modified.isoformat(),
+                    anno.reply_count, fetch_response_format(request),
+                ).encode('utf-8')).hexdigest()
+                last_modified = anno.modified
+                if timezone.now() - last_modified < timedelta(seconds=1):
+                    last_modified = None
+                request.anno_validators = ('"{}"'.format(etag), last_modified)
+    return request.anno_validators
+
+
+def anno_etag(request, anno_id):
+    validators = fetch_anno_validators(request, anno_id)
+    return validators[0] if validators else None
+
+
+def anno_last_modified(request, anno_id):
+    validators = fetch_anno_validators(request, anno_id)
+    return validators[1] if validators else None
+
+
+def drop_stale_validators(request, response):
+    '''removes ETag and Last-Modified, unless they describe the response.
+
+    they do for a 200 to a read, a 304, or a 412 (validators of the
+    current resource); not for errors, a 203 with some other
+    representation, nor writes, that change the resource.
+    '''
+    if response.status_code in (
+            HTTPStatus.NOT_MODIFIED, HTTPStatus.PRECONDITION_FAILED):
+        return response
+    if response.status_code == HTTPStatus.OK and (
+            request.method in ('GET', 'HEAD')):
+        return response
+    for header in ('ETag', 'Last-Modified'):
+        if response.has_header(header):
+            del response[header]
+    return response
+
+
+def anno_condition(view_func):
+    '''view decorator: conditional requests against the current anno.
+
+    If-Match, If-None-Match and friends are checked for reads and writes
+    alike; when there are no validators, the view answers (404, 403, or a
+    create). validators are only sent back when they describe the
+    response, see drop_stale_validators.
+    '''
+    conditional_view = condition(
+        etag_func=anno_etag, last_modified_func=anno_last_modified)(view_func)
+
+    def _decorator(request, anno_id):
+        if fetch_anno_validators(request, anno_id) is None:
+            return view_func(request, anno_id)
+        return drop_stale_validators(
+            request, conditional_view(request, anno_id))
+    return wraps(view_func)(_decorator)
+
+
+@require_http_methods(['GET', 'HEAD', 'POST', 'PUT', 'PATCH', 'DELETE'])
 @csrf_exempt
 @require_catchjwt
+@route_reads(read_methods=['GET', 'HEAD'])
+@anno_condition
 def crud_api(request, anno_id):
     '''view to deal with crud api requests.'''
+    if request.method == 'HEAD' and fetch_anno_validators(request, anno_id):
+        # anno is there and readable; no body, so no need to serialize it
+        return HttpResponse(
+            status=HTTPStatus.OK, content_type='application/json')
+
     try:
         resp = _do_crud_api(request, anno_id)
     except AnnoError as e:
@@ -227,6 +347,8 @@ def _do_crud_api(request, anno_id):
             r = CRUD.delete_anno(anno)
         elif request.method == 'PUT':
             r = process_update(request, anno)
+        elif request.method == 'PATCH':
+            r = process_partial_update(request, anno)
         else:
             raise MethodNotAllowedError(
                 'method ({}) not allowed'.format(request.method))
@@ -257,39 +379,197 @@ def _format_response(anno_result, response_format):
             raise UnknownResponseFormatError(
                 'unknown response format({})'.format(response_format))
     else:  # assume it's a QuerySet resulting from search
+        check_search_response_format(response_format)
+        failed = []
         response = {
-             'rows': [],
+            'rows': list(_format_search_rows(
+                anno_result, response_format, failed)),
         }
         if response_format == ANNOTATORJS_FORMAT:
-            failed = []
-            for anno in anno_result:
-                try:
-                    annojs = AnnoJS.convert_from_anno(anno)
-                except AnnotatorJSError as e:
-                    failed.append({'id': anno.anno_id, 'msg': str(e)})
-                else:
-                    response['rows'].append(annojs)
             response['failed'] = failed
             response['size_failed'] = len(failed)
-        elif response_format == CATCH_ANNO_FORMAT:
-            # doesn't need formatting! SERIALIZE as webannotation
-            for anno in anno_result:
-                response['rows'].append(anno.serialized)
-        else:
-            # worked hard and have nothing to show: format UNKNOWN
-            raise UnknownResponseFormatError(
-                'unknown response format({})'.format(response_format))
 
     return response
 
 
-def partial_update_api(request, anno_id):
-    pass
+def check_search_response_format(response_format):
+    if response_format not in [ANNOTATORJS_FORMAT, CATCH_ANNO_FORMAT]:
+        # worked hard and have nothing to show: format UNKNOWN
+        raise UnknownResponseFormatError(
+            'unknown response format({})'.format(response_format))
+
+
+def _format_search_rows(anno_list, response_format, failed):
+    '''generates formatted rows; annos that can't be formatted go to `failed`.'''
+    for anno in anno_list:
+        if response_format == ANNOTATORJS_FORMAT:
+            try:
+                yield AnnoJS.convert_from_anno(anno)
+            except AnnotatorJSError as e:
+                failed.append({'id': anno.anno_id, 'msg': str(e)})
+        else:
+            # doesn't need formatting! SERIALIZE as webannotation
+            yield anno.serialized
 
 
+@require_http_methods(['GET', 'HEAD'])
+@csrf_exempt
+@require_catchjwt
+@route_reads()
+def thread_api(request, anno_id):
+    '''view for an anno and all replies under it, in one response.'''
+    try:
+        resp = _do_thread_api(request, anno_id)
+    except AnnoError as e:
+        return JsonResponse(status=e.status,
+                            data={'status': e.status, 'payload': [str(e)]})
+    return JsonResponse(status=HTTPStatus.OK, data=resp)
+
+
+def _do_thread_api(request, anno_id):
+    anno = CRUD.get_anno(anno_id)
+    if anno is None:
+        raise MissingAnnotationError('anno({}) not found'.format(anno_id))
+    if not has_permission_for_op('read', request, anno):
+        raise NoPermissionForOperationError(
+            'no permission to read anno({}) for user({})'.format(
+                anno_id, request.catchjwt['userId']))
+
+    user_id = None if can_read_all(request) else request.catchjwt['userId']
+    # fetch one extra row to know if thread was cut at the hard limit
+    thread = list(query_thread(
+        anno_id, user_id=user_id, limit=CATCH_MAX_RESPONSE_LIMIT + 1))
+    truncated = len(thread) > CATCH_MAX_RESPONSE_LIMIT
+    thread = thread[:CATCH_MAX_RESPONSE_LIMIT]
+
+    # avoid queries per row when serializing
+    CRUD.preload_related(thread)
+
+    response = _format_response(thread, fetch_response_format(request))
+    response['size'] = len(thread)
+    response['truncated'] = truncated
+    return response
+
+
+def _search_collection(request, back_compat=False):
+    '''(context_id, collection_id) the search is within, None if not.'''
+    if back_compat:
+        collection = (request.GET.get('contextId', None),
+                      request.GET.get('collectionId', None))
+    else:
+        collection = (request.GET.get('context_id', None),
+                      request.GET.get('collection_id', None))
+    return collection if all(collection) else None
+
+
+def _search_params(request, back_compat=False):
+    '''all search params, response format and whose permissions apply.'''
+    scope = None if can_read_all(request) else request.catchjwt['userId']
+    params = sorted((k, request.GET.getlist(k)) for k in request.GET)
+    return [back_compat, _search_response_format(request, back_compat),
+            scope, params]
+
+
+def fetch_search_watermark(request, back_compat=False):
+    '''(modified, db now) of the collection searched, None if no watermark.
+
+    read through the same connection as the search rows, before them; see
+    search_cache.
+    '''
+    if not hasattr(request, 'search_watermark'):
+        request.search_watermark = None
+        collection = _search_collection(request, back_compat)
+        if collection is not None:
+            request.search_watermark = \
+                CollectionWatermark._default_manager.filter(
+                    context_id=collection[0], collection_id=collection[1],
+                ).annotate(now=Now()).values_list('modified', 'now').first()
+    return request.search_watermark
+
+
+def _search_cache_key(request, back_compat=False):
+    '''search_cache key for request, None if response can't be cached.
+
+    only searches within a collection that has a watermark are cached.
+    '''
+    if not search_cache.enabled or request.method not in ['GET', 'HEAD']:
+        return None
+    if is_sync_search(request):
+        return None  # rows show up as they get older than the sync lag
+    watermark = fetch_search_watermark(request, back_compat)
+    if watermark is None:
+        return None
+    return search_cache.key(
+        _search_collection(request, back_compat), watermark[0],
+        _search_params(request, back_compat))
+
+
+def fetch_search_validators(request, back_compat=False):
+    '''(etag, last modified) for a search within a collection, else None.
+
+    computed from the collection watermark, without running the search.
+    last modified is None while the watermark is less than a second old:
+    http dates have no fractions of a second, so a write later in the same
+    second would not be seen by If-Modified-Since.
+    '''
+    if not hasattr(request, 'search_validators'):
+        request.search_validators = None
+        # sync rows show up as they get older than the sync lag, even if
+        # there are no writes
+        watermark = None
+        if request.method in ['GET', 'HEAD'] and (
+                not is_sync_search(request)):
+            watermark = fetch_search_watermark(request, back_compat)
+        if watermark is not None:
+            (modified, now) = watermark
+            etag = sha1(json.dumps(
+                [modified.isoformat(), _search_params(request, back_compat)]
+            ).encode('utf-8')).hexdigest()
+            if (now - modified).total_seconds() < 1:
+                modified = None
+            request.search_validators = ('"{}"'.format(etag), modified)
+    return request.search_validators
+
+
+def search_etag(request, back_compat=False):
+    validators = fetch_search_validators(request, back_compat)
+    return validators[0] if validators else None
+
+
+def search_last_modified(request, back_compat=False):
+    validators = fetch_search_validators(request, back_compat)
+    return validators[1] if validators else None
+
+
+def search_condition(back_compat=False):
+    '''view decorator: conditional searches against the collection watermark.
+
+    validators are only sent back when they describe the response, not
+    with errors; see drop_stale_validators.
+    '''
+    def _decorator(view_func):
+        conditional_view = condition(
+            etag_func=partial(search_etag, back_compat=back_compat),
+            last_modified_func=partial(
+                search_last_modified, back_compat=back_compat),
+        )(view_func)
+
+        def _wrapped(request):
+            return drop_stale_validators(request, conditional_view(request))
+        return wraps(view_func)(_wrapped)
+    return _decorator
+
+
+@route_reads()
+@search_condition()
 def search_api(request):
     logger.debug('search query=({})'.format(request.GET))
     try:
+        if is_sync_search(request):
+            resp = _do_search_since(request)
+            return JsonResponse(status=HTTPStatus.OK, data=resp)
+        if is_streaming_search(request):
+            return _do_search_stream(request)
         resp = _do_search_api(request)
         return JsonResponse(status=HTTPStatus.OK, data=resp)
 
@@ -308,9 +588,13 @@ def search_api(request):
 @require_http_methods(['GET', 'HEAD', 'POST'])
 @csrf_exempt
 @require_catchjwt
+@route_reads()
+@search_condition(back_compat=True)
 def search_back_compat_api(request):
     logger.debug('search_back_compat query=({})'.format(request.GET))
     try:
+        if is_streaming_search(request):
+            return _do_search_stream(request, back_compat=True)
         resp = _do_search_api(request, back_compat=True)
         return JsonResponse(status=HTTPStatus.OK, data=resp)
 
@@ -326,30 +610,55 @@ def search_back_compat_api(request):
             data={'status': HTTPStatus.INTERNAL_SERVER_ERROR, 'payload': [str(e)]})
 
 
-def _do_search_api(request, back_compat=False):
+def can_read_all(request):
+    '''true if requesting user can read annos regardless of `can_read`.'''
+    # TODO: check override POLICIES (override allow private reads)
+    return 'CAN_READ' in request.catchjwt.get('override', []) or \
+        request.catchjwt['userId'] == CATCH_ADMIN_GROUP_ID
 
+
+def _build_search_query(request, back_compat=False, deleted=False):
+    '''search filters and ordering, no paging.'''
     payload = request.catchjwt
     logger.debug('_do_search payload[userid]=({}) | back_compat={}'.format(
         payload['userId'], back_compat))
 
-    # filter out the soft-deleted
-    query = Anno._default_manager.filter(anno_deleted=False)
+    if deleted:
+        query = Anno._default_manager.all()
+    else:
+        # filter out the soft-deleted
+        query = Anno.live.all()
 
-    # TODO: check override POLICIES (override allow private reads)
-    if 'CAN_READ' not in payload.get('override', []) \
-       and request.catchjwt['userId'] != CATCH_ADMIN_GROUP_ID:
+    if not can_read_all(request):
         # filter out permission cannot_read
-        q = Q(can_read__len=0) | Q(can_read__contains=[payload['userId']])
-        query = query.filter(q)
+        query = query.filter(query_can_read(payload['userId']))
 
     if back_compat:
         query = process_search_back_compat_params(request, query)
     else:
         query = process_search_params(request, query)
 
-    # sort by created date, descending (more recent first)
-    query = query.order_by('-created')
+    # stored search vector is not returned, don't fetch it
+    query = query.defer('body_search')
+
+    if is_ranked_search(request):
+        # best text matches first
+        query = annotate_text_rank(query, request.GET['text'])
+        query = query.order_by('-search_rank', '-created', '-anno_id')
+    else:
+        # sort by created date, descending (more recent first)
+        # anno_id breaks ties so the order is strict, as needed by the cursor
+        query = query.order_by('-created', '-anno_id')
+    return query
+
+
+def is_ranked_search(request):
+    return request.GET.get('sort', '') == 'rank' and \
+        bool(request.GET.get('text', ''))
 
+
+def _fetch_search_paging(request, query):
+    '''returns (limit, offset, query positioned at cursor, if any).'''
     # max results and offset
     try:
         limit = int(request.GET.get('limit', 10))
@@ -361,32 +670,279 @@ def _do_search_api(request, back_compat=False):
     except ValueError:
         offset = 0
 
-    # check if limit -1 meaning complete result
-    if limit < 0:
-        q_result = query[offset:]
-    else:
-        q_result = query[offset:(offset+limit)]
-    total = query.count()      # is it here when the querysets are evaluated?
-    size = q_result.count()
+    # keyset pagination: cursor takes precedence over offset, and
+    # does not get slower the deeper the client pages
+    cursor = request.GET.get('cursor', None)
+    if cursor:
+        if is_ranked_search(request):
+            raise InvalidSearchParameterError(
+                'cursor not supported with sort by rank, use offset')
+        try:
+            (created, anno_id) = decode_search_cursor(cursor)
+        except ValueError as e:
+            raise InvalidSearchParameterError(str(e))
+        query = query.filter(query_before_keyset(created, anno_id))
+        offset = 0
 
-    # hard limit for response; to avoid out-of-memory errors
-    if size > CATCH_MAX_RESPONSE_LIMIT:
-        q_result = q_result[:CATCH_MAX_RESPONSE_LIMIT]
-        size = q_result.count()
+    return (limit, offset, query)
 
+
+def _search_response_format(request, back_compat=False):
     if back_compat:
-        response_format = ANNOTATORJS_FORMAT
+        return ANNOTATORJS_FORMAT
     else:
-        response_format = fetch_response_format(request)
+        return fetch_response_format(request)
+
 
+def _do_search_api(request, back_compat=False):
+    cache_key = _search_cache_key(request, back_compat)
+    if cache_key is not None:
+        response = search_cache.get(cache_key)
+        if response is not None:
+            return response
+
+    query = _build_search_query(request, back_compat)
+    (limit, offset, q_page) = _fetch_search_paging(request, query)
+
+    # hard limit for response; to avoid out-of-memory errors
+    # limit -1 means complete result, up to the hard limit
+    if limit < 0 or limit > CATCH_MAX_RESPONSE_LIMIT:
+        page_size = CATCH_MAX_RESPONSE_LIMIT
+    else:
+        page_size = limit
+
+    count_mode = _fetch_search_count_mode(request)
+    count_over = _is_count_over(request, count_mode)
+    if count_over:
+        q_page = annotate_total_count(q_page)
+
+    # fetch one extra row to know if there's a next page
+    q_result = list(q_page[offset:(offset + page_size + 1)])
+    total = _search_total(query, q_result, count_mode, count_over)
+    has_next = len(q_result) > page_size
+    q_result = q_result[:page_size]
+    size = len(q_result)
+
+    if has_next and q_result and not is_ranked_search(request):
+        last = q_result[-1]
+        next_cursor = encode_search_cursor(last.created, last.anno_id)
+    else:
+        next_cursor = None
+
+    # avoid queries per row when serializing
+    CRUD.preload_related(q_result)
+
+    response_format = _search_response_format(request, back_compat)
     response = _format_response(q_result, response_format)
     response['total'] = total  # add response info
     response['size'] = size
     response['limit'] = limit
     response['offset'] = offset
+    response['next'] = next_cursor
+    response['count'] = count_mode
+
+    if cache_key is not None:
+        search_cache.set(cache_key, response)
+    return response
+
+
+def _fetch_search_count_mode(request):
+    count_mode = request.GET.get('count', CATCH_COUNT_EXACT).lower()
+    if count_mode not in CATCH_COUNT_MODES:
+        raise InvalidSearchParameterError(
+            'invalid count({}), expected one of ({})'.format(
+                count_mode, ','.join(CATCH_COUNT_MODES)))
+    return count_mode
+
+
+def _is_count_over(request, count_mode):
+    '''true if exact total can come with the page rows.
+
+    with a cursor, the page query only sees rows past the cursor, so the
+    total has to be counted separately.
+    '''
+    return count_mode == CATCH_COUNT_EXACT and not request.GET.get('cursor')
+
+
+def _search_total(query, q_result, count_mode, count_over):
+    if count_mode == CATCH_COUNT_NONE:
+        return None
+    if count_mode == CATCH_COUNT_ESTIMATE:
+        return estimate_total_count(query)
+    if count_over and q_result:
+        return q_result[0].search_total
+    # no rows in page, or total not counted along with it
+    return query.count()
+
+
+def is_sync_search(request):
+    return 'since' in request.GET
+
+
+def _do_search_since(request):
+    '''annos modified after `since`; soft deleted ones as tombstones.
+
+    `since` is the `since` token of a previous response, or an iso 8601
+    date. rows are in (modified, anno_id) order, and leave out the last
+    CATCH_SYNC_LAG_SECONDS: a write that commits late might have an older
+    `modified` than rows a client already synced past.
+
+    filters and read permission match the current values of rows: an anno
+    moved out of the filters (e.g. to another collection) or that can no
+    longer be read is not reported at all, neither as row nor tombstone.
+    clients that need to see those go need a full resync.
+    '''
+    if request.GET.get('cursor', None) or is_ranked_search(request) or (
+            is_streaming_search(request)):
+        raise InvalidSearchParameterError(
+            '`since` not supported with cursor, sort by rank or stream')
+
+    since = request.GET['since']
+    try:
+        (modified, anno_id) = decode_search_cursor(since)
+        keyset = query_after_modified_keyset(modified, anno_id)
+    except ValueError:
+        try:
+            modified = dateutil.parser.parse(since)
+        except (ValueError, OverflowError):
+            raise InvalidSearchParameterError(
+                'invalid `since`({}): not a token or a date'.format(since))
+        if modified.tzinfo is None:
+            modified = modified.replace(tzinfo=dateutil.tz.tzutc())
+        keyset = Q(modified__gt=modified)
+
+    query = _build_search_query(request, deleted=True).filter(keyset).filter(
+        modified__lt=timezone.now() - timedelta(
+            seconds=CATCH_SYNC_LAG_SECONDS)).order_by('modified', 'anno_id')
+
+    (limit, offset, query) = _fetch_search_paging(request, query)
+    if limit < 0 or limit > CATCH_MAX_RESPONSE_LIMIT:
+        page_size = CATCH_MAX_RESPONSE_LIMIT
+    else:
+        page_size = limit
+
+    # fetch one extra row to know if there's a next page
+    q_result = list(query[:page_size + 1])
+    has_next = len(q_result) > page_size
+    q_result = q_result[:page_size]
+
+    live = [a for a in q_result if not a.anno_deleted]
+    CRUD.preload_related(live)
+    response = _format_response(live, fetch_response_format(request))
+    response['deleted'] = [
+        {'id': a.anno_id, 'modified': a.modified.isoformat()}
+        for a in q_result if a.anno_deleted]
+    response['size'] = len(q_result)
+    response['limit'] = limit
+    if q_result:
+        last = q_result[-1]
+        since = encode_search_cursor(last.modified, last.anno_id)
+    # `since` for the next sync; `next` only if there are more rows now
+    response['since'] = since
+    response['next'] = since if has_next else None
+    return response
+
+
+def is_streaming_search(request):
+    return request.GET.get('stream', '').lower() in ['true', '1']
+
+
+def _do_search_stream(request, back_compat=False):
+    '''search response written in chunks, as rows are read from db.
+
+    rows come from a server-side cursor, so `limit=-1` is not capped by
+    CATCH_MAX_RESPONSE_LIMIT and memory stays flat for any result size.
+    the cursor is read in a transaction held by the response, so it is not
+    WITH HOLD (that has postgres run the whole query before the first row);
+    the exact total is counted after the rows, not along with them.
+
+    postgres still reads every matching row before the first one when the
+    order can't come from an index (rank sort, or filters that don't use
+    the sort index), and the transaction stays open, holding its snapshot,
+    until the client has read the whole response.
+    '''
+    query = _build_search_query(request, back_compat)
+    (limit, offset, q_page) = _fetch_search_paging(request, query)
+
+    # fail before the response starts if there's nothing to show
+    response_format = _search_response_format(request, back_compat)
+    check_search_response_format(response_format)
+
+    count_mode = _fetch_search_count_mode(request)
+
+    if limit < 0:
+        q_result = q_page[offset:]
+    else:
+        # one extra row to know if there's a next page
+        q_result = q_page[offset:(offset + limit + 1)]
+
+    response = StreamingHttpResponse(
+        stream_routed(_generate_search_stream(
+            query, q_result, response_format, count_mode, limit, offset,
+            with_cursor=not is_ranked_search(request))),
+        status=HTTPStatus.OK, content_type='application/json')
     return response
 
 
+def _generate_search_stream(
+        query, q_result, response_format, count_mode, limit, offset,
+        with_cursor=True):
+    '''json search response, same envelope as _do_search_api.'''
+    encoder = DjangoJSONEncoder()
+    failed = []
+    size = 0
+    last = None
+    has_next = False
+
+    yield '{"rows": ['
+    separator = ''
+    with transaction.atomic(using=q_result.db):
+        for chunk in _chunks(q_result.iterator(), CATCH_STREAM_CHUNK_SIZE):
+            if limit >= 0 and size + len(chunk) > limit:
+                has_next = True
+                chunk = chunk[:(limit - size)]
+            if not chunk:
+                break
+
+            CRUD.preload_related(chunk)
+            for row in _format_search_rows(chunk, response_format, failed):
+                yield separator + encoder.encode(row)
+                separator = ', '
+            size += len(chunk)
+            last = chunk[-1]
+
+        # total goes last, when streaming
+        total = _search_total(query, [], count_mode, False)
+
+    envelope = [
+        ('total', total),
+        ('size', size),
+        ('limit', limit),
+        ('offset', offset),
+        ('next', encode_search_cursor(last.created, last.anno_id)
+            if has_next and with_cursor and last is not None else None),
+    ]
+    envelope.append(('count', count_mode))
+    if response_format == ANNOTATORJS_FORMAT:
+        envelope.append(('failed', failed))
+        envelope.append(('size_failed', len(failed)))
+    yield ']'
+    for (key, value) in envelope:
+        yield ', {}: {}'.format(encoder.encode(key), encoder.encode(value))
+    yield '}'
+
+
+def _chunks(iterable, chunk_size):
+    chunk = []
+    for item in iterable:
+        chunk.append(item)
+        if len(chunk) >= chunk_size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
 def process_search_params(request, query):
     usernames = request.GET.getlist('username', [])
     if usernames:
@@ -411,7 +967,7 @@ def process_search_params(request, query):
 
     text = request.GET.get('text', [])
     if text:
-        query = query.filter(body_text__search=text)
+        query = query.filter(query_body_text(text))
 
     # custom searches for platform params
     q = Anno.custom_manager.search_expression(request.GET)
@@ -425,7 +981,7 @@ def process_search_params(request, query):
 def process_search_back_compat_params(request, query):
     target = request.GET.get('uri', None)
     if target:
-        query = query.filter(raw__platform__target_source_id=target)
+        query = query.filter(target_source_id=target)
 
     medias = request.GET.getlist('media', [])
     if medias:
@@ -440,7 +996,7 @@ def process_search_back_compat_params(request, query):
 
     text = request.GET.get('text', [])
     if text:
-        query = query.filter(body_text__search=text)
+        query = query.filter(query_body_text(text))
 
     userids = request.GET.getlist('userid', [])
     if userids:
@@ -456,11 +1012,11 @@ def process_search_back_compat_params(request, query):
 
     context_id = request.GET.get('contextId', None)
     if context_id:
-        query = query.filter(raw__platform__context_id=context_id)
+        query = query.filter(context_id=context_id)
 
     collection_id = request.GET.get('collectionId', None)
     if collection_id:
-        query = query.filter(raw__platform__collection_id=collection_id)
+        query = query.filter(collection_id=collection_id)
 
     parent_id = request.GET.get('parentid', None)
     if parent_id:
@@ -500,22 +1056,47 @@ def stash(request):
 
 
 
-def process_partial_update(request, anno_id):
-    # assumes request.method == PUT
-    return {
-        'status': HTTPStatus.NOT_IMPLEMENTED,
-        'payload': ['partial update not implemented.']}
+def process_partial_update(request, anno):
+    '''applies json merge patch (rfc 7396) in request body to anno.
+
+    the patch is applied to the stored catcha, so no json-ld normalization;
+    only the patched properties are validated and written.
+    '''
+    # throws MissingAnnotationInputError
+    patch = get_input_json(request)
+    requesting_user = request.catchjwt['userId']
 
-    # retrieve anno
+    if not isinstance(patch, dict):
+        raise InvalidInputWebAnnotationError(
+            'anno({}): merge patch must be a json object'.format(anno.anno_id))
 
-    # request user can update this?
+    current = anno.serialized
+    for (key, value) in patch.items():
+        if key not in CATCH_PATCH_PROPERTIES and value != current.get(key):
+            raise InvalidInputWebAnnotationError(
+                'anno({}): property({}) cannot be patched'.format(
+                    anno.anno_id, key))
 
-    # validates -- no formatting here
+    catcha = json_merge_patch(anno.raw, dict(
+        (k, v) for (k, v) in patch.items() if k in CATCH_PATCH_PROPERTIES))
+    changed = [p for p in CATCH_PATCH_PROPERTIES
+               if catcha.get(p) != anno.raw.get(p)]
 
-    # performs update and save to database
+    # throws InvalidInputWebAnnotationError
+    Catcha.check_json_schema_properties(catcha, changed)
 
-    # needs formatting?
-    pass
+    # check if trying to update permissions
+    if 'permissions' in changed and (
+            not CRUD.is_identical_permissions(catcha, anno.raw)):
+        if not has_permission_for_op('admin', request, anno):
+            msg = 'user({}) not allowed to admin anno({})'.format(
+                requesting_user, anno.anno_id)
+            logger.info(msg)
+            raise NoPermissionForOperationError(msg)
+
+    # throws AnnoError
+    anno = CRUD.patch_anno(anno, catcha, changed)
+    return anno
 
 
 @require_http_methods(['POST', 'GET'])
@@ -535,11 +1116,22 @@ def create_or_search(request):
 @require_catchjwt
 def crud_compat_create(request):
     '''view for create, with no anno_id in querystring.'''
-    must_be_int = True
-    anno_id = generate_uid(must_be_int)
+    anno_id = generate_compat_anno_id()
     return crud_api(request, anno_id)
 
 
+def generate_compat_anno_id():
+    '''integer anno id, not taken by any anno, soft deleted or not.
+
+    time ordered integer ids have only 20 bits to tell apart ids created in
+    the same second, so ids from concurrent processes might collide.
+    '''
+    while True:
+        anno_id = generate_uid(must_be_int=True)
+        if not Anno._default_manager.filter(pk=anno_id).exists():
+            return anno_id
+
+
 @require_http_methods('DELETE')
 @csrf_exempt
 @require_catchjwt
@@ -551,6 +1143,7 @@ def crud_compat_delete(request, anno_id):
 @require_http_methods('POST')
 @csrf_exempt
 @require_catchjwt
+@route_reads(read_methods=[])
 def crud_compat_update(request, anno_id):
     '''back compat view for update.'''
     try:
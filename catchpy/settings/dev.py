@@ -49,6 +49,8 @@ DATABASES = {
         'ATOMIC_REQUESTS': False,
     },
 }
+# DATABASES above has no replicas
+CATCH_DB_REPLICAS = []
 
 LOGGING = {
     'version': 1,
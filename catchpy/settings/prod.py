@@ -89,6 +89,31 @@ DATABASES = {
     },
 }
 
+# read replicas of default db, as space-separated list of host[:port]; same
+# db name, and same creds unless CATCHPY_DB_REPLICA_USER/PASSWORD are set
+CATCH_DB_REPLICAS = []
+for (i, replica) in enumerate(
+        os.environ.get('CATCHPY_DB_REPLICA_HOSTS', '').split()):
+    (replica_host, _, replica_port) = replica.partition(':')
+    alias = 'replica{}'.format(i)
+    DATABASES[alias] = dict(
+        DATABASES['default'],
+        HOST=replica_host,
+        PORT=replica_port or DATABASES['default']['PORT'],
+        USER=os.environ.get(
+            'CATCHPY_DB_REPLICA_USER', DATABASES['default']['USER']),
+        PASSWORD=os.environ.get(
+            'CATCHPY_DB_REPLICA_PASSWORD', DATABASES['default']['PASSWORD']),
+    )
+    CATCH_DB_REPLICAS.append(alias)
+
+# searches and reads go to replicas, if any; writes go to default
+DATABASE_ROUTERS = ['anno.db_router.ReplicaRouter']
+
+# seconds after a write that the same user reads from default, 0 to disable
+CATCH_DB_REPLICA_STICKY_SECONDS = int(os.environ.get(
+    'CATCHPY_DB_REPLICA_STICKY_SECONDS', '5'))
+
 
 # Password validation
 # https://docs.djangoproject.com/en/1.10/ref/settings/#auth-password-validators
@@ -182,3 +207,23 @@ else:
 
 # max number of rows to be returned in a search request
 CATCH_RESPONSE_LIMIT = 200
+
+# postgres text search config (language) for searches by body text
+CATCH_TEXT_SEARCH_CONFIG = os.environ.get(
+    'CATCHPY_TEXT_SEARCH_CONFIG', 'english')
+
+# validate input with code generated from the catcha json schema
+CATCH_FAST_SCHEMA_VALIDATION = os.environ.get(
+    'CATCHPY_FAST_SCHEMA_VALIDATION', 'false').lower() == 'true'
+
+# seconds a consumer is cached by the jwt middleware, 0 to disable
+CATCH_CONSUMER_CACHE_TTL = int(os.environ.get(
+    'CATCHPY_CONSUMER_CACHE_TTL', '60'))
+
+# django cache for search responses, one of CACHES shared by all processes;
+# search responses are not cached if not set
+CATCH_SEARCH_CACHE_ALIAS = os.environ.get(
+    'CATCHPY_SEARCH_CACHE_ALIAS', None) or None
+
+# seconds a search response is cached
+CATCH_SEARCH_CACHE_TTL = int(os.environ.get('CATCHPY_SEARCH_CACHE_TTL', '60'))
@@ -19,6 +19,8 @@ DATABASES = {
         'ATOMIC_REQUESTS': False,
     },
 }
+# DATABASES above has no replicas
+CATCH_DB_REPLICAS = []
 # Logging config
 LOGGING = {
     'version': 1,
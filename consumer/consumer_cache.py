@@ -0,0 +1,76 @@
+from hashlib import sha1
+import time
+
+from django.conf import settings
+from django.core.cache import caches
+
+
+# seconds a consumer is trusted without checking the database; 0 disables
+CATCH_CONSUMER_CACHE_TTL = getattr(settings, 'CATCH_CONSUMER_CACHE_TTL', 60)
+
+# django cache to keep consumers in, shared by processes; if not set, each
+# process keeps its own, and only the process that saves a consumer sees
+# the change before the ttl runs out.
+CATCH_CONSUMER_CACHE_ALIAS = getattr(
+    settings, 'CATCH_CONSUMER_CACHE_ALIAS', None)
+
+
+class ConsumerCache(object):
+    '''consumers by consumer key, kept for `ttl` seconds.
+
+    stores consumer model instances as they were when read from database;
+    callers still have to check `has_expired()`.
+    '''
+
+    def __init__(self, ttl=CATCH_CONSUMER_CACHE_TTL,
+                 cache_alias=CATCH_CONSUMER_CACHE_ALIAS):
+        self.ttl = ttl
+        self.cache_alias = cache_alias
+        self.local = {}  # consumer_key -> (expire_at, consumer)
+
+    @property
+    def backend(self):
+        if self.cache_alias is None:
+            return None
+        return caches[self.cache_alias]
+
+    def cache_key(self, consumer_key):
+        # consumer key comes from the token; hash it to a safe cache key
+        digest = sha1(consumer_key.encode('utf-8')).hexdigest()
+        return 'catchpy:consumer:{}'.format(digest)
+
+    def get(self, consumer_key):
+        if self.ttl <= 0:
+            return None
+        if self.backend is not None:
+            return self.backend.get(self.cache_key(consumer_key))
+
+        cached = self.local.get(consumer_key, None)
+        if cached is None:
+            return None
+        (expire_at, consumer) = cached
+        if expire_at < time.time():
+            self.local.pop(consumer_key, None)
+            return None
+        return consumer
+
+    def set(self, consumer):
+        if self.ttl <= 0:
+            return
+        if self.backend is not None:
+            self.backend.set(
+                self.cache_key(consumer.consumer), consumer, self.ttl)
+        else:
+            self.local[consumer.consumer] = (time.time() + self.ttl, consumer)
+
+    def invalidate(self, consumer_key):
+        if self.backend is not None:
+            self.backend.delete(self.cache_key(consumer_key))
+        self.local.pop(consumer_key, None)
+
+    def clear(self):
+        '''drops this process' consumers; shared cache is not cleared.'''
+        self.local.clear()
+
+
+consumer_cache = ConsumerCache()
@@ -8,6 +8,8 @@ import pytz
 
 from .catchjwt import decode_token
 from .catchjwt import validate_token
+from .consumer_cache import consumer_cache
+from .token_cache import token_cache
 from .models import Consumer
 
 
@@ -39,7 +41,14 @@ def jwt_middleware(get_response):
 
         # get token from request header
         credentials = get_credentials(request)
+        payload = None
         if credentials is not None:
+            # token already verified in previous request?
+            payload = fetch_verified_payload(credentials)
+
+        if payload is not None:
+            request.catchjwt = payload
+        elif credentials is not None:
             # decode token to get consumerKey
             payload = decode_token(credentials)
             if payload is not None:
@@ -56,6 +65,7 @@ def jwt_middleware(get_response):
                             error = validate_token(payload)
                             if not error:
                                 # valid, replace info in request
+                                token_cache.set(credentials, payload, consumer)
                                 payload['consumer'] = consumer
                                 request.catchjwt = payload
                                 #logger.debug(
@@ -113,11 +123,18 @@ def get_credentials(request):
 
 
 def fetch_consumer(token_payload):
-    '''get consumer model corresponding to `consumerKey` in token.'''
+    '''get consumer model corresponding to `consumerKey` in token.
+
+    consumers are cached for a short while, see consumer_cache.
+    '''
     consumer_key = token_payload.get('consumerKey', None)
     if consumer_key is None:
         return None
 
+    consumer = consumer_cache.get(consumer_key)
+    if consumer is not None:
+        return consumer
+
     try:
         consumer = Consumer._default_manager.get(pk=consumer_key)
     except Consumer.DoesNotExist:
@@ -125,4 +142,26 @@ def fetch_consumer(token_payload):
             consumer_key))
         return None
     else:
+        consumer_cache.set(consumer)
         return consumer
+
+
+def fetch_verified_payload(credentials):
+    '''payload of token verified in a previous request, if still valid.
+
+    skips decoding and validating the token again; the consumer is still
+    checked, in case it expired or changed its secret since.
+    '''
+    cached = token_cache.get(credentials)
+    if cached is None:
+        return None
+
+    (payload, secret_key) = cached
+    consumer = fetch_consumer(payload)
+    if consumer is None or consumer.has_expired() or (
+            consumer.secret_key != secret_key):
+        token_cache.invalidate(credentials)
+        return None
+
+    payload['consumer'] = consumer
+    return payload
@@ -18,9 +18,13 @@ from django.db.models import ManyToManyField
 from django.db.models import Model
 from django.db.models import OneToOneField
 from django.db.models import TextField
+from django.db import transaction
+from django.db.models.signals import post_delete
 from django.db.models.signals import post_save
 from django.dispatch import receiver
 
+from .consumer_cache import consumer_cache
+
 
 
 class Profile(Model):
@@ -88,4 +92,10 @@ def create_or_update_profile_consumer(sender, instance, created, **kwargs):
     instance.prime_consumer.save()
 
 
-
+@receiver(post_save, sender=Consumer)
+@receiver(post_delete, sender=Consumer)
+def invalidate_cached_consumer(sender, instance, **kwargs):
+    consumer_key = instance.consumer
+    consumer_cache.invalidate(consumer_key)
+    # requests between now and commit might cache the old row again
+    transaction.on_commit(lambda: consumer_cache.invalidate(consumer_key))
@@ -2,19 +2,26 @@ from datetime import datetime
 from datetime import timedelta
 import pytest
 import pytz
+import time
 from uuid import uuid4
 
+from django.db import connection
 from django.http import HttpResponse
 from django.test import RequestFactory
+from django.test.utils import CaptureQueriesContext
 
 from ..catchjwt import decode_token
 from ..catchjwt import encode_catchjwt
 from ..catchjwt import encode_token
 from ..catchjwt import validate_token
+from ..consumer_cache import ConsumerCache
+from .. import jwt_middleware as jwt_middleware_module
 from ..jwt_middleware import JWT_AUTH_HEADER, JWT_ANNOTATOR_HEADER
 from ..jwt_middleware import get_credentials
 from ..jwt_middleware import jwt_middleware
 from ..models import Consumer
+from ..token_cache import TokenCache
+from ..token_cache import token_cache
 
 
 @pytest.mark.django_db
@@ -235,3 +242,152 @@ def test_middleware_issued_in_future():
 
 
 
+
+
+def make_token_request(c):
+    token_enc = encode_catchjwt(apikey=c.consumer,
+                                secret=c.secret_key,
+                                user='clarice_lispector',
+                                override=['CAN_UPDATE','CAN_DELETE'])
+    factory = RequestFactory()
+    extra = {
+        JWT_AUTH_HEADER: 'Token {}'.format(token_enc.decode('iso-8859-1'))}
+    return factory.get('/anno', **extra)
+
+
+@pytest.mark.django_db
+def test_middleware_consumer_cached():
+    c = Consumer._default_manager.create()
+    middleware = jwt_middleware(lambda request: HttpResponse('ok'))
+
+    middleware(make_token_request(c))
+
+    request = make_token_request(c)
+    with CaptureQueriesContext(connection) as ctx:
+        middleware(request)
+    assert len(ctx.captured_queries) == 0
+    assert request.catchjwt['error'] == ''
+    assert request.catchjwt['consumer'] == c
+
+
+@pytest.mark.django_db
+def test_middleware_cached_consumer_saved():
+    c = Consumer._default_manager.create()
+    middleware = jwt_middleware(lambda request: HttpResponse('ok'))
+    middleware(make_token_request(c))
+
+    c.expire_on = datetime.now(pytz.utc) - timedelta(hours=1)
+    c.save()
+
+    request = make_token_request(c)
+    middleware(request)
+    assert request.catchjwt['error'] == 'consumer({}) has expired'.format(
+        c.consumer)
+    assert request.catchjwt['userId'] == 'anonymous'
+
+
+@pytest.mark.django_db
+def test_middleware_cached_consumer_deleted():
+    c = Consumer._default_manager.create()
+    middleware = jwt_middleware(lambda request: HttpResponse('ok'))
+    middleware(make_token_request(c))
+
+    request = make_token_request(c)
+    c.delete()
+
+    middleware(request)
+    assert request.catchjwt['error'] == 'invalid consumerKey in auth token'
+    assert request.catchjwt['userId'] == 'anonymous'
+
+
+@pytest.mark.django_db
+def test_consumer_cache_ttl():
+    c = Consumer._default_manager.create()
+    cache = ConsumerCache(ttl=60)
+    cache.set(c)
+    assert cache.get(c.consumer) == c
+
+    cache.local[c.consumer] = (time.time() - 1, c)
+    assert cache.get(c.consumer) is None
+    assert c.consumer not in cache.local
+
+    cache = ConsumerCache(ttl=0)
+    cache.set(c)
+    assert cache.get(c.consumer) is None
+
+
+@pytest.mark.django_db
+def test_consumer_cache_django_backend():
+    c = Consumer._default_manager.create()
+    cache = ConsumerCache(ttl=60, cache_alias='default')
+    cache.set(c)
+    assert cache.local == {}
+    assert cache.get(c.consumer) == c
+
+    cache.invalidate(c.consumer)
+    assert cache.get(c.consumer) is None
+
+
+@pytest.mark.django_db
+def test_middleware_token_cached(monkeypatch):
+    c = Consumer._default_manager.create()
+    middleware = jwt_middleware(lambda request: HttpResponse('ok'))
+    request = make_token_request(c)
+    middleware(request)
+
+    def no_decode(*args, **kwargs):
+        raise AssertionError('token decoded again')
+
+    monkeypatch.setattr(jwt_middleware_module, 'decode_token', no_decode)
+    monkeypatch.setattr(jwt_middleware_module, 'validate_token', no_decode)
+
+    with CaptureQueriesContext(connection) as ctx:
+        middleware(request)
+    assert len(ctx.captured_queries) == 0
+    assert request.catchjwt['error'] == ''
+    assert request.catchjwt['userId'] == 'clarice_lispector'
+    assert request.catchjwt['consumer'] == c
+
+
+@pytest.mark.django_db
+def test_middleware_cached_token_expired():
+    c = Consumer._default_manager.create()
+    middleware = jwt_middleware(lambda request: HttpResponse('ok'))
+    request = make_token_request(c)
+    middleware(request)
+    credentials = get_credentials(request)
+
+    # pretend the token ttl ran out
+    key = token_cache.digest(credentials)
+    (expire_at, secret_key, payload) = token_cache.cache[key]
+    token_cache.cache[key] = (time.time() - 1, secret_key, payload)
+    assert token_cache.get(credentials) is None
+
+
+@pytest.mark.django_db
+def test_middleware_cached_token_secret_changed():
+    c = Consumer._default_manager.create()
+    middleware = jwt_middleware(lambda request: HttpResponse('ok'))
+    request = make_token_request(c)
+    middleware(request)
+
+    c.secret_key = 'rotated_secret'
+    c.save()
+
+    middleware(request)
+    assert request.catchjwt['error'] == 'failed to validate auth token signature'
+    assert request.catchjwt['userId'] == 'anonymous'
+
+
+@pytest.mark.django_db
+def test_token_cache_lru():
+    c = Consumer._default_manager.create()
+    payload = {'consumerKey': c.consumer, 'userId': 'clarice_lispector',
+               'issuedAt': datetime.now(pytz.utc).isoformat(), 'ttl': 60}
+    cache = TokenCache(size=2)
+    for token in [b'a', b'b', b'a', b'c']:
+        cache.set(token, payload, c)
+
+    assert cache.get(b'b') is None
+    assert cache.get(b'a') == (payload, c.secret_key)
+    assert cache.get(b'c') == (payload, c.secret_key)
@@ -0,0 +1,72 @@
+from collections import OrderedDict
+import copy
+from hashlib import sha256
+import iso8601
+from threading import Lock
+import time
+
+from django.conf import settings
+
+
+# max number of verified tokens kept per process; 0 disables
+CATCH_TOKEN_CACHE_SIZE = getattr(settings, 'CATCH_TOKEN_CACHE_SIZE', 10000)
+
+
+class TokenCache(object):
+    '''LRU of verified jwt payloads, by token digest.
+
+    each entry is bound to the consumer that signed the token, and to its
+    secret at the time; it expires when the token does (issuedAt + ttl).
+    '''
+
+    def __init__(self, size=CATCH_TOKEN_CACHE_SIZE):
+        self.size = size
+        self.cache = OrderedDict()  # digest -> (expire_at, secret, payload)
+        self.lock = Lock()
+
+    def digest(self, token):
+        if isinstance(token, str):
+            token = token.encode('iso-8859-1')
+        return sha256(token).hexdigest()
+
+    def get(self, token):
+        '''returns (payload, secret_key) or None.'''
+        if self.size <= 0:
+            return None
+        key = self.digest(token)
+        with self.lock:
+            cached = self.cache.get(key, None)
+            if cached is None:
+                return None
+            (expire_at, secret_key, payload) = cached
+            if expire_at <= time.time():
+                del self.cache[key]
+                return None
+            self.cache.move_to_end(key)
+        return (copy.deepcopy(payload), secret_key)
+
+    def set(self, token, payload, consumer):
+        '''payload must have been verified and validated already.'''
+        if self.size <= 0:
+            return
+        issued_at = iso8601.parse_date(payload['issuedAt'])
+        expire_at = issued_at.timestamp() + int(payload['ttl'])
+
+        key = self.digest(token)
+        payload = copy.deepcopy(payload)
+        with self.lock:
+            self.cache[key] = (expire_at, consumer.secret_key, payload)
+            self.cache.move_to_end(key)
+            while len(self.cache) > self.size:
+                self.cache.popitem(last=False)
+
+    def invalidate(self, token):
+        with self.lock:
+            self.cache.pop(self.digest(token), None)
+
+    def clear(self):
+        with self.lock:
+            self.cache.clear()
+
+
+token_cache = TokenCache()